@@ -1,7 +1,6 @@
 # app/api/courses.py
 import os
-import shutil
-from typing import Any, List
+from typing import Any, List, Tuple
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, BackgroundTasks
 from sqlalchemy.orm import Session
 
@@ -10,13 +9,38 @@ from app.api.auth import get_current_active_user
 from app.database import get_db
 from app.schemas.courses import Course, CourseCreate, CourseUpdate, Material, MaterialCreate
 from app.schemas.users import User
+from app.services.ingestion import MaterialIngestion
+from app.services.storage import BlobStorage
 
 router = APIRouter()
 
 
-def save_upload_file(file_path: str, file: UploadFile):
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+def remove_file(file_path: str):
+    if os.path.exists(file_path):
+        os.remove(file_path)
+
+
+def get_upload_file_type(filename: str) -> Tuple[str, str]:
+    """
+    Determina el tipo de material a partir del nombre del archivo.
+    Retorna (tipo, extensión).
+    """
+    file_extension = os.path.splitext(filename)[1].lower()
+    
+    if file_extension in [".pdf"]:
+        file_type = "pdf"
+    elif file_extension in [".doc", ".docx"]:
+        file_type = "docx"
+    elif file_extension in [".ppt", ".pptx"]:
+        file_type = "pptx"
+    elif file_extension in [".txt"]:
+        file_type = "txt"
+    else:
+        raise HTTPException(
+            status_code=400, 
+            detail="Tipo de archivo no soportado. Use PDF, DOCX, PPTX o TXT."
+        )
+    return file_type, file_extension
 
 
 @router.get("/", response_model=List[Course])
@@ -115,36 +139,11 @@ async def create_course_material(
     if not course:
         raise HTTPException(status_code=404, detail="Curso no encontrado")
     
-    # Determinar tipo de archivo
-    filename = file.filename
-    file_extension = os.path.splitext(filename)[1].lower()
-    file_type = "unknown"
-    
-    if file_extension in [".pdf"]:
-        file_type = "pdf"
-    elif file_extension in [".doc", ".docx"]:
-        file_type = "docx"
-    elif file_extension in [".ppt", ".pptx"]:
-        file_type = "pptx"
-    elif file_extension in [".txt"]:
-        file_type = "txt"
-    else:
-        raise HTTPException(
-            status_code=400, 
-            detail="Tipo de archivo no soportado. Use PDF, DOCX, PPTX o TXT."
-        )
-    
-    # Crear directorio del curso si no existe
-    course_dir = f"storage/courses/{course_id}"
-    os.makedirs(course_dir, exist_ok=True)
+    file_type, file_extension = get_upload_file_type(file.filename)
     
-    # Construir ruta para guardar el archivo
-    import uuid
-    unique_filename = f"{uuid.uuid4()}{file_extension}"
-    file_path = f"{course_dir}/{unique_filename}"
-    
-    # Guardar archivo en background para no bloquear
-    background_tasks.add_task(save_upload_file, file_path, file)
+    # Guardar el archivo en el almacenamiento por contenido: si el mismo
+    # archivo ya se subió (por ejemplo, a otro curso) se reutiliza
+    blob_in = await BlobStorage.save_upload(file, file_extension)
     
     # Crear material en la base de datos
     material_in = MaterialCreate(
@@ -152,13 +151,67 @@ async def create_course_material(
         description=description,
         file_type=file_type
     )
-    material = crud.create_material(
-        db=db,
-        material_in=material_in,
-        user_id=current_user.id,
-        file_path=file_path,
-        course_id=course_id
-    )
+    try:
+        material = crud.create_material(
+            db=db,
+            material_in=material_in,
+            user_id=current_user.id,
+            file_path=blob_in["file_path"],
+            course_id=course_id,
+            blob_in=blob_in
+        )
+    except Exception:
+        BlobStorage.finish_upload(blob_in, referenced=False)
+        raise
+    BlobStorage.finish_upload(blob_in)
+    
+    # Extraer el contenido en segundo plano
+    background_tasks.add_task(MaterialIngestion.ingest_material, material.id)
+    
+    return material
+
+
+@router.put("/{course_id}/materials/{material_id}/file", response_model=Material)
+async def replace_course_material_file(
+    background_tasks: BackgroundTasks,
+    course_id: int,
+    material_id: int,
+    file: UploadFile = File(...),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user),
+) -> Any:
+    """
+    Reemplazar el archivo de un material del curso. Solo se vuelven a
+    extraer los conceptos de las secciones que cambiaron.
+    """
+    course = crud.get_course(db=db, course_id=course_id)
+    if not course:
+        raise HTTPException(status_code=404, detail="Curso no encontrado")
+    
+    material = crud.get_material(db=db, material_id=material_id)
+    if not material or material not in course.materials:
+        raise HTTPException(status_code=404, detail="Material no encontrado")
+    
+    file_type, file_extension = get_upload_file_type(file.filename)
+    blob_in = await BlobStorage.save_upload(file, file_extension)
+    
+    old_blob_key = material.blob_key
+    old_file_path = material.file_path
+    try:
+        material = crud.replace_material_file(
+            db=db, db_obj=material, blob_in=blob_in, file_type=file_type
+        )
+    except Exception:
+        BlobStorage.finish_upload(blob_in, referenced=False)
+        raise
+    BlobStorage.finish_upload(blob_in)
+    
+    # Los archivos anteriores al almacenamiento por contenido se borran directamente;
+    # los demás, cuando ya no los referencia ningún material
+    if not old_blob_key:
+        background_tasks.add_task(remove_file, old_file_path)
+    background_tasks.add_task(MaterialIngestion.ingest_material, material.id)
+    background_tasks.add_task(BlobStorage.collect_garbage)
     
     return material
 
@@ -182,4 +235,25 @@ def read_course_materials(
     materials = crud.get_materials_by_course(
         db=db, course_id=course_id, skip=skip, limit=limit
     )
-    return materials
\ No newline at end of file
+    return materials
+
+
+@router.delete("/{course_id}/materials/{material_id}", response_model=bool)
+def remove_course_material(
+    *,
+    db: Session = Depends(get_db),
+    course_id: int,
+    material_id: int,
+    current_user: User = Depends(get_current_active_user),
+) -> Any:
+    """
+    Quitar un material de un curso
+    """
+    course = crud.get_course(db=db, course_id=course_id)
+    if not course:
+        raise HTTPException(status_code=404, detail="Curso no encontrado")
+    
+    result = crud.remove_material_from_course(db=db, material_id=material_id, course_id=course_id)
+    if not result:
+        raise HTTPException(status_code=404, detail="El material no pertenece a este curso")
+    return result
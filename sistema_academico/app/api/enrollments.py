@@ -146,13 +146,11 @@ def create_enrollment_grade(
         raise HTTPException(status_code=404, detail="Examen no encontrado")
     
     # Verificar si ya existe una calificación para este examen
-    grades = crud.get_grades_by_enrollment(db=db, enrollment_id=enrollment_id)
-    for grade in grades:
-        if grade.exam_id == exam_id:
-            raise HTTPException(
-                status_code=400,
-                detail="Ya existe una calificación para este examen",
-            )
+    if crud.get_grade_by_enrollment_and_exam(db=db, enrollment_id=enrollment_id, exam_id=exam_id):
+        raise HTTPException(
+            status_code=400,
+            detail="Ya existe una calificación para este examen",
+        )
     
     # Crear calificación
     grade_in = GradeCreate(
@@ -1,37 +1,29 @@
 # app/api/exams.py
 import os
-import uuid
-import datetime
-from typing import Any, List, Optional
-from fastapi import APIRouter, Depends, HTTPException, File, UploadFile, Form, BackgroundTasks
-from fastapi.responses import FileResponse
+from typing import Any, List, Optional, Tuple
+from fastapi import APIRouter, Depends, HTTPException, File, UploadFile, Form
+from fastapi.responses import FileResponse, Response, StreamingResponse
 from sqlalchemy.orm import Session
-from pydantic import BaseModel
 
 from app import crud
-from app.api.auth import get_current_active_user
+from app.api.auth import get_current_active_user, get_current_active_superuser
+from app.core.config import settings
 from app.database import get_db
-from app.schemas.exams import Exam, ExamCreate, Question, QuestionCreate, ExamVariant
+from app.schemas.exams import (
+    AutoGradeReport, CalibrationSummary, Exam, ExamConfig, ExamResponsesSubmit, GenerationBatch, GenerationBatchCreate,
+    GenerationJob, ItemAnalysisReport, Question, ExamVariant
+)
 from app.schemas.users import User
-from app.services.document_processor import DocumentProcessor
-from app.services.exam_generator import ExamGenerator
+from app.services.auto_grading import AnswerKey, AutoGrader, encode_answers
+from app.services.bundles import stream_zip
+from app.services.calibration import DifficultyCalibration
+from app.services.generation import ExamGenerationPipeline
+from app.services.item_analysis import ItemAnalysis
+from app.services.omr import OMRError, OpticalMarkReader
 
 router = APIRouter()
 
 
-class ExamConfig(BaseModel):
-    title: str
-    description: Optional[str] = None
-    exam_type: str
-    num_questions: int = 20
-    num_concepts: int = 10
-    num_options: int = 4
-    difficulty_distribution: dict = {"easy": 0.3, "medium": 0.5, "hard": 0.2}
-    question_type_distribution: dict = {"multiple_choice": 0.7, "open": 0.3}
-    generate_variants: bool = False
-    num_variants: int = 1
-
-
 @router.get("/", response_model=List[Exam])
 def read_exams(
     db: Session = Depends(get_db),
@@ -43,27 +35,19 @@ def read_exams(
     """
     Obtener todos los exámenes, opcionalmente filtrados por curso
     """
-    if course_id:
-        # Aquí necesitaríamos una función para obtener exámenes por curso
-        # Por ahora, retornamos una lista vacía
-        exams = []
-    else:
-        # Aquí necesitaríamos una función para obtener todos los exámenes
-        # Por ahora, retornamos una lista vacía
-        exams = []
-    return exams
+    return crud.get_exams(db=db, course_id=course_id, skip=skip, limit=limit)
 
 
-@router.post("/generate", response_model=Exam)
-async def generate_exam(
-    background_tasks: BackgroundTasks,
+@router.post("/generate", response_model=GenerationJob, status_code=202)
+def generate_exam(
     course_id: int = Form(...),
     config: ExamConfig = Depends(),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user),
 ) -> Any:
     """
-    Generar un examen basado en los materiales de un curso
+    Encolar la generación de un examen basado en los materiales de un curso.
+    Retorna el trabajo creado; su avance se consulta en /jobs/{job_id}.
     """
     # Verificar que el curso existe
     course = crud.get_course(db=db, course_id=course_id)
@@ -79,126 +63,153 @@ async def generate_exam(
             detail="El curso no tiene materiales para generar un examen"
         )
     
-    # Procesar materiales
-    processed_materials = []
-    for material in materials:
-        processed_content = DocumentProcessor.process_document(material.file_path)
-        processed_materials.append(processed_content)
-    
-    # Crear configuración del examen
-    exam_config = {
-        'title': config.title,
-        'description': config.description,
-        'num_questions': config.num_questions,
-        'num_concepts': config.num_concepts,
-        'num_options': config.num_options,
-        'difficulty_distribution': config.difficulty_distribution,
-        'question_type_distribution': config.question_type_distribution
-    }
+    if crud.count_pending_generation_jobs(db) >= settings.GENERATION_MAX_PENDING_JOBS:
+        raise HTTPException(
+            status_code=503,
+            detail="Hay demasiados exámenes en generación, intente nuevamente en unos minutos"
+        )
     
-    # Generar examen
-    try:
-        generated_exam = ExamGenerator.create_exam_from_materials(
-            processed_materials, 
-            exam_config
+    return ExamGenerationPipeline.submit(
+        db, course_id=course_id, config=config, user_id=current_user.id
+    )
+
+
+@router.post("/generate/batch", response_model=GenerationBatch, status_code=202)
+def generate_exam_batch(
+    batch_in: GenerationBatchCreate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_superuser),
+) -> Any:
+    """
+    Encolar la generación de un examen para cada uno de varios cursos con la
+    misma configuración. Los materiales se procesan una sola vez para todo el
+    lote y los exámenes se generan en paralelo en un pool propio de los
+    lotes, sin demorar los exámenes pedidos de a uno; el resultado de cada
+    curso se consulta en /batches/{batch_id}.
+    """
+    course_ids = list(dict.fromkeys(batch_in.course_ids))
+    if not course_ids:
+        raise HTTPException(status_code=400, detail="Debe indicar al menos un curso")
+    if len(course_ids) > settings.GENERATION_MAX_BATCH_COURSES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Un lote admite como máximo {settings.GENERATION_MAX_BATCH_COURSES} cursos"
         )
-        
-        # Crear directorios para exámenes si no existen
-        exam_dir = f"storage/exams/{course_id}"
-        os.makedirs(exam_dir, exist_ok=True)
-        
-        # Generar nombre único para el archivo
-        exam_id = str(uuid.uuid4())
-        exam_file = f"{exam_dir}/{exam_id}.docx"
-        answer_key_file = f"{exam_dir}/{exam_id}_answers.docx"
-        
-        # Generar archivos DOCX
-        ExamGenerator.generate_exam_docx(generated_exam, exam_file, include_answers=False)
-        ExamGenerator.generate_exam_docx(generated_exam, answer_key_file, include_answers=True)
-        
-        # Generar hoja de respuestas
-        answer_sheet_file = f"{exam_dir}/{exam_id}_answer_sheet.docx"
-        ExamGenerator.generate_answer_sheet(generated_exam, answer_sheet_file)
-        
-        # Crear examen en la base de datos
-        exam_create = ExamCreate(
-            title=config.title,
-            description=config.description,
-            course_id=course_id,
-            exam_type=config.exam_type,
-            creation_date=datetime.datetime.utcnow().isoformat(),
-            questions=[]
+    
+    missing = [course_id for course_id in course_ids if not crud.get_course(db=db, course_id=course_id)]
+    if missing:
+        raise HTTPException(
+            status_code=404,
+            detail={"message": "Algunos cursos no existen", "course_ids": missing}
         )
-        
-        # Agregar preguntas
-        for question_data in generated_exam["questions"]:
-            options = []
-            if question_data.get("question_type") == "multiple_choice" and "options" in question_data:
-                for option_text in question_data["options"]:
-                    is_correct = option_text == question_data.get("answer", "")
-                    options.append({
-                        "content": option_text,
-                        "is_correct": is_correct
-                    })
-            
-            question = QuestionCreate(
-                content=question_data["content"],
-                question_type=question_data["question_type"],
-                difficulty=question_data["difficulty"],
-                points=question_data["points"],
-                options=options
-            )
-            exam_create.questions.append(question)
-        
-        # Crear examen (esto requeriría una función en CRUD que no tenemos implementada)
-        # Por ahora, retornamos un examen simulado
-        exam = {
-            "id": 1,
-            "title": config.title,
-            "description": config.description,
-            "course_id": course_id,
-            "created_by_id": current_user.id,
-            "exam_type": config.exam_type,
-            "creation_date": datetime.datetime.utcnow().isoformat(),
-            "file_path": exam_file,
-            "answer_key_path": answer_key_file,
-            "questions": generated_exam["questions"],
-            "exam_variants": []
-        }
-        
-        # Si se solicitaron variantes, generarlas
-        if config.generate_variants and config.num_variants > 1:
-            # Aquí se implementaría la generación de variantes
-            # Por ahora, solo simulamos
-            for i in range(config.num_variants):
-                variant_id = f"{exam_id}_variant_{i+1}"
-                variant_file = f"{exam_dir}/{variant_id}.docx"
-                variant_answer_file = f"{exam_dir}/{variant_id}_answers.docx"
-                
-                # Simular la creación de archivos (en una implementación real se generarían variantes)
-                with open(exam_file, 'rb') as src:
-                    with open(variant_file, 'wb') as dst:
-                        dst.write(src.read())
-                
-                with open(answer_key_file, 'rb') as src:
-                    with open(variant_answer_file, 'wb') as dst:
-                        dst.write(src.read())
-                
-                exam["exam_variants"].append({
-                    "id": i+1,
-                    "exam_id": 1,
-                    "variant_code": chr(65 + i),  # A, B, C, ...
-                    "file_path": variant_file,
-                    "answer_key_path": variant_answer_file
-                })
-        
-        return exam
     
-    except Exception as e:
+    # Cada curso del lote ocupa un lugar en la cola de generación
+    if crud.count_pending_generation_jobs(db) + len(course_ids) > settings.GENERATION_MAX_PENDING_JOBS:
         raise HTTPException(
-            status_code=500,
-            detail=f"Error al generar el examen: {str(e)}"
+            status_code=503,
+            detail="Hay demasiados exámenes en generación para encolar este lote, intente nuevamente más tarde"
         )
+    
+    batch_id, jobs = ExamGenerationPipeline.submit_batch(
+        db, course_ids=course_ids, config=batch_in.config, user_id=current_user.id
+    )
+    return ExamGenerationPipeline.batch_summary(batch_id, jobs)
+
+
+@router.get("/batches/{batch_id}", response_model=GenerationBatch)
+def read_generation_batch(
+    batch_id: str,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_superuser),
+) -> Any:
+    """
+    Consultar el estado de un lote de generación y el resultado por curso
+    """
+    jobs = crud.get_generation_jobs_by_batch(db=db, batch_id=batch_id)
+    if not jobs:
+        raise HTTPException(status_code=404, detail="Lote de generación no encontrado")
+    return ExamGenerationPipeline.batch_summary(batch_id, jobs)
+
+
+@router.post("/calibration", response_model=CalibrationSummary)
+def calibrate_difficulty(
+    min_responses: Optional[int] = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_superuser),
+) -> Any:
+    """
+    Calibrar la dificultad de preguntas y conceptos con las respuestas
+    registradas desde la calibración anterior. Solo procesa las respuestas
+    nuevas; los exámenes que se generen después muestrean los conceptos con
+    la dificultad observada.
+    """
+    return DifficultyCalibration.run(
+        db, batch_size=settings.CALIBRATION_BATCH_SIZE,
+        min_responses=min_responses if min_responses is not None else settings.CALIBRATION_MIN_RESPONSES
+    )
+
+
+def get_job_for_user(db: Session, job_id: str, current_user: User) -> GenerationJob:
+    """
+    Obtiene un trabajo de generación verificando que pertenezca al usuario
+    """
+    job = crud.get_generation_job(db=db, job_id=job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Trabajo de generación no encontrado")
+    if job.created_by_id != current_user.id and not crud.is_superuser(current_user):
+        raise HTTPException(status_code=403, detail="No tiene permisos para ver este trabajo")
+    return job
+
+
+@router.get("/jobs", response_model=List[GenerationJob])
+def read_generation_jobs(
+    db: Session = Depends(get_db),
+    skip: int = 0,
+    limit: int = 100,
+    current_user: User = Depends(get_current_active_user),
+) -> Any:
+    """
+    Obtener los trabajos de generación del usuario, del más reciente al más antiguo
+    """
+    return crud.get_generation_jobs_by_user(db=db, user_id=current_user.id, skip=skip, limit=limit)
+
+
+@router.get("/jobs/{job_id}", response_model=GenerationJob)
+def read_generation_job(
+    job_id: str,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user),
+) -> Any:
+    """
+    Consultar el estado, el progreso por etapa y el resultado de un trabajo
+    """
+    return get_job_for_user(db, job_id, current_user)
+
+
+@router.get("/jobs/{job_id}/artifacts/{artifact}")
+def download_generation_artifact(
+    job_id: str,
+    artifact: str,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user),
+) -> Any:
+    """
+    Descargar un documento generado por un trabajo: exam, answer_key,
+    answer_sheet o las variantes (variant_A, variant_A_answers, ...)
+    """
+    job = get_job_for_user(db, job_id, current_user)
+    if job.status != "completed":
+        raise HTTPException(status_code=409, detail="El trabajo de generación no ha terminado")
+    
+    file_path = (job.result or {}).get("artifacts", {}).get(artifact)
+    if not file_path or not os.path.exists(file_path):
+        raise HTTPException(status_code=404, detail="Archivo no encontrado")
+    
+    return FileResponse(
+        path=file_path,
+        filename=os.path.basename(file_path),
+        media_type="application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+    )
 
 
 @router.get("/download/{exam_id}")
@@ -211,22 +222,14 @@ async def download_exam(
     """
     Descargar un examen generado
     """
-    # Aquí necesitaríamos obtener el examen de la base de datos
-    # Por ahora, simulamos con una ruta de archivo fija
-    
-    # En una implementación real buscaríamos el examen en la BD
-    # exam = crud.get_exam(db=db, exam_id=exam_id)
-    # if not exam:
-    #     raise HTTPException(status_code=404, detail="Examen no encontrado")
+    exam = crud.get_exam(db=db, exam_id=exam_id)
+    if not exam:
+        raise HTTPException(status_code=404, detail="Examen no encontrado")
     
-    # Simular archivo de examen
-    file_path = "storage/exams/1/example.docx"
-    
-    if include_answers:
-        file_path = "storage/exams/1/example_answers.docx"
+    file_path = exam.answer_key_path if include_answers else exam.file_path
     
     # Verificar que el archivo existe
-    if not os.path.exists(file_path):
+    if not file_path or not os.path.exists(file_path):
         raise HTTPException(status_code=404, detail="Archivo no encontrado")
     
     return FileResponse(
@@ -245,15 +248,190 @@ async def download_answer_sheet(
     """
     Descargar la hoja de respuestas de un examen
     """
-    # Simulamos con una ruta de archivo fija
-    file_path = "storage/exams/1/example_answer_sheet.docx"
+    exam = crud.get_exam(db=db, exam_id=exam_id)
+    if not exam:
+        raise HTTPException(status_code=404, detail="Examen no encontrado")
+    
+    file_path = exam.answer_sheet_path
     
     # Verificar que el archivo existe
-    if not os.path.exists(file_path):
+    if not file_path or not os.path.exists(file_path):
         raise HTTPException(status_code=404, detail="Archivo no encontrado")
     
     return FileResponse(
         path=file_path,
         filename=os.path.basename(file_path),
         media_type="application/vnd.openxmlformats-officedocument.wordprocessingml.document"
-    )
\ No newline at end of file
+    )
+
+
+@router.get("/omr-sheet/{exam_id}")
+def download_omr_sheet(
+    exam_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user),
+) -> Any:
+    """
+    Descargar en PDF la hoja de respuestas para lectura óptica de un examen:
+    marcas de referencia en las esquinas, identificación, variante y una
+    burbuja por opción de cada pregunta de selección múltiple
+    """
+    exam = crud.get_exam_with_questions(db=db, exam_id=exam_id)
+    if not exam:
+        raise HTTPException(status_code=404, detail="Examen no encontrado")
+    
+    try:
+        layout = OpticalMarkReader.layout_for_exam(exam, id_digits=settings.OMR_ID_DIGITS)
+    except OMRError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return Response(
+        content=layout.render_pdf(exam.title, f"Examen {exam.id}"),
+        media_type="application/pdf",
+        headers={"Content-Disposition": f'attachment; filename="hoja_lectura_optica_{exam_id}.pdf"'}
+    )
+
+
+def exam_bundle_files(exam) -> List[Tuple[str, str]]:
+    """
+    Archivos de un examen para el ZIP como (nombre en el ZIP, ruta): el
+    examen, la clave y la hoja de respuestas, y los de cada variante en su
+    propia carpeta. Se omiten los que no existen.
+    """
+    documents = [("", exam.file_path, exam.answer_key_path, exam.answer_sheet_path)]
+    documents += [
+        (f"variante_{variant.variant_code}/", variant.file_path, variant.answer_key_path, variant.answer_sheet_path)
+        for variant in exam.exam_variants
+    ]
+    files = []
+    for folder, exam_path, answer_key_path, answer_sheet_path in documents:
+        for name, path in (
+            ("examen.docx", exam_path),
+            ("clave_respuestas.docx", answer_key_path),
+            ("hoja_respuestas.docx", answer_sheet_path),
+        ):
+            if path and os.path.exists(path):
+                files.append((f"{folder}{name}", path))
+    return files
+
+
+@router.get("/bundle/{exam_id}")
+def download_exam_bundle(
+    exam_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user),
+) -> Any:
+    """
+    Descargar en un ZIP todos los documentos de un examen y de sus variantes.
+    El ZIP se comprime y se envía a medida que se genera, sin archivos
+    temporales ni cargarlo completo en memoria.
+    """
+    exam = crud.get_exam(db=db, exam_id=exam_id)
+    if not exam:
+        raise HTTPException(status_code=404, detail="Examen no encontrado")
+    
+    files = exam_bundle_files(exam)
+    if not files:
+        raise HTTPException(status_code=404, detail="Archivo no encontrado")
+    
+    return StreamingResponse(
+        stream_zip(files),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="examen_{exam_id}.zip"'}
+    )
+
+
+@router.post("/{exam_id}/responses", response_model=AutoGradeReport)
+def grade_exam_responses(
+    exam_id: int,
+    submission: ExamResponsesSubmit,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user),
+) -> Any:
+    """
+    Calificar de una vez las respuestas de selección múltiple de todos los
+    estudiantes de una sección. Cada estudiante envía la letra elegida por
+    número de pregunta, tal como aparece en su versión del examen (original
+    o variante). Se registra una calificación por estudiante y se informa el
+    error de cada respuesta rechazada.
+    """
+    exam = crud.get_exam_with_questions(db=db, exam_id=exam_id)
+    if not exam:
+        raise HTTPException(status_code=404, detail="Examen no encontrado")
+    
+    section = crud.get_section(db=db, section_id=submission.section_id)
+    if not section:
+        raise HTTPException(status_code=404, detail="Sección no encontrada")
+    if exam.course_id != section.course_id:
+        raise HTTPException(status_code=400, detail="El examen no pertenece al curso de la sección")
+    
+    if len(submission.responses) > settings.AUTO_GRADING_MAX_RESPONSES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Se admiten hasta {settings.AUTO_GRADING_MAX_RESPONSES} estudiantes por solicitud"
+        )
+    
+    key = AnswerKey.compile(exam)
+    if not (key.correct >= 0).any():
+        raise HTTPException(status_code=400, detail="El examen no tiene preguntas de selección múltiple")
+    
+    entries = []
+    for row, responses in enumerate(submission.responses, start=1):
+        entries.append({
+            "identification": responses.identification.strip(),
+            "variant_code": responses.variant_code or submission.variant_code,
+            "error": (
+                "Hay más respuestas que preguntas en el examen"
+                if len(responses.answers) > key.num_questions else None
+            ),
+            "ref": {"row": row},
+        })
+    answers = encode_answers(
+        [responses.answers if not entry["error"] else [] for responses, entry in zip(submission.responses, entries)],
+        key.num_questions
+    )
+    
+    return AutoGrader.grade_section(
+        db, section_id=section.id, exam=exam, key=key, entries=entries, answers=answers,
+        user_id=current_user.id, source="Calificación automática"
+    )
+
+
+@router.get("/{exam_id}/analytics", response_model=ItemAnalysisReport)
+def read_exam_analytics(
+    exam_id: int,
+    min_responses: Optional[int] = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user),
+) -> Any:
+    """
+    Análisis de ítems de un examen: dificultad (p), discriminación
+    punto-biserial y frecuencia de cada opción por pregunta, y confiabilidad
+    KR-20. Se calcula con los agregados que se actualizan al calificar, sin
+    recorrer las respuestas. Se marcan las preguntas problemáticas con al
+    menos min_responses respuestas.
+    """
+    exam = crud.get_exam_with_questions(db=db, exam_id=exam_id)
+    if not exam:
+        raise HTTPException(status_code=404, detail="Examen no encontrado")
+    
+    return ItemAnalysis.report(
+        db, exam=exam,
+        min_responses=min_responses if min_responses is not None else settings.ITEM_ANALYSIS_MIN_RESPONSES
+    )
+
+
+# Al final para que /{exam_id} no capture las rutas anteriores (/jobs, /batches, ...)
+@router.get("/{exam_id}", response_model=Exam)
+def read_exam(
+    exam_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user),
+) -> Any:
+    """
+    Obtener un examen con sus preguntas, opciones y variantes
+    """
+    exam = crud.get_exam(db=db, exam_id=exam_id)
+    if not exam:
+        raise HTTPException(status_code=404, detail="Examen no encontrado")
+    return exam
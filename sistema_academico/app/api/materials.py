@@ -1,6 +1,6 @@
 # app/api/materials.py
-from typing import Any
-from fastapi import APIRouter, Depends, HTTPException
+from typing import Any, Optional
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query
 from fastapi.responses import FileResponse
 from sqlalchemy.orm import Session
 import os
@@ -9,10 +9,34 @@ import mimetypes
 from app import crud
 from app.api.auth import get_current_active_user
 from app.database import get_db
+from app.schemas.courses import Material, MaterialSearchResults
 from app.schemas.users import User
+from app.services.ingestion import MaterialIngestion
 
 router = APIRouter()
 
+
+@router.get("/search", response_model=MaterialSearchResults)
+def search_materials(
+    q: str,
+    course_id: Optional[int] = None,
+    skip: int = 0,
+    limit: int = Query(20, le=100),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user),
+) -> Any:
+    """Buscar texto dentro de los materiales, opcionalmente en un curso"""
+    if not crud.search_index_available(db):
+        raise HTTPException(
+            status_code=501,
+            detail="La búsqueda de texto completo requiere una base de datos SQLite"
+        )
+    
+    if not crud.courses.build_search_query(q):
+        raise HTTPException(status_code=400, detail="La búsqueda no contiene palabras")
+    
+    return crud.search_materials(db=db, query=q, course_id=course_id, skip=skip, limit=limit)
+
 @router.get("/{material_id}/download")
 async def download_material(
     material_id: int,
@@ -72,4 +96,23 @@ async def view_material(
             path=material.file_path,
             filename=filename,
             headers={"Content-Disposition": f"attachment; filename=\"{filename}\""}
-        )
\ No newline at end of file
+        )
+
+@router.post("/{material_id}/reprocess", response_model=Material)
+def reprocess_material(
+    material_id: int,
+    background_tasks: BackgroundTasks,
+    force: bool = False,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user),
+) -> Any:
+    """
+    Volver a procesar un material cuyo archivo fue editado. Si el contenido
+    no cambió no se hace nada, salvo con force=true.
+    """
+    material = crud.get_material(db=db, material_id=material_id)
+    if not material:
+        raise HTTPException(status_code=404, detail="Material no encontrado")
+    
+    background_tasks.add_task(MaterialIngestion.ingest_material, material.id, force)
+    return material
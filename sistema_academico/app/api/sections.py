@@ -1,14 +1,20 @@
 # app/api/sections.py
+import os
+import shutil
+import tempfile
 from typing import Any, List
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, File, Form, UploadFile
 from sqlalchemy.orm import Session
 
 from app import crud
 from app.api.auth import get_current_active_user
+from app.core.config import settings
 from app.database import get_db
 from app.schemas.courses import Section, SectionCreate, SectionUpdate
-from app.schemas.students import Enrollment, EnrollmentCreate
+from app.schemas.students import Enrollment, EnrollmentCreate, GradeImportReport, OMRReport
 from app.schemas.users import User
+from app.services.grade_import import GradeImport, GradeImportError
+from app.services.omr import OMRError, OpticalMarkReader, scan_extension
 
 router = APIRouter()
 
@@ -173,4 +179,86 @@ def create_section_enrollment(
     )
     
     enrollment = crud.create_enrollment(db=db, enrollment_in=enrollment_in)
-    return enrollment
\ No newline at end of file
+    return enrollment
+
+
+@router.post("/{section_id}/grades/import", response_model=GradeImportReport)
+def import_section_grades(
+    *,
+    db: Session = Depends(get_db),
+    section_id: int,
+    file: UploadFile = File(...),
+    current_user: User = Depends(get_current_active_user),
+) -> Any:
+    """
+    Importar calificaciones de una sección desde un archivo CSV o XLSX con
+    las columnas identificación, examen, nota y (opcional) comentarios.
+    Se registran las filas válidas y se informa el error de cada fila rechazada.
+    """
+    section = crud.get_section(db=db, section_id=section_id)
+    if not section:
+        raise HTTPException(status_code=404, detail="Sección no encontrada")
+    
+    try:
+        return GradeImport.import_grades(
+            db,
+            section_id=section_id,
+            course_id=section.course_id,
+            rows=GradeImport.read_rows(file.file, file.filename or ""),
+            user_id=current_user.id,
+            max_rows=settings.GRADE_IMPORT_MAX_ROWS
+        )
+    except GradeImportError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.post("/{section_id}/grades/omr", response_model=OMRReport)
+def grade_section_answer_sheets(
+    *,
+    db: Session = Depends(get_db),
+    section_id: int,
+    exam_id: int = Form(...),
+    files: List[UploadFile] = File(...),
+    current_user: User = Depends(get_current_active_user),
+) -> Any:
+    """
+    Calificar por lectura óptica las hojas de respuestas escaneadas de una
+    sección (imágenes TIFF de una o varias páginas, PNG o JPEG), impresas
+    desde /exams/omr-sheet/{exam_id}. Se registra una calificación por hoja
+    válida y se informa el error de cada página rechazada.
+    """
+    section = crud.get_section(db=db, section_id=section_id)
+    if not section:
+        raise HTTPException(status_code=404, detail="Sección no encontrada")
+    
+    exam = crud.get_exam_with_questions(db=db, exam_id=exam_id)
+    if not exam:
+        raise HTTPException(status_code=404, detail="Examen no encontrado")
+    if exam.course_id != section.course_id:
+        raise HTTPException(status_code=400, detail="El examen no pertenece al curso de la sección")
+    
+    try:
+        layout = OpticalMarkReader.layout_for_exam(exam, id_digits=settings.OMR_ID_DIGITS)
+        # Los procesos de lectura abren los archivos por ruta
+        with tempfile.TemporaryDirectory() as directory:
+            scans = []
+            for index, file in enumerate(files):
+                path = os.path.join(directory, f"{index}{scan_extension(file.filename)}")
+                with open(path, "wb") as buffer:
+                    shutil.copyfileobj(file.file, buffer)
+                scans.append((file.filename, path))
+            
+            pages = OpticalMarkReader.read_scans(
+                scans,
+                layout,
+                fill_threshold=settings.OMR_FILL_THRESHOLD,
+                work_dpi=settings.OMR_WORK_DPI,
+                pages_per_task=settings.OMR_PAGES_PER_TASK,
+                max_pages=settings.OMR_MAX_PAGES
+            )
+    except OMRError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return OpticalMarkReader.grade_pages(
+        db, section_id=section_id, exam=exam, pages=pages, user_id=current_user.id
+    )
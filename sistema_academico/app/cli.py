@@ -0,0 +1,192 @@
+# app/cli.py
+"""
+Comandos de administración del sistema académico.
+
+Uso (desde sistema_academico/):
+    python -m app.cli generate-batch --all-active --title "Parcial 1" --exam-type parcial
+    python -m app.cli generate-batch --course-ids 1 2 3 --config config.json --json
+    python -m app.cli calibrate-difficulty --min-responses 50
+"""
+import argparse
+import json
+import sys
+import time
+from concurrent.futures import wait
+
+from app import crud
+from app.core.config import settings
+from app.database import Base, SessionLocal, engine
+from app.db import courses, users  # noqa: F401 (registra los modelos en Base)
+from app.db.search import create_material_search_index
+from app.schemas.exams import ExamConfig
+from app.services.calibration import DifficultyCalibration
+from app.services.generation import ExamGenerationPipeline
+from app.services.workers import shutdown_pools
+
+
+def build_exam_config(args: argparse.Namespace) -> ExamConfig:
+    """
+    Configuración del examen: el archivo --config, con las opciones de la
+    línea de comandos por encima
+    """
+    config_data = {}
+    if args.config:
+        with open(args.config, "r", encoding="utf-8") as file:
+            config_data = json.load(file)
+    for field in ("title", "description", "exam_type", "num_questions", "num_concepts", "seed"):
+        value = getattr(args, field)
+        if value is not None:
+            config_data[field] = value
+    return ExamConfig(**config_data)
+
+
+def generate_batch(args: argparse.Namespace) -> int:
+    """
+    Genera un examen por curso con la misma configuración y espera a que
+    terminen todos. Retorna 1 si algún curso falló.
+    """
+    config = build_exam_config(args)
+    start = time.perf_counter()
+
+    db = SessionLocal()
+    try:
+        user = crud.get_by_email(db, email=args.user_email)
+        if not user:
+            print(f"Usuario no encontrado: {args.user_email}", file=sys.stderr)
+            return 1
+
+        if args.all_active:
+            # Se pide uno más que el máximo para detectar si no caben en un lote
+            courses_found = crud.get_courses(db, limit=settings.GENERATION_MAX_BATCH_COURSES + 1)
+            course_ids = [course.id for course in courses_found]
+        else:
+            course_ids = list(dict.fromkeys(args.course_ids))
+            missing = [course_id for course_id in course_ids if not crud.get_course(db, course_id=course_id)]
+            if missing:
+                print(f"Cursos no encontrados: {missing}", file=sys.stderr)
+                return 1
+        if not course_ids:
+            print("No hay cursos para generar exámenes", file=sys.stderr)
+            return 1
+        if len(course_ids) > settings.GENERATION_MAX_BATCH_COURSES:
+            print(
+                f"Un lote admite como máximo {settings.GENERATION_MAX_BATCH_COURSES} cursos: "
+                "indique los cursos con --course-ids en varios lotes",
+                file=sys.stderr
+            )
+            return 1
+
+        batch_id, jobs = ExamGenerationPipeline.create_batch(
+            db, course_ids=course_ids, config=config, user_id=user.id
+        )
+        job_ids = [job.id for job in jobs]
+    finally:
+        db.close()
+
+    print(f"Lote {batch_id}: {len(job_ids)} cursos", file=sys.stderr)
+    try:
+        wait(ExamGenerationPipeline.run_batch(job_ids))
+    finally:
+        shutdown_pools()
+
+    db = SessionLocal()
+    try:
+        jobs = crud.get_generation_jobs_by_batch(db, batch_id=batch_id)
+        summary = ExamGenerationPipeline.batch_summary(batch_id, jobs)
+        elapsed = time.perf_counter() - start
+
+        if args.json:
+            print(json.dumps({
+                "batch_id": batch_id,
+                "total": summary["total"],
+                "status_counts": summary["status_counts"],
+                "seconds": round(elapsed, 3),
+                "jobs": [
+                    {
+                        "job_id": job.id,
+                        "course_id": job.course_id,
+                        "status": job.status,
+                        "error": job.error,
+                        "artifacts": (job.result or {}).get("artifacts", {})
+                    }
+                    for job in jobs
+                ]
+            }, indent=2, ensure_ascii=False))
+        else:
+            for job in jobs:
+                detail = job.error or (job.result or {}).get("artifacts", {}).get("exam", "")
+                print(f"curso {job.course_id}: {job.status} {detail}")
+            counts = ", ".join(f"{status}: {count}" for status, count in summary["status_counts"].items())
+            print(f"{summary['total']} cursos en {elapsed:.1f} s ({counts})", file=sys.stderr)
+
+        return 1 if summary["status_counts"].get("failed") else 0
+    finally:
+        db.close()
+
+
+def calibrate_difficulty(args: argparse.Namespace) -> int:
+    """
+    Calibra la dificultad de preguntas y conceptos con las respuestas
+    registradas desde la ejecución anterior
+    """
+    start = time.perf_counter()
+    db = SessionLocal()
+    try:
+        summary = DifficultyCalibration.run(
+            db, batch_size=args.batch_size, min_responses=args.min_responses
+        )
+    finally:
+        db.close()
+    elapsed = time.perf_counter() - start
+
+    if args.json:
+        print(json.dumps(dict(summary, seconds=round(elapsed, 3)), indent=2, ensure_ascii=False))
+    else:
+        print(
+            f"{summary['responses']} respuestas nuevas en {elapsed:.1f} s: {summary['questions']} preguntas y "
+            f"{summary['concepts']} conceptos calibrados (última respuesta {summary['last_response_id']})",
+            file=sys.stderr
+        )
+    return 0 if summary["status"] == "completed" else 1
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    batch_parser = subparsers.add_parser("generate-batch", help="Generar exámenes para varios cursos")
+    courses_group = batch_parser.add_mutually_exclusive_group(required=True)
+    courses_group.add_argument("--course-ids", nargs="+", type=int, help="Cursos para los que generar exámenes")
+    courses_group.add_argument("--all-active", action="store_true", help="Todos los cursos activos")
+    batch_parser.add_argument("--config", help="Archivo JSON con la configuración del examen (ExamConfig)")
+    batch_parser.add_argument("--title", help="Título del examen")
+    batch_parser.add_argument("--description", help="Descripción del examen")
+    batch_parser.add_argument("--exam-type", dest="exam_type", choices=["parcial", "final", "repaso"], help="Tipo de examen")
+    batch_parser.add_argument("--num-questions", dest="num_questions", type=int, help="Número de preguntas")
+    batch_parser.add_argument("--num-concepts", dest="num_concepts", type=int, help="Número de conceptos")
+    batch_parser.add_argument("--seed", type=int, help="Semilla: con la misma semilla se repite el mismo examen")
+    batch_parser.add_argument("--user-email", default=settings.ADMIN_EMAIL, help="Usuario que registra los exámenes")
+    batch_parser.add_argument("--json", action="store_true", help="Imprimir el resultado en JSON")
+    batch_parser.set_defaults(func=generate_batch)
+
+    calibration_parser = subparsers.add_parser(
+        "calibrate-difficulty", help="Calibrar la dificultad con los resultados de los exámenes"
+    )
+    calibration_parser.add_argument(
+        "--batch-size", dest="batch_size", type=int, default=settings.CALIBRATION_BATCH_SIZE, help="Respuestas por lote"
+    )
+    calibration_parser.add_argument(
+        "--min-responses", dest="min_responses", type=int, default=settings.CALIBRATION_MIN_RESPONSES,
+        help="Respuestas necesarias para reemplazar la dificultad asignada"
+    )
+    calibration_parser.add_argument("--json", action="store_true", help="Imprimir el resultado en JSON")
+    calibration_parser.set_defaults(func=calibrate_difficulty)
+
+    args = parser.parse_args()
+    Base.metadata.create_all(bind=engine)
+    create_material_search_index(engine)
+    sys.exit(args.func(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -26,6 +26,60 @@ class Settings(BaseSettings):
     # Base de datos
     DATABASE_URL: str = "sqlite:///./app.db"
     
+    # Almacenamiento de materiales por contenido
+    BLOB_STORAGE_DIR: str = "storage/blobs"
+    BLOB_GC_GRACE_SECONDS: int = 60 * 60  # 1 hora
+
+    # Caché de extracción de documentos
+    EXTRACTION_CACHE_ENABLED: bool = True
+    EXTRACTION_CACHE_DIR: str = "storage/cache/extraction"
+    EXTRACTION_CACHE_MAX_BYTES: int = 512 * 1024 * 1024  # 512 MB
+
+    # Límites de extracción de PDF (None o 0 = sin límite de páginas)
+    PDF_MAX_PAGES: Optional[int] = None
+    EXTRACTION_MAX_TEXT_BYTES: int = 256 * 1024 * 1024  # 256 MB de texto en UTF-8
+
+    # Pool de procesos para tareas intensivas en CPU (None = número de CPUs)
+    PROCESS_POOL_MAX_WORKERS: Optional[int] = None
+
+    # Trabajos de generación de exámenes
+    GENERATION_MAX_WORKERS: int = 2  # Trabajos individuales ejecutándose a la vez
+    GENERATION_BATCH_MAX_WORKERS: Optional[int] = None  # Trabajos de lotes a la vez (None = número de CPUs)
+    GENERATION_MAX_PENDING_JOBS: int = 2000  # Trabajos en cola o en ejecución, incluidos los de lotes
+    GENERATION_MAX_BATCH_COURSES: int = 1000  # Cursos por lote
+    GENERATION_HEARTBEAT_SECONDS: int = 30  # Cada cuánto un proceso marca sus trabajos como vivos
+    GENERATION_HEARTBEAT_TIMEOUT_SECONDS: int = 120  # Sin señal por este tiempo, el trabajo se da por interrumpido
+
+    # Caché de índices de distractores por material y por curso
+    DISTRACTOR_CACHE_DIR: str = "storage/cache/distractors"
+    DISTRACTOR_CACHE_MAX_BYTES: int = 256 * 1024 * 1024  # 256 MB
+
+    # Caché de exámenes generados con semilla
+    GENERATION_CACHE_ENABLED: bool = True
+    GENERATION_CACHE_DIR: str = "storage/cache/exams"
+    GENERATION_CACHE_MAX_BYTES: int = 1024 * 1024 * 1024  # 1 GB
+    GENERATION_CACHE_MAX_AGE_SECONDS: int = 60 * 60 * 24 * 7  # 7 días
+
+    # Importación masiva de calificaciones
+    GRADE_IMPORT_MAX_ROWS: int = 20000
+
+    # Calificación automática de respuestas de selección múltiple
+    AUTO_GRADING_MAX_RESPONSES: int = 20000  # Estudiantes por solicitud
+
+    # Análisis de ítems
+    ITEM_ANALYSIS_MIN_RESPONSES: int = 30  # Respuestas para marcar una pregunta
+
+    # Calibración de dificultad con los resultados observados
+    CALIBRATION_BATCH_SIZE: int = 5000  # Respuestas por lote
+    CALIBRATION_MIN_RESPONSES: int = 30  # Respuestas para reemplazar la dificultad asignada
+
+    # Lectura óptica de hojas de respuestas
+    OMR_ID_DIGITS: int = 10  # Columnas de la identificación en la hoja
+    OMR_FILL_THRESHOLD: float = 0.45  # Fracción oscura para dar una burbuja por marcada
+    OMR_WORK_DPI: int = 100  # Resolución a la que se analizan las páginas
+    OMR_PAGES_PER_TASK: int = 8  # Páginas por tarea del pool de procesos
+    OMR_MAX_PAGES: int = 10000  # Páginas por carga
+
     # Admin default
     ADMIN_EMAIL: EmailStr = "admin@example.com"
     ADMIN_PASSWORD: str = "admin123"
@@ -3,14 +3,36 @@ from app.crud.users import get_by_email, get_by_id, create, update, authenticate
 from app.crud.courses import (
     get_course, get_courses, get_courses_by_user, create_course, update_course, delete_course,
     get_section, get_sections_by_course, create_section, update_section, delete_section,
-    get_material, get_materials_by_course, create_material, update_material, 
-    add_material_to_course, remove_material_from_course
+    get_material, get_materials_by_course, get_materials_by_courses,
+    create_material, update_material, replace_material_file,
+    add_material_to_course, remove_material_from_course,
+    get_blob, acquire_blob, release_blob, collect_unreferenced_blobs,
+    set_material_ingestion_status, get_material_content, get_material_content_hashes,
+    save_material_content,
+    touch_material_content,
+    concept_sample_key, bump_concepts_version, sync_material_concepts, get_existing_concept_ids,
+    get_concepts_by_materials,
+    get_distractor_concepts, count_concepts_by_difficulty, sample_concepts,
+    search_index_available, sync_material_search_index, search_materials
+)
+from app.crud.exams import (
+    get_exam, get_exam_with_questions, get_exam_courses, get_exams, create_exam_questions, create_exam,
+    create_exam_responses, increment_item_stats, get_item_stats,
+    get_exam_responses_after, get_exam_keys, increment_concept_stats,
+    get_question_stat_counts, get_concept_stat_counts, set_difficulties,
+    get_calibration_watermark, advance_calibration_watermark,
+    get_generation_job, get_generation_jobs_by_user, get_generation_jobs_by_batch,
+    count_pending_generation_jobs, create_generation_job, create_generation_jobs,
+    update_generation_job, set_generation_job_stage, touch_generation_jobs,
+    fail_interrupted_generation_jobs
 )
 from app.crud.students import (
     get_student, get_student_by_email, get_student_by_identification, get_students, 
     create_student, update_student, delete_student,
     get_enrollment, get_enrollments_by_student, get_enrollments_by_section,
     create_enrollment, update_enrollment, delete_enrollment,
+    get_section_enrollments_by_identification, get_existing_identifications,
     get_grade, get_grades_by_student, get_grades_by_exam, get_grades_by_enrollment,
-    create_grade, update_grade, delete_grade
+    get_grade_by_enrollment_and_exam, get_graded_pairs_by_section,
+    create_grade, create_grades, update_grade, delete_grade
 )
\ No newline at end of file
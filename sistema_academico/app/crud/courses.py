@@ -1,10 +1,21 @@
 # app/crud/courses.py
+import hashlib
+import random
+import re
 from typing import List, Optional, Union, Dict, Any
+from sqlalchemy import bindparam, func, text
 from sqlalchemy.orm import Session
 
-from app.db.courses import Course, Section, Material
+from app.db.courses import (
+    Course, Section, Material, MaterialContent, Concept, ConceptStat, Blob, Question, course_material
+)
+from app.db.search import MATERIAL_SEARCH_TABLE
 from app.schemas.courses import CourseCreate, CourseUpdate, SectionCreate, SectionUpdate, MaterialCreate, MaterialUpdate
 
+# Búsquedas en el índice por concepto pedido antes de leer el material completo
+# (ver _sample_material_concepts)
+SAMPLE_MAX_PIVOTS_PER_CONCEPT = 8
+
 
 # --- Cursos ---
 def get_course(db: Session, course_id: int) -> Optional[Course]:
@@ -122,8 +133,21 @@ def get_materials_by_course(
         return course.materials[skip:skip+limit]
     return []
 
+def get_materials_by_courses(db: Session, course_ids: List[int]) -> List[Material]:
+    """
+    Materiales de varios cursos, sin repetir los que comparten
+    """
+    return (
+        db.query(Material)
+        .join(course_material, course_material.c.material_id == Material.id)
+        .filter(course_material.c.course_id.in_(course_ids))
+        .distinct()
+        .all()
+    )
+
 def create_material(
-    db: Session, material_in: MaterialCreate, user_id: int, file_path: str, course_id: int = None
+    db: Session, material_in: MaterialCreate, user_id: int, file_path: str, course_id: int = None,
+    blob_in: Optional[Dict[str, Any]] = None
 ) -> Material:
     import datetime
     
@@ -135,6 +159,9 @@ def create_material(
         uploaded_by_id=user_id,
         upload_date=datetime.datetime.utcnow().isoformat(),
     )
+    # Si el archivo está en el almacenamiento por contenido, referenciarlo
+    if blob_in:
+        db_material.blob_key = acquire_blob(db, blob_in).key
     db.add(db_material)
     db.commit()
     db.refresh(db_material)
@@ -159,6 +186,26 @@ def update_material(
     for field in update_data:
         setattr(db_obj, field, update_data[field])
     
+    db.add(db_obj)
+    if "title" in update_data:
+        sync_material_search_index(db, db_obj)
+    db.commit()
+    db.refresh(db_obj)
+    return db_obj
+
+def replace_material_file(
+    db: Session, db_obj: Material, blob_in: Dict[str, Any], file_type: str
+) -> Material:
+    """
+    Apunta un material a un nuevo archivo y libera la referencia al anterior
+    """
+    old_blob_key = db_obj.blob_key
+    db_obj.blob_key = acquire_blob(db, blob_in).key
+    db_obj.file_path = blob_in["file_path"]
+    db_obj.file_type = file_type
+    if old_blob_key:
+        release_blob(db, old_blob_key)
+    
     db.add(db_obj)
     db.commit()
     db.refresh(db_obj)
@@ -171,6 +218,7 @@ def add_material_to_course(db: Session, material_id: int, course_id: int) -> boo
     if material and course:
         if material not in course.materials:
             course.materials.append(material)
+            sync_material_search_index(db, material)
             db.commit()
             return True
     return False
@@ -181,6 +229,471 @@ def remove_material_from_course(db: Session, material_id: int, course_id: int) -
     
     if material and course and material in course.materials:
         course.materials.remove(material)
+        sync_material_search_index(db, material)
         db.commit()
         return True
-    return False
\ No newline at end of file
+    return False
+
+# --- Archivos en almacenamiento por contenido ---
+def get_blob(db: Session, key: str) -> Optional[Blob]:
+    return db.query(Blob).filter(Blob.key == key).first()
+
+def acquire_blob(db: Session, blob_in: Dict[str, Any]) -> Blob:
+    """
+    Registra una nueva referencia a un archivo, creándolo si no existe.
+    No hace commit: forma parte de la transacción de quien la llama.
+    """
+    updated = (
+        db.query(Blob)
+        .filter(Blob.key == blob_in["key"])
+        .update(
+            {Blob.ref_count: Blob.ref_count + 1, Blob.released_at: None},
+            synchronize_session=False
+        )
+    )
+    if not updated:
+        db.add(Blob(
+            key=blob_in["key"],
+            content_hash=blob_in["content_hash"],
+            file_path=blob_in["file_path"],
+            size=blob_in["size"],
+            ref_count=1,
+        ))
+        db.flush()
+    return get_blob(db, key=blob_in["key"])
+
+def release_blob(db: Session, key: str) -> None:
+    """
+    Elimina una referencia a un archivo. Cuando no quedan referencias se marca
+    la fecha, y collect_unreferenced_blobs lo borrará pasado un tiempo de gracia.
+    No hace commit: forma parte de la transacción de quien la llama.
+    """
+    import datetime
+    
+    db.query(Blob).filter(Blob.key == key).update(
+        {Blob.ref_count: Blob.ref_count - 1}, synchronize_session=False
+    )
+    db.query(Blob).filter(Blob.key == key, Blob.ref_count <= 0).update(
+        {Blob.ref_count: 0, Blob.released_at: datetime.datetime.utcnow().isoformat()},
+        synchronize_session=False
+    )
+
+def collect_unreferenced_blobs(db: Session, grace_seconds: int) -> List[str]:
+    """
+    Borra los registros de archivos sin referencias desde hace más de
+    grace_seconds y retorna sus rutas para eliminar los archivos.
+    No hace commit: quien la llama elimina los archivos y luego confirma
+    (ver BlobStorage.collect_garbage).
+    """
+    import datetime
+    
+    threshold = (datetime.datetime.utcnow() - datetime.timedelta(seconds=grace_seconds)).isoformat()
+    blobs = (
+        db.query(Blob)
+        .filter(Blob.ref_count == 0, Blob.released_at.isnot(None), Blob.released_at < threshold)
+        .all()
+    )
+    
+    file_paths = []
+    for blob in blobs:
+        # Se vuelve a comprobar en el DELETE por si alguien lo referenció mientras tanto
+        deleted = (
+            db.query(Blob)
+            .filter(Blob.key == blob.key, Blob.ref_count == 0)
+            .delete(synchronize_session=False)
+        )
+        if deleted:
+            file_paths.append(blob.file_path)
+    return file_paths
+
+
+# --- Contenido extraído de materiales ---
+def set_material_ingestion_status(
+    db: Session, db_obj: Material, status: str, error: Optional[str] = None
+) -> Material:
+    db_obj.ingestion_status = status
+    db_obj.ingestion_error = error
+    db.add(db_obj)
+    db.commit()
+    db.refresh(db_obj)
+    return db_obj
+
+def get_material_content(db: Session, material_id: int) -> Optional[MaterialContent]:
+    return db.query(MaterialContent).filter(MaterialContent.material_id == material_id).first()
+
+def get_material_content_hashes(db: Session, material_ids: List[int]) -> Dict[int, str]:
+    """
+    Hash del contenido extraído de cada material, sin cargar el texto
+    """
+    rows = (
+        db.query(MaterialContent.material_id, MaterialContent.content_hash)
+        .filter(MaterialContent.material_id.in_(material_ids))
+        .all()
+    )
+    return {material_id: content_hash for material_id, content_hash in rows}
+
+def save_material_content(
+    db: Session, db_obj: Material, content_in: Dict[str, Any]
+) -> MaterialContent:
+    """
+    Guarda (o reemplaza) el contenido extraído de un material y lo marca como listo
+    """
+    import datetime
+    
+    db_content = get_material_content(db, material_id=db_obj.id)
+    if not db_content:
+        db_content = MaterialContent(material_id=db_obj.id)
+    
+    # Los conceptos solo se comparan por sección si se extrajeron con la
+    # misma versión del procesador
+    same_version = db_content.processor_version == content_in["processor_version"]
+    
+    db_content.content_hash = content_in["content_hash"]
+    db_content.file_mtime = content_in.get("file_mtime")
+    db_content.file_size = content_in.get("file_size")
+    db_content.processor_version = content_in["processor_version"]
+    db_content.raw_text = content_in["raw_text"]
+    db_content.processed_content = content_in["processed_content"]
+    db_content.extracted_at = datetime.datetime.utcnow().isoformat()
+    
+    sync_material_concepts(
+        db, material_id=db_obj.id, concepts=content_in["concepts"], keep_unchanged=same_version
+    )
+    sync_material_search_index(db, db_obj, body=content_in["raw_text"])
+    
+    db_obj.ingestion_status = "ready"
+    db_obj.ingestion_error = None
+    db.add(db_content)
+    db.add(db_obj)
+    db.commit()
+    db.refresh(db_content)
+    return db_content
+
+
+def touch_material_content(
+    db: Session, db_content: MaterialContent, file_mtime: float, file_size: int
+) -> MaterialContent:
+    """
+    Registra la fecha de modificación y el tamaño actuales de un archivo cuyo
+    contenido no cambió
+    """
+    db_content.file_mtime = file_mtime
+    db_content.file_size = file_size
+    db.add(db_content)
+    db.commit()
+    db.refresh(db_content)
+    return db_content
+
+
+# --- Conceptos ---
+def concept_to_dict(concept: Concept) -> Dict[str, Any]:
+    return {
+        "id": concept.id,
+        "material_id": concept.material_id,
+        "type": concept.concept_type,
+        "term": concept.term,
+        "content": concept.content,
+        "difficulty": concept.difficulty,
+        "position": concept.position,
+        "section_hash": concept.section_hash,
+        "length_bucket": concept.length_bucket,
+    }
+
+def concept_sample_key(section_hash: Optional[str], concept_type: str, term: str) -> float:
+    """
+    Clave de muestreo de un concepto en [0, 1), derivada de su sección y su
+    término: el mismo material da siempre las mismas claves, de modo que el
+    muestreo con semilla no cambia al volver a procesarlo
+    """
+    digest = hashlib.sha1(f"{section_hash}\0{concept_type}\0{term}".encode("utf-8")).digest()
+    return int.from_bytes(digest[:7], "big") / 2 ** 56
+
+def bump_concepts_version(db: Session, material_ids: List[int]) -> None:
+    """
+    Marca que cambió el banco de conceptos de los materiales, lo que invalida
+    los exámenes guardados en caché que salieron de ellos. No hace commit.
+    """
+    if material_ids:
+        db.query(Material).filter(Material.id.in_(material_ids)).update(
+            {Material.concepts_version: Material.concepts_version + 1}, synchronize_session=False
+        )
+
+def sync_material_concepts(
+    db: Session, material_id: int, concepts: List[Dict[str, Any]], keep_unchanged: bool = True
+) -> Dict[str, int]:
+    """
+    Actualiza los conceptos de un material comparando por sección: se
+    conservan los conceptos de secciones sin cambios (con su id y su
+    dificultad), se eliminan los de secciones que ya no existen y solo se
+    insertan los de secciones nuevas o modificadas, con inserción masiva.
+    Con keep_unchanged=False se reemplazan todos los conceptos.
+    No hace commit: forma parte de la transacción de quien la llama.
+    """
+    new_hashes = {concept.get("section_hash") for concept in concepts} if keep_unchanged else set()
+    existing = (
+        db.query(Concept.id, Concept.section_hash, Concept.concept_type, Concept.term)
+        .filter(Concept.material_id == material_id)
+        .all()
+    )
+    kept_hashes = {row.section_hash for row in existing if row.section_hash in new_hashes}
+    
+    # Eliminar los conceptos de secciones modificadas o eliminadas. Las
+    # preguntas ya guardadas que salieron de ellos quedan sin concepto, para
+    # que la calibración no acumule aciertos en conceptos inexistentes
+    removed_ids = [row.id for row in existing if row.section_hash not in kept_hashes]
+    if removed_ids:
+        db.query(Question).filter(Question.concept_id.in_(removed_ids)).update(
+            {Question.concept_id: None}, synchronize_session=False
+        )
+        db.query(ConceptStat).filter(ConceptStat.concept_id.in_(removed_ids)).delete(synchronize_session=False)
+        db.query(Concept).filter(Concept.id.in_(removed_ids)).delete(synchronize_session=False)
+    
+    # Actualizar la posición de los conservados según el nuevo orden
+    positions = {
+        (concept.get("section_hash"), concept["type"], concept["term"]): position
+        for position, concept in enumerate(concepts)
+    }
+    kept_positions = [
+        {"concept_id": row.id, "position": positions[(row.section_hash, row.concept_type, row.term)]}
+        for row in existing
+        if row.section_hash in kept_hashes and (row.section_hash, row.concept_type, row.term) in positions
+    ]
+    if kept_positions:
+        db.execute(
+            Concept.__table__.update()
+            .where(Concept.__table__.c.id == bindparam("concept_id"))
+            .values(position=bindparam("position")),
+            kept_positions
+        )
+    
+    # Insertar los conceptos de secciones nuevas o modificadas
+    new_rows = [
+        {
+            "material_id": material_id,
+            "concept_type": concept["type"],
+            "term": concept["term"],
+            "content": concept["content"],
+            "difficulty": concept.get("difficulty", "medium"),
+            "position": position,
+            "section_hash": concept.get("section_hash"),
+            "sample_key": concept_sample_key(concept.get("section_hash"), concept["type"], concept["term"]),
+            "length_bucket": concept.get("length_bucket"),
+        }
+        for position, concept in enumerate(concepts)
+        if concept.get("section_hash") not in kept_hashes
+    ]
+    if new_rows:
+        db.execute(Concept.__table__.insert(), new_rows)
+    if existing and (removed_ids or new_rows):
+        bump_concepts_version(db, [material_id])
+    
+    return {"kept": len(existing) - len(removed_ids), "removed": len(removed_ids), "added": len(new_rows)}
+
+def get_existing_concept_ids(db: Session, concept_ids: List[int]) -> List[int]:
+    """
+    Los ids de concept_ids que todavía existen
+    """
+    return [row[0] for row in db.query(Concept.id).filter(Concept.id.in_(concept_ids))]
+
+def get_concepts_by_materials(db: Session, material_ids: List[int]) -> List[Dict[str, Any]]:
+    """
+    Obtener todos los conceptos de varios materiales, en orden de aparición
+    """
+    concepts = (
+        db.query(Concept)
+        .filter(Concept.material_id.in_(material_ids))
+        .order_by(Concept.material_id, Concept.position)
+        .all()
+    )
+    return [concept_to_dict(concept) for concept in concepts]
+
+def get_distractor_concepts(
+    db: Session, material_ids: List[int], concept_types: List[str]
+) -> List[Dict[str, Any]]:
+    """
+    Término, contenido, grupo de longitud y sección de los conceptos de
+    ciertos tipos, para armar las entradas del índice de distractores de
+    materiales que no las tienen en la caché
+    """
+    rows = (
+        db.query(Concept.concept_type, Concept.term, Concept.content, Concept.length_bucket, Concept.section_hash)
+        .filter(Concept.material_id.in_(material_ids), Concept.concept_type.in_(concept_types))
+        .order_by(Concept.id)
+        .all()
+    )
+    return [
+        {
+            "type": row.concept_type,
+            "term": row.term,
+            "content": row.content,
+            "length_bucket": row.length_bucket,
+            "section_hash": row.section_hash,
+        }
+        for row in rows
+    ]
+
+def count_concepts_by_difficulty(db: Session, material_ids: List[int]) -> Dict[str, int]:
+    """
+    Cantidad de conceptos disponibles por dificultad en un conjunto de materiales
+    """
+    rows = (
+        db.query(Concept.difficulty, func.count(Concept.id))
+        .filter(Concept.material_id.in_(material_ids))
+        .group_by(Concept.difficulty)
+        .all()
+    )
+    return {difficulty: count for difficulty, count in rows}
+
+def sample_concepts(
+    db: Session,
+    material_ids: List[int],
+    difficulty: str,
+    limit: int,
+    rng: Optional[random.Random] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Muestra aleatoria de conceptos de una dificultad. El cupo se reparte al
+    azar entre los materiales según cuántos conceptos tiene cada uno y, dentro
+    de cada material, cada concepto se busca en el índice
+    (material_id, difficulty, sample_key) a partir de su propio punto
+    aleatorio. El costo depende del tamaño de la muestra y de los materiales
+    del curso, no del total de conceptos, y los conceptos elegidos no son
+    consecutivos en el índice.
+    """
+    if limit <= 0:
+        return []
+    if rng is None:
+        rng = random.Random()
+    
+    counts = (
+        db.query(Concept.material_id, func.count(Concept.id))
+        .filter(Concept.material_id.in_(material_ids), Concept.difficulty == difficulty)
+        .group_by(Concept.material_id)
+        .order_by(Concept.material_id)
+        .all()
+    )
+    total = sum(count for _, count in counts)
+    # Posiciones elegidas sin reemplazo sobre todos los conceptos disponibles
+    positions = sorted(rng.sample(range(total), min(limit, total)))
+    
+    concepts = []
+    start = 0
+    for material_id, count in counts:
+        taken = sum(1 for position in positions if start <= position < start + count)
+        start += count
+        if taken:
+            concepts += _sample_material_concepts(db, material_id, difficulty, taken, count, rng)
+    return [concept_to_dict(concept) for concept in concepts]
+
+def _sample_material_concepts(
+    db: Session, material_id: int, difficulty: str, limit: int, available: int, rng: random.Random
+) -> List[Concept]:
+    query = db.query(Concept).filter(Concept.material_id == material_id, Concept.difficulty == difficulty)
+    if limit * 2 >= available:
+        # Con pocos conceptos para elegir conviene leerlos todos
+        return rng.sample(query.order_by(Concept.id).all(), limit)
+    
+    chosen: Dict[int, Concept] = {}
+    for _ in range(limit * SAMPLE_MAX_PIVOTS_PER_CONCEPT):
+        if len(chosen) == limit:
+            break
+        pivot = rng.random()
+        concept = (
+            query.filter(Concept.sample_key >= pivot).order_by(Concept.sample_key).first()
+            # Dar la vuelta al llegar al final del índice
+            or query.order_by(Concept.sample_key).first()
+        )
+        chosen.setdefault(concept.id, concept)
+    else:
+        # Claves repetidas o sin asignar: completar con el resto del material
+        rest = [concept for concept in query.order_by(Concept.id).all() if concept.id not in chosen]
+        for concept in rng.sample(rest, limit - len(chosen)):
+            chosen[concept.id] = concept
+    return list(chosen.values())
+
+
+# --- Búsqueda de texto completo en materiales ---
+def search_index_available(db: Session) -> bool:
+    return db.get_bind().dialect.name == "sqlite"
+
+def sync_material_search_index(
+    db: Session, db_obj: Material, body: Optional[str] = None
+) -> None:
+    """
+    Actualiza la entrada de un material en el índice de búsqueda: se indexa si
+    tiene contenido extraído y pertenece a algún curso, si no se elimina.
+    No hace commit: forma parte de la transacción de quien la llama.
+    """
+    if not search_index_available(db):
+        return
+    
+    db.execute(
+        text(f"DELETE FROM {MATERIAL_SEARCH_TABLE} WHERE rowid = :material_id"),
+        {"material_id": db_obj.id}
+    )
+    
+    if body is None and db_obj.content is not None:
+        body = db_obj.content.raw_text
+    if body is None or not db_obj.courses:
+        return
+    
+    db.execute(
+        text(
+            f"INSERT INTO {MATERIAL_SEARCH_TABLE} (rowid, title, body) "
+            "VALUES (:material_id, :title, :body)"
+        ),
+        {"material_id": db_obj.id, "title": db_obj.title, "body": body}
+    )
+
+def build_search_query(query: str) -> str:
+    """
+    Convierte el texto del usuario en una consulta FTS5 segura: cada palabra
+    se busca como término literal y deben aparecer todas
+    """
+    terms = re.findall(r"\w+", query)
+    return " ".join(f'"{term}"' for term in terms)
+
+def search_materials(
+    db: Session, query: str, course_id: Optional[int] = None, skip: int = 0, limit: int = 20
+) -> Dict[str, Any]:
+    """
+    Buscar en el texto de los materiales. Retorna el total de coincidencias y
+    la página pedida, ordenada por relevancia (bm25), con un fragmento del texto.
+    """
+    match = build_search_query(query)
+    params = {"match": match, "course_id": course_id, "skip": skip, "limit": limit}
+    
+    course_filter = ""
+    if course_id is not None:
+        course_filter = (
+            "AND EXISTS (SELECT 1 FROM course_material cm "
+            f"WHERE cm.material_id = {MATERIAL_SEARCH_TABLE}.rowid AND cm.course_id = :course_id)"
+        )
+    
+    total = db.execute(
+        text(
+            f"SELECT count(*) FROM {MATERIAL_SEARCH_TABLE} "
+            f"WHERE {MATERIAL_SEARCH_TABLE} MATCH :match {course_filter}"
+        ),
+        params
+    ).scalar()
+    
+    rows = db.execute(
+        text(
+            f"SELECT {MATERIAL_SEARCH_TABLE}.rowid AS material_id, "
+            f"{MATERIAL_SEARCH_TABLE}.title AS title, "
+            f"snippet({MATERIAL_SEARCH_TABLE}, 1, '**', '**', '…', 24) AS snippet, "
+            f"bm25({MATERIAL_SEARCH_TABLE}) AS score "
+            f"FROM {MATERIAL_SEARCH_TABLE} "
+            f"WHERE {MATERIAL_SEARCH_TABLE} MATCH :match {course_filter} "
+            "ORDER BY score LIMIT :limit OFFSET :skip"
+        ),
+        params
+    ).all()
+    
+    return {
+        "total": total,
+        "skip": skip,
+        "limit": limit,
+        "results": [dict(row._mapping) for row in rows],
+    }
@@ -0,0 +1,534 @@
+# app/crud/exams.py
+import datetime
+import uuid
+from typing import List, Optional, Dict, Any, Tuple
+from sqlalchemy import bindparam, or_
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, selectinload
+
+from app.crud.courses import bump_concepts_version
+from app.db.courses import (
+    CalibrationState, Concept, ConceptStat, Exam, ExamResponse, ExamStat, ExamVariant, GenerationJob,
+    OptionStat, Question, QuestionOption, QuestionStat
+)
+
+# Estados de un trabajo que todavía no terminó
+PENDING_JOB_STATUSES = ("queued", "running")
+
+
+# --- Exámenes ---
+def get_exam(db: Session, exam_id: int) -> Optional[Exam]:
+    return db.query(Exam).filter(Exam.id == exam_id).first()
+
+def get_exam_with_questions(db: Session, exam_id: int) -> Optional[Exam]:
+    """
+    Obtener un examen con sus preguntas, opciones y variantes cargadas en
+    pocas consultas, para compilar su clave de respuestas
+    """
+    return db.query(Exam).options(
+        selectinload(Exam.questions).selectinload(Question.options),
+        selectinload(Exam.exam_variants),
+    ).filter(Exam.id == exam_id).first()
+
+def get_exam_courses(db: Session, exam_ids: List[int]) -> Dict[int, int]:
+    """
+    Curso de cada examen existente: {id del examen: id del curso}
+    """
+    rows = db.query(Exam.id, Exam.course_id).filter(Exam.id.in_(list(set(exam_ids)))).all()
+    return {exam_id: course_id for exam_id, course_id in rows}
+
+def get_exams(
+    db: Session, course_id: Optional[int] = None, skip: int = 0, limit: int = 100
+) -> List[Exam]:
+    """
+    Obtener exámenes, opcionalmente de un curso, con sus preguntas, opciones
+    y variantes cargadas en pocas consultas
+    """
+    query = db.query(Exam).options(
+        selectinload(Exam.questions).selectinload(Question.options),
+        selectinload(Exam.exam_variants),
+    )
+    if course_id is not None:
+        query = query.filter(Exam.course_id == course_id)
+    return query.order_by(Exam.id.desc()).offset(skip).limit(limit).all()
+
+def create_exam_questions(
+    db: Session, exam_id: int, questions: List[Dict[str, Any]]
+) -> int:
+    """
+    Inserta las preguntas de un examen y sus opciones con dos inserciones
+    masivas (executemany) en lugar de una por fila. Los ids de las preguntas
+    se recuperan con una sola consulta por posición.
+    No hace commit: forma parte de la transacción de quien la llama.
+    Retorna la cantidad de opciones insertadas.
+    """
+    if not questions:
+        return 0
+    db.execute(Question.__table__.insert(), [
+        {
+            "exam_id": exam_id,
+            "concept_id": question.get("concept_id"),
+            "position": position,
+            "content": question["content"],
+            "question_type": question["question_type"],
+            "difficulty": question.get("difficulty"),
+            "points": question.get("points"),
+            "answer": question.get("answer"),
+        }
+        for position, question in enumerate(questions)
+    ])
+    
+    question_ids = dict(
+        db.query(Question.position, Question.id).filter(Question.exam_id == exam_id).all()
+    )
+    option_rows = [
+        {
+            "question_id": question_ids[position],
+            "position": option_position,
+            "content": option,
+            "is_correct": option == question.get("answer"),
+        }
+        for position, question in enumerate(questions)
+        for option_position, option in enumerate(question.get("options") or [])
+    ]
+    if option_rows:
+        db.execute(QuestionOption.__table__.insert(), option_rows)
+    return len(option_rows)
+
+def create_exam(
+    db: Session, exam_in: Dict[str, Any], user_id: int,
+    variants: Optional[List[Dict[str, Any]]] = None,
+    questions: Optional[List[Dict[str, Any]]] = None
+) -> Exam:
+    """
+    Crea un examen generado junto con sus variantes, sus preguntas y sus
+    opciones, todo en una sola transacción
+    """
+    db_exam = Exam(
+        title=exam_in["title"],
+        description=exam_in.get("description"),
+        course_id=exam_in["course_id"],
+        created_by_id=user_id,
+        exam_type=exam_in["exam_type"],
+        creation_date=exam_in["creation_date"],
+        file_path=exam_in.get("file_path"),
+        answer_key_path=exam_in.get("answer_key_path"),
+        answer_sheet_path=exam_in.get("answer_sheet_path"),
+    )
+    db.add(db_exam)
+    db.flush()
+
+    db.add_all([
+        ExamVariant(
+            exam_id=db_exam.id,
+            variant_code=variant["variant_code"],
+            file_path=variant["file_path"],
+            answer_key_path=variant["answer_key_path"],
+            answer_sheet_path=variant.get("answer_sheet_path"),
+            seed=variant.get("seed"),
+            question_order=variant.get("question_order"),
+            option_orders=variant.get("option_orders"),
+            answer_key=variant.get("answer_key"),
+        )
+        for variant in variants or []
+    ])
+    create_exam_questions(db, exam_id=db_exam.id, questions=questions or [])
+    db.commit()
+    db.refresh(db_exam)
+    return db_exam
+
+
+# --- Respuestas y análisis de ítems ---
+def create_exam_responses(db: Session, responses_in: List[Dict[str, Any]]) -> int:
+    """
+    Guarda las respuestas calificadas de varios estudiantes con una inserción
+    masiva. No hace commit: forma parte de la transacción de quien la llama.
+    """
+    if responses_in:
+        db.execute(ExamResponse.__table__.insert(), responses_in)
+    return len(responses_in)
+
+def _increment(db: Session, table, key: str, columns: List[str], rows: List[Dict[str, Any]]) -> None:
+    """
+    Suma los valores de rows a las columnas de cada fila de table, en la
+    base de datos (columna = columna + valor), con una sola sentencia
+    executemany. Las filas usan claves b_<columna> para no chocar con los
+    nombres de las columnas.
+    """
+    if not rows:
+        return
+    values = {column: table.c[column] + bindparam(f"b_{column}") for column in columns}
+    values["updated_at"] = bindparam("b_updated_at")
+    db.execute(table.update().where(table.c[key] == bindparam(f"b_{key}")).values(**values), rows)
+
+def _insert_missing(db: Session, table, rows: List[Dict[str, Any]]) -> None:
+    """
+    Inserta filas en cero que un lote simultáneo puede haber creado después
+    de consultarlas: las que ya existen se ignoran (INSERT ... ON CONFLICT
+    DO NOTHING; en motores sin esa cláusula, fila por fila con un savepoint)
+    """
+    if not rows:
+        return
+    dialect = db.get_bind().dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        insert = sqlite.insert if dialect == "sqlite" else postgresql.insert
+        db.execute(insert(table).on_conflict_do_nothing(), rows)
+        return
+    for row in rows:
+        try:
+            with db.begin_nested():
+                db.execute(table.insert(), [row])
+        except IntegrityError:
+            pass
+
+def increment_item_stats(
+    db: Session,
+    exam_id: int,
+    exam_delta: Dict[str, Any],
+    question_deltas: List[Dict[str, Any]],
+    option_deltas: List[Dict[str, Any]]
+) -> None:
+    """
+    Acumula en los agregados de un examen, sus preguntas y sus opciones los
+    valores de un lote de respuestas. Las filas que faltan se crean en cero
+    (ignorando las que otro lote cree al mismo tiempo) y luego se
+    incrementan en la base de datos, de modo que dos lotes simultáneos no
+    se pisan. No hace commit.
+    """
+    updated_at = datetime.datetime.utcnow().isoformat()
+    question_ids = [delta["question_id"] for delta in question_deltas]
+
+    if not db.query(ExamStat.exam_id).filter(ExamStat.exam_id == exam_id).first():
+        _insert_missing(db, ExamStat.__table__, [{
+            "exam_id": exam_id, "examinees": 0, "total_sum": 0, "total_sq_sum": 0, "updated_at": updated_at,
+        }])
+    existing = {row[0] for row in db.query(QuestionStat.question_id).filter(QuestionStat.exam_id == exam_id)}
+    missing = [
+        {
+            "question_id": question_id, "exam_id": exam_id, "responses": 0, "correct": 0, "blank": 0,
+            "invalid": 0, "correct_total_sum": 0, "updated_at": updated_at,
+        }
+        for question_id in question_ids if question_id not in existing
+    ]
+    _insert_missing(db, QuestionStat.__table__, missing)
+    existing = {
+        row[0] for row in db.query(OptionStat.option_id).filter(OptionStat.question_id.in_(question_ids))
+    }
+    missing = [
+        {
+            "option_id": delta["option_id"], "question_id": delta["question_id"], "chosen": 0,
+            "chosen_total_sum": 0, "updated_at": updated_at,
+        }
+        for delta in option_deltas if delta["option_id"] not in existing
+    ]
+    _insert_missing(db, OptionStat.__table__, missing)
+
+    def bind(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        return [dict({f"b_{name}": value for name, value in row.items()}, b_updated_at=updated_at) for row in rows]
+
+    _increment(
+        db, ExamStat.__table__, "exam_id", ["examinees", "total_sum", "total_sq_sum"],
+        bind([dict(exam_delta, exam_id=exam_id)])
+    )
+    _increment(
+        db, QuestionStat.__table__, "question_id",
+        ["responses", "correct", "blank", "invalid", "correct_total_sum"], bind(question_deltas)
+    )
+    _increment(
+        db, OptionStat.__table__, "option_id", ["chosen", "chosen_total_sum"],
+        bind([{key: value for key, value in delta.items() if key != "question_id"} for delta in option_deltas])
+    )
+
+def get_item_stats(
+    db: Session, exam_id: int
+) -> Tuple[Optional[ExamStat], Dict[int, QuestionStat], Dict[int, OptionStat]]:
+    """
+    Agregados de un examen: los del examen y los de cada pregunta y opción
+    por id, en tres consultas
+    """
+    exam_stat = db.query(ExamStat).filter(ExamStat.exam_id == exam_id).first()
+    question_stats = {
+        stat.question_id: stat for stat in db.query(QuestionStat).filter(QuestionStat.exam_id == exam_id)
+    }
+    option_stats = {
+        stat.option_id: stat
+        for stat in db.query(OptionStat).filter(OptionStat.question_id.in_(list(question_stats)))
+    }
+    return exam_stat, question_stats, option_stats
+
+
+# --- Calibración de dificultad ---
+def get_exam_responses_after(
+    db: Session, after_id: int, limit: int
+) -> List[Tuple[int, int, List[int]]]:
+    """
+    Respuestas guardadas después de after_id, en orden, como
+    (id, id del examen, opción elegida por pregunta)
+    """
+    return (
+        db.query(ExamResponse.id, ExamResponse.exam_id, ExamResponse.answers)
+        .filter(ExamResponse.id > after_id)
+        .order_by(ExamResponse.id)
+        .limit(limit)
+        .all()
+    )
+
+def get_exam_keys(db: Session, exam_ids: List[int]) -> Dict[int, List[Dict[str, Any]]]:
+    """
+    Preguntas de varios exámenes en orden, con su concepto y la posición de
+    la opción correcta (None si no tiene), en dos consultas
+    """
+    questions = (
+        db.query(Question.id, Question.exam_id, Question.concept_id, Question.question_type)
+        .filter(Question.exam_id.in_(exam_ids))
+        .order_by(Question.exam_id, Question.position)
+        .all()
+    )
+    correct = dict(
+        db.query(QuestionOption.question_id, QuestionOption.position)
+        .filter(QuestionOption.question_id.in_([question.id for question in questions]))
+        .filter(QuestionOption.is_correct.is_(True))
+        .order_by(QuestionOption.position.desc())
+        .all()
+    )
+    keys: Dict[int, List[Dict[str, Any]]] = {exam_id: [] for exam_id in exam_ids}
+    for question in questions:
+        keys[question.exam_id].append({
+            "question_id": question.id,
+            "concept_id": question.concept_id,
+            "correct": correct.get(question.id) if question.question_type == "multiple_choice" else None,
+        })
+    return keys
+
+def increment_concept_stats(db: Session, concept_deltas: List[Dict[str, Any]]) -> None:
+    """
+    Acumula respuestas y aciertos por concepto, creando en cero las filas
+    que faltan (ver _insert_missing). No hace commit.
+    """
+    if not concept_deltas:
+        return
+    updated_at = datetime.datetime.utcnow().isoformat()
+    concept_ids = [delta["concept_id"] for delta in concept_deltas]
+    existing = {row[0] for row in db.query(ConceptStat.concept_id).filter(ConceptStat.concept_id.in_(concept_ids))}
+    missing = [
+        {"concept_id": concept_id, "responses": 0, "correct": 0, "updated_at": updated_at}
+        for concept_id in concept_ids if concept_id not in existing
+    ]
+    _insert_missing(db, ConceptStat.__table__, missing)
+    _increment(db, ConceptStat.__table__, "concept_id", ["responses", "correct"], [
+        dict({f"b_{name}": value for name, value in delta.items()}, b_updated_at=updated_at)
+        for delta in concept_deltas
+    ])
+
+def get_question_stat_counts(db: Session, question_ids: List[int]) -> List[Tuple[int, int, int]]:
+    """
+    (id de la pregunta, respuestas, aciertos) acumulados de varias preguntas
+    """
+    return (
+        db.query(QuestionStat.question_id, QuestionStat.responses, QuestionStat.correct)
+        .filter(QuestionStat.question_id.in_(question_ids))
+        .all()
+    )
+
+def get_concept_stat_counts(db: Session, concept_ids: List[int]) -> List[Tuple[int, int, int]]:
+    """
+    (id del concepto, respuestas, aciertos) acumulados de varios conceptos
+    """
+    return (
+        db.query(ConceptStat.concept_id, ConceptStat.responses, ConceptStat.correct)
+        .filter(ConceptStat.concept_id.in_(concept_ids))
+        .all()
+    )
+
+def set_difficulties(db: Session, model, rows: List[Dict[str, Any]]) -> int:
+    """
+    Actualiza la dificultad de varias preguntas o conceptos (model = Question
+    o Concept) con una sola sentencia executemany. rows: {"id", "difficulty"}.
+    Solo se escriben las que cambian; si son conceptos, cambia además la
+    versión del banco de sus materiales. Retorna cuántas cambiaron.
+    No hace commit.
+    """
+    if not rows:
+        return 0
+    current = dict(db.query(model.id, model.difficulty).filter(model.id.in_([row["id"] for row in rows])))
+    rows = [row for row in rows if row["id"] in current and current[row["id"]] != row["difficulty"]]
+    if not rows:
+        return 0
+    table = model.__table__
+    db.execute(
+        table.update().where(table.c.id == bindparam("b_id")).values(difficulty=bindparam("b_difficulty")),
+        [{"b_id": row["id"], "b_difficulty": row["difficulty"]} for row in rows]
+    )
+    if model is Concept:
+        material_ids = db.query(Concept.material_id).filter(Concept.id.in_([row["id"] for row in rows])).distinct()
+        bump_concepts_version(db, [row[0] for row in material_ids])
+    return len(rows)
+
+def get_calibration_watermark(db: Session, name: str) -> int:
+    """
+    Última respuesta procesada por un proceso de calibración (0 si nunca corrió)
+    """
+    state = db.query(CalibrationState).filter(CalibrationState.name == name).first()
+    if not state:
+        db.add(CalibrationState(name=name, last_response_id=0, updated_at=datetime.datetime.utcnow().isoformat()))
+        db.commit()
+        return 0
+    return state.last_response_id
+
+def advance_calibration_watermark(db: Session, name: str, previous_id: int, last_id: int) -> bool:
+    """
+    Avanza la marca de un proceso de calibración solo si sigue en
+    previous_id. Retorna False si otra ejecución ya la avanzó, en cuyo caso
+    quien llama debe descartar su transacción. No hace commit.
+    """
+    updated = (
+        db.query(CalibrationState)
+        .filter(CalibrationState.name == name, CalibrationState.last_response_id == previous_id)
+        .update(
+            {"last_response_id": last_id, "updated_at": datetime.datetime.utcnow().isoformat()},
+            synchronize_session=False
+        )
+    )
+    return updated == 1
+
+
+# --- Trabajos de generación ---
+def get_generation_job(db: Session, job_id: str) -> Optional[GenerationJob]:
+    return db.query(GenerationJob).filter(GenerationJob.id == job_id).first()
+
+def get_generation_jobs_by_user(
+    db: Session, user_id: int, skip: int = 0, limit: int = 100
+) -> List[GenerationJob]:
+    return (
+        db.query(GenerationJob)
+        .filter(GenerationJob.created_by_id == user_id)
+        .order_by(GenerationJob.created_at.desc())
+        .offset(skip)
+        .limit(limit)
+        .all()
+    )
+
+def get_generation_jobs_by_batch(db: Session, batch_id: str) -> List[GenerationJob]:
+    return (
+        db.query(GenerationJob)
+        .filter(GenerationJob.batch_id == batch_id)
+        .order_by(GenerationJob.course_id)
+        .all()
+    )
+
+def count_pending_generation_jobs(db: Session) -> int:
+    """
+    Trabajos en cola o en ejecución, individuales y de lotes
+    """
+    return (
+        db.query(GenerationJob)
+        .filter(GenerationJob.status.in_(PENDING_JOB_STATUSES))
+        .count()
+    )
+
+def create_generation_job(
+    db: Session, course_id: int, config: Dict[str, Any], user_id: int, stages: List[str],
+    worker_id: Optional[str] = None
+) -> GenerationJob:
+    created_at = datetime.datetime.utcnow().isoformat()
+    db_job = GenerationJob(
+        id=str(uuid.uuid4()),
+        course_id=course_id,
+        created_by_id=user_id,
+        status="queued",
+        progress={stage: "pending" for stage in stages},
+        config=config,
+        created_at=created_at,
+        worker_id=worker_id,
+        heartbeat_at=created_at,
+    )
+    db.add(db_job)
+    db.commit()
+    db.refresh(db_job)
+    return db_job
+
+def create_generation_jobs(
+    db: Session, course_ids: List[int], config: Dict[str, Any], user_id: int,
+    stages: List[str], batch_id: str, worker_id: Optional[str] = None
+) -> List[GenerationJob]:
+    """
+    Crea los trabajos de un lote, uno por curso, en una sola transacción
+    """
+    created_at = datetime.datetime.utcnow().isoformat()
+    db_jobs = [
+        GenerationJob(
+            id=str(uuid.uuid4()),
+            batch_id=batch_id,
+            course_id=course_id,
+            created_by_id=user_id,
+            status="queued",
+            progress={stage: "pending" for stage in stages},
+            config=config,
+            created_at=created_at,
+            worker_id=worker_id,
+            heartbeat_at=created_at,
+        )
+        for course_id in course_ids
+    ]
+    db.add_all(db_jobs)
+    db.commit()
+    return db_jobs
+
+def update_generation_job(
+    db: Session, db_obj: GenerationJob, obj_in: Dict[str, Any]
+) -> GenerationJob:
+    for field in obj_in:
+        setattr(db_obj, field, obj_in[field])
+
+    db.add(db_obj)
+    db.commit()
+    db.refresh(db_obj)
+    return db_obj
+
+def set_generation_job_stage(
+    db: Session, db_obj: GenerationJob, stage: str, stage_status: str
+) -> GenerationJob:
+    """
+    Actualiza el estado de una etapa. El diccionario se reemplaza en lugar
+    de modificarse, para que SQLAlchemy detecte el cambio en la columna JSON.
+    """
+    progress = dict(db_obj.progress or {})
+    progress[stage] = stage_status
+    return update_generation_job(db, db_obj, {"stage": stage, "progress": progress})
+
+def touch_generation_jobs(db: Session, worker_id: str) -> int:
+    """
+    Registra la señal de vida de un proceso en sus trabajos pendientes
+    """
+    count = (
+        db.query(GenerationJob)
+        .filter(GenerationJob.worker_id == worker_id, GenerationJob.status.in_(PENDING_JOB_STATUSES))
+        .update({GenerationJob.heartbeat_at: datetime.datetime.utcnow().isoformat()}, synchronize_session=False)
+    )
+    db.commit()
+    return count
+
+def fail_interrupted_generation_jobs(db: Session, stale_before: str) -> int:
+    """
+    Marca como fallidos los trabajos en cola o en ejecución cuyo proceso dejó
+    de dar señales de vida antes de stale_before (se detuvo o se reinició).
+    Los trabajos de los demás procesos, que siguen vivos, no se tocan.
+    """
+    count = (
+        db.query(GenerationJob)
+        .filter(
+            GenerationJob.status.in_(PENDING_JOB_STATUSES),
+            or_(GenerationJob.heartbeat_at.is_(None), GenerationJob.heartbeat_at < stale_before),
+        )
+        .update(
+            {
+                GenerationJob.status: "failed",
+                GenerationJob.error: "El trabajo se interrumpió al detenerse el servidor",
+                GenerationJob.finished_at: datetime.datetime.utcnow().isoformat(),
+            },
+            synchronize_session=False,
+        )
+    )
+    db.commit()
+    return count
@@ -1,5 +1,5 @@
 # app/crud/students.py
-from typing import List, Optional, Union, Dict, Any
+from typing import List, Optional, Union, Dict, Any, Iterable, Set, Tuple
 from sqlalchemy.orm import Session
 
 from app.db.courses import Student, Enrollment, Grade
@@ -115,10 +115,63 @@ def delete_enrollment(db: Session, enrollment_id: int) -> bool:
     return False
 
 
+def get_section_enrollments_by_identification(
+    db: Session, section_id: int
+) -> Dict[str, Tuple[int, int]]:
+    """
+    Inscripciones activas de una sección por identificación del estudiante:
+    {identificación: (id de la inscripción, id del estudiante)}, con una consulta
+    """
+    rows = (
+        db.query(Student.identification, Enrollment.id, Enrollment.student_id)
+        .join(Enrollment, Enrollment.student_id == Student.id)
+        .filter(Enrollment.section_id == section_id, Enrollment.is_active == True)  # noqa: E712
+        .all()
+    )
+    return {identification: (enrollment_id, student_id) for identification, enrollment_id, student_id in rows}
+
+def get_existing_identifications(db: Session, identifications: Iterable[str]) -> Set[str]:
+    """
+    Cuáles de las identificaciones corresponden a un estudiante registrado
+    """
+    identifications = list(set(identifications))
+    found = set()
+    # Por bloques, para no superar el límite de parámetros de SQLite
+    for start in range(0, len(identifications), 500):
+        block = identifications[start:start + 500]
+        found.update(
+            identification for (identification,) in
+            db.query(Student.identification).filter(Student.identification.in_(block)).all()
+        )
+    return found
+
+
 # --- Calificaciones ---
 def get_grade(db: Session, grade_id: int) -> Optional[Grade]:
     return db.query(Grade).filter(Grade.id == grade_id).first()
 
+def get_grade_by_enrollment_and_exam(db: Session, enrollment_id: int, exam_id: int) -> Optional[Grade]:
+    return (
+        db.query(Grade)
+        .filter(Grade.enrollment_id == enrollment_id, Grade.exam_id == exam_id)
+        .first()
+    )
+
+def get_graded_pairs_by_section(
+    db: Session, section_id: int, exam_ids: Iterable[int]
+) -> Set[Tuple[int, int]]:
+    """
+    Pares (inscripción, examen) que ya tienen calificación en una sección,
+    con una sola consulta sobre los exámenes indicados
+    """
+    rows = (
+        db.query(Grade.enrollment_id, Grade.exam_id)
+        .join(Enrollment, Enrollment.id == Grade.enrollment_id)
+        .filter(Enrollment.section_id == section_id, Grade.exam_id.in_(list(set(exam_ids))))
+        .all()
+    )
+    return {(enrollment_id, exam_id) for enrollment_id, exam_id in rows}
+
 def get_grades_by_student(
     db: Session, student_id: int, skip: int = 0, limit: int = 100
 ) -> List[Grade]:
@@ -151,6 +204,15 @@ def create_grade(
     db.refresh(db_grade)
     return db_grade
 
+def create_grades(db: Session, grades_in: List[Dict[str, Any]]) -> int:
+    """
+    Registra varias calificaciones con una inserción masiva en una sola transacción
+    """
+    if grades_in:
+        db.execute(Grade.__table__.insert(), grades_in)
+    db.commit()
+    return len(grades_in)
+
 def update_grade(
     db: Session, db_obj: Grade, obj_in: Union[GradeUpdate, Dict[str, Any]]
 ) -> Grade:
@@ -1,5 +1,5 @@
 # app/db/courses.py
-from sqlalchemy import Column, Integer, String, Text, Boolean, ForeignKey, Float, Table
+from sqlalchemy import Column, Integer, String, Text, Boolean, ForeignKey, Float, Table, JSON, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 
@@ -57,8 +57,8 @@ class Enrollment(Base):
     __tablename__ = "enrollments"
 
     id = Column(Integer, primary_key=True, index=True)
-    student_id = Column(Integer, ForeignKey("students.id"))
-    section_id = Column(Integer, ForeignKey("sections.id"))
+    student_id = Column(Integer, ForeignKey("students.id"), index=True)
+    section_id = Column(Integer, ForeignKey("sections.id"), index=True)
     enrollment_date = Column(String)  # Se almacenará como fecha ISO
     is_active = Column(Boolean, default=True)
     
@@ -67,6 +67,20 @@ class Enrollment(Base):
     section = relationship("Section", back_populates="enrollments")
     grades = relationship("Grade", back_populates="enrollment")
 
+class Blob(Base):
+    __tablename__ = "blobs"
+
+    # Hash SHA-256 del contenido más la extensión, p. ej. "ab12...ef.pdf"
+    key = Column(String, primary_key=True)
+    content_hash = Column(String, index=True)
+    file_path = Column(String)
+    size = Column(Integer)
+    ref_count = Column(Integer, default=0, index=True)  # Materiales que lo usan
+    released_at = Column(String)  # Fecha ISO en que ref_count llegó a 0
+    
+    # Relaciones
+    materials = relationship("Material", back_populates="blob")
+
 class Material(Base):
     __tablename__ = "materials"
 
@@ -75,12 +89,61 @@ class Material(Base):
     description = Column(Text)
     file_path = Column(String)
     file_type = Column(String)  # 'pdf', 'docx', etc.
+    blob_key = Column(String, ForeignKey("blobs.key"), index=True)
     uploaded_by_id = Column(Integer, ForeignKey("users.id"))
     upload_date = Column(String)  # Se almacenará como fecha ISO
+    ingestion_status = Column(String, default="pending")  # 'pending', 'ready', 'failed'
+    ingestion_error = Column(Text)
+    # Versión del banco de conceptos: aumenta cuando se vuelve a procesar el
+    # material o la calibración cambia la dificultad de sus conceptos
+    concepts_version = Column(Integer, default=0, nullable=False)
     
     # Relaciones
     uploaded_by = relationship("User")
+    blob = relationship("Blob", back_populates="materials")
     courses = relationship("Course", secondary=course_material, back_populates="materials")
+    content = relationship("MaterialContent", back_populates="material", uselist=False)
+    concepts = relationship("Concept", back_populates="material")
+
+class MaterialContent(Base):
+    __tablename__ = "material_contents"
+
+    id = Column(Integer, primary_key=True, index=True)
+    material_id = Column(Integer, ForeignKey("materials.id"), unique=True, index=True)
+    content_hash = Column(String, index=True)
+    file_mtime = Column(Float)  # Para detectar cambios sin leer el archivo
+    file_size = Column(Integer)
+    processor_version = Column(String)
+    raw_text = Column(Text)
+    processed_content = Column(JSON)  # Resultado de DocumentProcessor.structure_content
+    extracted_at = Column(String)  # Se almacenará como fecha ISO
+    
+    # Relaciones
+    material = relationship("Material", back_populates="content")
+
+class Concept(Base):
+    __tablename__ = "concepts"
+    __table_args__ = (
+        # Conteos por dificultad de los materiales de un curso y muestreo
+        # aleatorio dentro de cada material (ver crud.sample_concepts)
+        Index("ix_concepts_material_difficulty_sample", "material_id", "difficulty", "sample_key"),
+        # Índice de distractores de los materiales de un curso
+        Index("ix_concepts_material_type", "material_id", "concept_type"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    material_id = Column(Integer, ForeignKey("materials.id"))
+    concept_type = Column(String)  # 'definition', 'section_content', 'list_items'
+    term = Column(Text)
+    content = Column(Text)
+    difficulty = Column(String)  # 'easy', 'medium', 'hard'
+    position = Column(Integer)  # Orden del concepto dentro del material
+    section_hash = Column(String)  # Huella de la sección de origen
+    sample_key = Column(Float)  # Clave pseudoaleatoria en [0, 1) para muestrear (ver crud.concept_sample_key)
+    length_bucket = Column(Integer)  # Grupo de longitud del contenido (ver services/distractors.py)
+    
+    # Relaciones
+    material = relationship("Material", back_populates="concepts")
 
 class Exam(Base):
     __tablename__ = "exams"
@@ -88,17 +151,18 @@ class Exam(Base):
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String, index=True)
     description = Column(Text)
-    course_id = Column(Integer, ForeignKey("courses.id"))
+    course_id = Column(Integer, ForeignKey("courses.id"), index=True)
     created_by_id = Column(Integer, ForeignKey("users.id"))
     exam_type = Column(String)  # 'parcial', 'final', 'repaso'
     creation_date = Column(String)  # Se almacenará como fecha ISO
     file_path = Column(String)  # Ruta al archivo generado
     answer_key_path = Column(String)  # Ruta a la plantilla de respuestas
+    answer_sheet_path = Column(String)  # Ruta a la hoja de respuestas
     
     # Relaciones
     course = relationship("Course", back_populates="exams")
     created_by = relationship("User")
-    questions = relationship("Question", back_populates="exam")
+    questions = relationship("Question", back_populates="exam", order_by="Question.position")
     exam_variants = relationship("ExamVariant", back_populates="exam")
     grades = relationship("Grade", back_populates="exam")
 
@@ -110,6 +174,11 @@ class ExamVariant(Base):
     variant_code = Column(String)  # Como "A", "B", etc.
     file_path = Column(String)
     answer_key_path = Column(String)
+    answer_sheet_path = Column(String)
+    seed = Column(String)  # Semilla de las permutaciones
+    question_order = Column(JSON)  # Índices de las preguntas del examen en orden de la variante
+    option_orders = Column(JSON)  # {índice de pregunta: orden de sus opciones}
+    answer_key = Column(JSON)  # Respuesta correcta por número de pregunta
     
     # Relaciones
     exam = relationship("Exam", back_populates="exam_variants")
@@ -118,21 +187,25 @@ class Question(Base):
     __tablename__ = "questions"
 
     id = Column(Integer, primary_key=True, index=True)
-    exam_id = Column(Integer, ForeignKey("exams.id"))
+    exam_id = Column(Integer, ForeignKey("exams.id"), index=True)
+    concept_id = Column(Integer, ForeignKey("concepts.id", ondelete="SET NULL"), index=True)  # Concepto de origen
+    position = Column(Integer)  # Orden de la pregunta en el examen
     content = Column(Text)
     question_type = Column(String)  # 'multiple_choice', 'open', 'calculation'
     difficulty = Column(String)  # 'easy', 'medium', 'hard'
     points = Column(Float)
+    answer = Column(Text)  # Respuesta correcta o respuesta modelo
     
     # Relaciones
     exam = relationship("Exam", back_populates="questions")
-    options = relationship("QuestionOption", back_populates="question")
+    options = relationship("QuestionOption", back_populates="question", order_by="QuestionOption.position")
 
 class QuestionOption(Base):
     __tablename__ = "question_options"
 
     id = Column(Integer, primary_key=True, index=True)
-    question_id = Column(Integer, ForeignKey("questions.id"))
+    question_id = Column(Integer, ForeignKey("questions.id"), index=True)
+    position = Column(Integer)  # Orden de la opción en la pregunta
     content = Column(Text)
     is_correct = Column(Boolean, default=False)
     
@@ -141,6 +214,10 @@ class QuestionOption(Base):
 
 class Grade(Base):
     __tablename__ = "grades"
+    __table_args__ = (
+        # Calificación de una inscripción en un examen (detección de duplicados)
+        Index("ix_grades_enrollment_exam", "enrollment_id", "exam_id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     student_id = Column(Integer, ForeignKey("students.id"))
@@ -155,4 +232,90 @@ class Grade(Base):
     student = relationship("Student", back_populates="grades")
     enrollment = relationship("Enrollment", back_populates="grades")
     exam = relationship("Exam", back_populates="grades")
-    graded_by = relationship("User")
\ No newline at end of file
+    graded_by = relationship("User")
+
+class ExamResponse(Base):
+    __tablename__ = "exam_responses"
+
+    id = Column(Integer, primary_key=True, index=True)
+    exam_id = Column(Integer, ForeignKey("exams.id"), index=True)
+    enrollment_id = Column(Integer, ForeignKey("enrollments.id"))
+    student_id = Column(Integer, ForeignKey("students.id"))
+    variant_code = Column(String)  # None para el examen original
+    answers = Column(JSON)  # Opción elegida por pregunta del examen original (-1 sin responder, -2 inválida)
+    correct = Column(Integer)  # Preguntas acertadas
+    score = Column(Float)
+    created_at = Column(String)  # Se almacenará como fecha ISO
+
+# Agregados de las respuestas de cada examen, pregunta y opción, que se
+# incrementan con cada lote calificado (ver services/item_analysis.py).
+# "total" es la cantidad de preguntas que acertó cada estudiante.
+class ExamStat(Base):
+    __tablename__ = "exam_stats"
+
+    exam_id = Column(Integer, ForeignKey("exams.id"), primary_key=True)
+    examinees = Column(Integer, default=0)
+    total_sum = Column(Float, default=0)
+    total_sq_sum = Column(Float, default=0)
+    updated_at = Column(String)
+
+class QuestionStat(Base):
+    __tablename__ = "question_stats"
+
+    question_id = Column(Integer, ForeignKey("questions.id"), primary_key=True)
+    exam_id = Column(Integer, ForeignKey("exams.id"), index=True)
+    responses = Column(Integer, default=0)
+    correct = Column(Integer, default=0)
+    blank = Column(Integer, default=0)
+    invalid = Column(Integer, default=0)
+    correct_total_sum = Column(Float, default=0)  # Suma del total de quienes acertaron
+    updated_at = Column(String)
+
+class OptionStat(Base):
+    __tablename__ = "option_stats"
+
+    option_id = Column(Integer, ForeignKey("question_options.id"), primary_key=True)
+    question_id = Column(Integer, ForeignKey("questions.id"), index=True)
+    chosen = Column(Integer, default=0)
+    chosen_total_sum = Column(Float, default=0)  # Suma del total de quienes la eligieron
+    updated_at = Column(String)
+
+# Aciertos acumulados de las preguntas generadas a partir de cada concepto
+# (ver services/calibration.py)
+class ConceptStat(Base):
+    __tablename__ = "concept_stats"
+
+    concept_id = Column(Integer, ForeignKey("concepts.id"), primary_key=True)
+    responses = Column(Integer, default=0)
+    correct = Column(Integer, default=0)
+    updated_at = Column(String)
+
+class CalibrationState(Base):
+    __tablename__ = "calibration_state"
+
+    name = Column(String, primary_key=True)  # Proceso de calibración
+    last_response_id = Column(Integer, default=0)  # Última respuesta procesada
+    updated_at = Column(String)
+
+class GenerationJob(Base):
+    __tablename__ = "generation_jobs"
+
+    id = Column(String, primary_key=True)  # UUID
+    batch_id = Column(String, index=True)  # Lote de generación al que pertenece
+    course_id = Column(Integer, ForeignKey("courses.id"), index=True)
+    created_by_id = Column(Integer, ForeignKey("users.id"))
+    status = Column(String, default="queued", index=True)  # 'queued', 'running', 'completed', 'failed'
+    stage = Column(String)  # Etapa en ejecución
+    progress = Column(JSON)  # Estado de cada etapa: {"ingest": "completed", ...}
+    config = Column(JSON)  # ExamConfig solicitado
+    result = Column(JSON)  # Examen generado y rutas de los archivos
+    error = Column(Text)
+    created_at = Column(String)  # Se almacenará como fecha ISO
+    started_at = Column(String)
+    finished_at = Column(String)
+    worker_id = Column(String)  # Proceso que lo tiene en su cola (ver services/generation.py)
+    heartbeat_at = Column(String, index=True)  # Última señal de vida de ese proceso
+
+    # Relaciones
+    course = relationship("Course")
+    created_by = relationship("User")
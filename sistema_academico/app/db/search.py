@@ -0,0 +1,30 @@
+# app/db/search.py
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+
+# Índice de texto completo (SQLite FTS5) sobre el texto extraído de los
+# materiales. El rowid de cada fila es el id del material.
+MATERIAL_SEARCH_TABLE = "material_search"
+
+
+def create_material_search_index(engine: Engine) -> None:
+    """
+    Crea el índice FTS5 si no existe y lo llena con los materiales ya
+    procesados que estén asociados a algún curso. Solo aplica a SQLite.
+    """
+    if engine.dialect.name != "sqlite":
+        return
+    if inspect(engine).has_table(MATERIAL_SEARCH_TABLE):
+        return
+
+    with engine.begin() as connection:
+        connection.execute(text(
+            f"CREATE VIRTUAL TABLE {MATERIAL_SEARCH_TABLE} USING fts5("
+            "title, body, tokenize = 'unicode61 remove_diacritics 2')"
+        ))
+        connection.execute(text(
+            f"INSERT INTO {MATERIAL_SEARCH_TABLE} (rowid, title, body) "
+            "SELECT m.id, m.title, c.raw_text "
+            "FROM materials m JOIN material_contents c ON c.material_id = m.id "
+            "WHERE EXISTS (SELECT 1 FROM course_material cm WHERE cm.material_id = m.id)"
+        ))
@@ -76,10 +76,26 @@ class MaterialInDBBase(MaterialBase):
     file_path: str
     uploaded_by_id: int
     upload_date: str
+    ingestion_status: Optional[str] = None
+    ingestion_error: Optional[str] = None
 
     class Config:
         orm_mode = True
 
 
 class Material(MaterialInDBBase):
-    pass
\ No newline at end of file
+    pass
+
+
+class MaterialSearchResult(BaseModel):
+    material_id: int
+    title: str
+    snippet: str
+    score: float
+
+
+class MaterialSearchResults(BaseModel):
+    total: int
+    skip: int
+    limit: int
+    results: List[MaterialSearchResult] = []
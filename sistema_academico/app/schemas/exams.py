@@ -1,5 +1,5 @@
 # app/schemas/exams.py
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 from pydantic import BaseModel
 
 
@@ -20,6 +20,7 @@ class QuestionOptionUpdate(QuestionOptionBase):
 class QuestionOptionInDBBase(QuestionOptionBase):
     id: int
     question_id: int
+    position: Optional[int] = None
 
     class Config:
         orm_mode = True
@@ -34,6 +35,7 @@ class QuestionBase(BaseModel):
     question_type: str
     difficulty: str
     points: float
+    answer: Optional[str] = None
 
 
 class QuestionCreate(QuestionBase):
@@ -51,6 +53,8 @@ class QuestionUpdate(QuestionBase):
 class QuestionInDBBase(QuestionBase):
     id: int
     exam_id: int
+    concept_id: Optional[int] = None
+    position: Optional[int] = None
 
     class Config:
         orm_mode = True
@@ -64,6 +68,11 @@ class ExamVariantBase(BaseModel):
     variant_code: str
     file_path: str
     answer_key_path: str
+    answer_sheet_path: Optional[str] = None
+    seed: Optional[str] = None
+    question_order: Optional[List[int]] = None
+    option_orders: Optional[Dict[str, List[int]]] = None
+    answer_key: Optional[List[Dict[str, Any]]] = None
 
 
 class ExamVariantCreate(ExamVariantBase):
@@ -113,6 +122,7 @@ class ExamInDBBase(ExamBase):
     created_by_id: int
     file_path: Optional[str] = None
     answer_key_path: Optional[str] = None
+    answer_sheet_path: Optional[str] = None
 
     class Config:
         orm_mode = True
@@ -120,4 +130,130 @@ class ExamInDBBase(ExamBase):
 
 class Exam(ExamInDBBase):
     questions: List[Question] = []
-    exam_variants: List[ExamVariant] = []
\ No newline at end of file
+    exam_variants: List[ExamVariant] = []
+
+
+class ExamConfig(BaseModel):
+    title: str
+    description: Optional[str] = None
+    exam_type: str
+    num_questions: int = 20
+    num_concepts: int = 10
+    num_options: int = 4
+    difficulty_distribution: dict = {"easy": 0.3, "medium": 0.5, "hard": 0.2}
+    question_type_distribution: dict = {"multiple_choice": 0.7, "open": 0.3}
+    generate_variants: bool = False
+    num_variants: int = 1
+    seed: Optional[int] = None  # Con semilla, la misma solicitud produce el mismo examen
+
+
+class GenerationJobBase(BaseModel):
+    batch_id: Optional[str] = None
+    course_id: int
+    status: str
+    stage: Optional[str] = None
+    progress: Dict[str, str] = {}
+    error: Optional[str] = None
+    created_at: str
+    started_at: Optional[str] = None
+    finished_at: Optional[str] = None
+
+
+class GenerationJobInDBBase(GenerationJobBase):
+    id: str
+    created_by_id: int
+    config: Dict[str, Any]
+
+    class Config:
+        orm_mode = True
+
+
+class GenerationJob(GenerationJobInDBBase):
+    result: Optional[Dict[str, Any]] = None
+
+
+class GenerationBatchCreate(BaseModel):
+    course_ids: List[int]
+    config: ExamConfig
+
+
+class GenerationBatch(BaseModel):
+    batch_id: str
+    total: int
+    status_counts: Dict[str, int]
+    jobs: List[GenerationJob]
+
+
+class StudentResponses(BaseModel):
+    identification: str
+    variant_code: Optional[str] = None
+    answers: List[Optional[str]]  # Letra por número de pregunta; None, "" o "-" sin responder
+
+
+class ExamResponsesSubmit(BaseModel):
+    section_id: int
+    variant_code: Optional[str] = None  # Variante de las respuestas que no indican una
+    responses: List[StudentResponses]
+
+
+class AutoGradeResult(BaseModel):
+    row: int  # Posición de las respuestas en la solicitud, desde 1
+    identification: str
+    variant_code: Optional[str] = None
+    answered: int
+    correct: int
+    score: float
+
+
+class AutoGradeError(BaseModel):
+    row: int
+    identification: Optional[str] = None
+    error: str
+
+
+class AutoGradeReport(BaseModel):
+    total: int
+    imported: int
+    results: List[AutoGradeResult] = []
+    errors: List[AutoGradeError] = []
+
+
+class OptionAnalysis(BaseModel):
+    option_id: int
+    position: Optional[int] = None
+    content: str
+    is_correct: bool
+    chosen: int
+    rate: Optional[float] = None
+    mean_total: Optional[float] = None  # Aciertos promedio de quienes la eligieron
+    point_biserial: Optional[float] = None
+
+
+class QuestionAnalysis(BaseModel):
+    question_id: int
+    number: int
+    content: str
+    difficulty: Optional[str] = None
+    responses: int
+    p_value: Optional[float] = None  # Proporción de aciertos
+    point_biserial: Optional[float] = None  # Discriminación contra el resto del examen
+    blank_rate: Optional[float] = None
+    options: List[OptionAnalysis] = []
+    flags: List[str] = []
+
+
+class ItemAnalysisReport(BaseModel):
+    exam_id: int
+    examinees: int
+    mean_correct: Optional[float] = None
+    sd_correct: Optional[float] = None
+    kr20: Optional[float] = None
+    questions: List[QuestionAnalysis] = []
+
+
+class CalibrationSummary(BaseModel):
+    status: str  # 'completed', 'running' o 'conflict'
+    responses: int
+    questions: int
+    concepts: int
+    last_response_id: Optional[int] = None
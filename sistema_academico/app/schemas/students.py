@@ -90,4 +90,40 @@ class GradeInDBBase(GradeBase):
 
 
 class Grade(GradeInDBBase):
-    pass
\ No newline at end of file
+    pass
+
+
+class GradeImportRowError(BaseModel):
+    row: int  # Número de fila en el archivo (la 1 es el encabezado)
+    identification: Optional[str] = None
+    exam_id: Optional[int] = None
+    error: str
+
+
+class GradeImportReport(BaseModel):
+    total_rows: int
+    imported: int
+    errors: List[GradeImportRowError] = []
+
+
+class OMRPageResult(BaseModel):
+    page: int  # Número de página en la carga, contando todos los archivos
+    identification: str
+    variant_code: Optional[str] = None
+    answered: int
+    correct: int
+    score: float
+
+
+class OMRPageError(BaseModel):
+    page: int
+    file: Optional[str] = None
+    identification: Optional[str] = None
+    error: str
+
+
+class OMRReport(BaseModel):
+    total_pages: int
+    imported: int
+    results: List[OMRPageResult] = []
+    errors: List[OMRPageError] = []
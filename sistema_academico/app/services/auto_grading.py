@@ -0,0 +1,277 @@
+import datetime
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app import crud
+
+# Valores de una respuesta que no es una opción
+BLANK = -1
+INVALID = -2
+
+# Textos que cuentan como pregunta sin responder
+BLANK_ANSWERS = ("", "-", "_", ".")
+
+
+class AnswerKey:
+    """
+    Clave de respuestas de un examen compilada a arreglos, con una fila por
+    versión (el examen original y cada variante) y una columna por número de
+    pregunta tal como aparece impreso en esa versión:
+
+        correct         índice de la opción correcta, o BLANK si la pregunta
+                        no se califica automáticamente
+        points          puntos de la pregunta
+        question_index  posición de la pregunta en el examen original
+        option_map      opción del examen original que corresponde a cada opción
+
+    question_ids y option_ids identifican las preguntas y opciones del examen
+    original (-1 donde la pregunta tiene menos opciones).
+    """
+
+    def __init__(
+        self,
+        versions: List[Optional[str]],
+        correct: np.ndarray,
+        points: np.ndarray,
+        question_index: np.ndarray,
+        option_map: np.ndarray,
+        question_ids: np.ndarray,
+        option_ids: np.ndarray
+    ):
+        self.versions = versions  # None es el examen original
+        self.version_index = {code: index for index, code in enumerate(versions)}
+        self.correct = correct
+        self.points = points
+        self.question_index = question_index
+        self.option_map = option_map
+        self.question_ids = question_ids
+        self.option_ids = option_ids
+
+    @property
+    def num_questions(self) -> int:
+        return self.correct.shape[1]
+
+    @staticmethod
+    def compile(exam) -> "AnswerKey":
+        """
+        Compila la clave de un examen guardado. Las variantes se obtienen de
+        sus permutaciones (question_order, option_orders) aplicadas a la clave
+        del examen original; las variantes sin permutaciones guardadas usan
+        su clave por letra.
+        """
+        questions = exam.questions
+        num_questions = len(questions)
+        num_options = max([len(question.options) for question in questions] + [1])
+
+        base_correct = np.full(num_questions, BLANK, dtype=np.int16)
+        base_points = np.zeros(num_questions)
+        question_ids = np.array([question.id for question in questions], dtype=np.int64)
+        option_ids = np.full((num_questions, num_options), -1, dtype=np.int64)
+        for index, question in enumerate(questions):
+            option_ids[index, :len(question.options)] = [option.id for option in question.options]
+            if question.question_type == 'multiple_choice' and question.options:
+                base_correct[index] = next(
+                    (j for j, option in enumerate(question.options) if option.is_correct), BLANK
+                )
+            base_points[index] = question.points or 0
+        identity = np.arange(num_options)
+
+        variants = sorted(exam.exam_variants, key=lambda variant: variant.variant_code)
+        versions = [None] + [variant.variant_code for variant in variants]
+        correct = np.tile(base_correct, (len(versions), 1))
+        question_index = np.tile(np.arange(num_questions), (len(versions), 1))
+        option_map = np.tile(identity, (len(versions), num_questions, 1))
+
+        for row, variant in enumerate(variants, start=1):
+            order = variant.question_order
+            if order and sorted(order) == list(range(num_questions)):
+                question_index[row] = order
+                for number, base in enumerate(order):
+                    options = (variant.option_orders or {}).get(str(base))
+                    if options:
+                        option_map[row, number, :len(options)] = options
+                    if base_correct[base] != BLANK:
+                        correct[row, number] = int(np.argmax(option_map[row, number] == base_correct[base]))
+                    else:
+                        correct[row, number] = BLANK
+            else:
+                # Variante sin permutaciones: solo se conoce la letra correcta
+                for entry in variant.answer_key or []:
+                    number = entry['number'] - 1
+                    letter = entry.get('answer')
+                    if 0 <= number < num_questions and base_correct[number] != BLANK:
+                        correct[row, number] = ord(letter) - 65 if letter else BLANK
+
+        return AnswerKey(
+            versions=versions,
+            correct=correct,
+            points=base_points[question_index],
+            question_index=question_index,
+            option_map=option_map,
+            question_ids=question_ids,
+            option_ids=option_ids
+        )
+
+    def original_answers(self, versions: np.ndarray, answers: np.ndarray) -> np.ndarray:
+        """
+        Lleva las respuestas de cada fila, dadas en el orden de su versión, al
+        orden de preguntas y opciones del examen original. Las letras fuera
+        de las opciones de la pregunta quedan en INVALID.
+        """
+        rows = np.arange(len(versions))[:, None]
+        numbers = np.arange(self.num_questions)[None, :]
+        question_index = self.question_index[versions]
+        num_options = (self.option_ids >= 0).sum(axis=1)[question_index]
+        valid = (answers >= 0) & (answers < num_options)
+        mapped = self.option_map[versions[:, None], numbers, np.where(valid, answers, 0)]
+        chosen = np.where(valid, mapped, np.where(answers >= 0, INVALID, answers))
+        original = np.empty_like(answers)
+        original[rows, question_index] = chosen
+        return original
+
+
+def encode_answers(rows: Sequence[Sequence[Optional[str]]], num_questions: int) -> np.ndarray:
+    """
+    Convierte las respuestas por letra ('A', 'b', None, '-') en una matriz
+    de índices de opción: una fila por estudiante y una columna por número
+    de pregunta. Las preguntas sin responder quedan en BLANK y las letras
+    no reconocidas en INVALID. ValueError si una fila tiene más respuestas
+    que preguntas.
+    """
+    codes = {chr(65 + j): j for j in range(26)}
+    codes.update({chr(97 + j): j for j in range(26)})
+    codes.update({blank: BLANK for blank in BLANK_ANSWERS})
+    answers = np.full((len(rows), num_questions), BLANK, dtype=np.int16)
+    for row, values in enumerate(rows):
+        if len(values) > num_questions:
+            raise ValueError(f"La fila {row + 1} tiene más respuestas que preguntas en el examen")
+        answers[row, :len(values)] = [BLANK if value is None else codes.get(value.strip(), INVALID) for value in values]
+    return answers
+
+
+def score_answers(key: AnswerKey, versions: np.ndarray, answers: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Califica todas las filas de una vez: compara cada respuesta con la clave
+    de la versión de su fila y suma los puntos de los aciertos
+    """
+    expected = key.correct[versions]
+    hits = (answers == expected) & (expected != BLANK)
+    return {
+        "hits": hits,
+        "correct": hits.sum(axis=1),
+        "answered": (answers >= 0).sum(axis=1),
+        "score": np.where(hits, key.points[versions], 0.0).sum(axis=1),
+    }
+
+
+class AutoGrader:
+    """
+    Calificación automática de las respuestas de selección múltiple de una
+    sección completa contra la clave compilada del examen
+    """
+
+    @staticmethod
+    def grade_section(
+        db: Session,
+        section_id: int,
+        exam,
+        key: AnswerKey,
+        entries: List[Dict[str, Any]],
+        answers: np.ndarray,
+        user_id: int,
+        source: str
+    ) -> Dict[str, Any]:
+        """
+        Califica las respuestas de una sección y registra, en una sola
+        transacción, las calificaciones, las respuestas y sus agregados para
+        el análisis de ítems. entries tiene, por cada fila de answers, la
+        identificación del estudiante, el código de variante (None para el
+        examen original), un error previo si la fila ya fue rechazada y los
+        campos con que se identifica la fila en el reporte (ref).
+        """
+        enrollments = crud.get_section_enrollments_by_identification(db, section_id=section_id)
+        graded = crud.get_graded_pairs_by_section(db, section_id=section_id, exam_ids=[exam.id])
+
+        # 1. Validar cada fila: estudiante, variante y duplicados
+        errors = []
+        rows = []
+        versions = []
+        for row, entry in enumerate(entries):
+            identification = entry.get("identification") or None
+            enrollment = enrollments.get(identification)
+            error = entry.get("error")
+            if error:
+                pass
+            elif not identification:
+                error = "Falta la identificación del estudiante"
+            elif enrollment is None:
+                error = "El estudiante no está inscrito en la sección"
+            elif entry.get("variant_code") not in key.version_index:
+                error = "Variante no encontrada"
+            elif (enrollment[0], exam.id) in graded:
+                error = "Ya existe una calificación para este examen"
+
+            if error:
+                errors.append(dict(entry["ref"], identification=identification, error=error))
+                continue
+            # Dos filas del mismo estudiante cuentan como duplicado
+            graded.add((enrollment[0], exam.id))
+            rows.append(row)
+            versions.append(key.version_index[entry.get("variant_code")])
+
+        # 2. Calificar todas las filas válidas con operaciones sobre arreglos
+        rows = np.array(rows, dtype=np.intp)
+        versions = np.array(versions, dtype=np.intp)
+        scored = score_answers(key, versions, answers[rows])
+        scorable = (key.correct != BLANK).sum(axis=1)[versions]
+
+        # 3. Registrar las calificaciones y las respuestas con inserciones masivas
+        grading_date = datetime.datetime.utcnow().isoformat()
+        grades_in = []
+        responses_in = []
+        results = []
+        for i, row in enumerate(rows.tolist()):
+            entry = entries[row]
+            enrollment = enrollments[entry["identification"]]
+            variant_code = entry.get("variant_code")
+            correct, score = int(scored["correct"][i]), float(scored["score"][i])
+            comments = f"{source}: {correct} de {int(scorable[i])} correctas"
+            if variant_code:
+                comments += f" (variante {variant_code})"
+            grades_in.append({
+                "student_id": enrollment[1],
+                "enrollment_id": enrollment[0],
+                "exam_id": exam.id,
+                "score": score,
+                "comments": comments,
+                "graded_by_id": user_id,
+                "grading_date": grading_date,
+            })
+            responses_in.append({
+                "exam_id": exam.id,
+                "enrollment_id": enrollment[0],
+                "student_id": enrollment[1],
+                "variant_code": variant_code,
+                "correct": correct,
+                "score": score,
+                "created_at": grading_date,
+            })
+            results.append(dict(
+                entry["ref"],
+                identification=entry["identification"],
+                variant_code=variant_code,
+                answered=int(scored["answered"][i]),
+                correct=correct,
+                score=score,
+            ))
+
+        # Importación local: item_analysis depende de este módulo
+        from app.services.item_analysis import ItemAnalysis
+        ItemAnalysis.record(
+            db, exam_id=exam.id, key=key, original=key.original_answers(versions, answers[rows]),
+            responses_in=responses_in
+        )
+        imported = crud.create_grades(db, grades_in=grades_in)
+        return {"total": len(entries), "imported": imported, "results": results, "errors": errors}
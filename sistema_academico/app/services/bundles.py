@@ -0,0 +1,68 @@
+import io
+import os
+import time
+import zipfile
+from typing import Iterable, Iterator, List, Tuple
+
+# Tamaño de bloque para leer los archivos y enviar el ZIP
+CHUNK_SIZE = 64 * 1024
+
+
+class _ZipStream(io.RawIOBase):
+    """
+    Destino de escritura no posicionable para zipfile: acumula lo escrito
+    hasta que el generador lo recoge con drain(). Como no admite seek,
+    zipfile escribe cada entrada con descriptor de datos al final y nunca
+    vuelve atrás, así que el ZIP puede enviarse a medida que se genera.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        # zipfile usa tell() para registrar el desplazamiento de cada entrada
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def stream_zip(files: Iterable[Tuple[str, str]], chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    """
+    Genera un ZIP con los archivos indicados como (nombre en el ZIP, ruta),
+    comprimiendo sobre la marcha. Nunca hay en memoria más que un bloque de
+    cada archivo, y los primeros bytes salen antes de leer el segundo archivo.
+    """
+    stream = _ZipStream()
+    with zipfile.ZipFile(stream, mode="w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for arcname, path in files:
+            info = zipfile.ZipInfo(arcname, date_time=time.localtime(os.path.getmtime(path))[:6])
+            info.compress_type = zipfile.ZIP_DEFLATED
+            # Con el tamaño conocido, zipfile decide si la entrada necesita ZIP64
+            info.file_size = os.path.getsize(path)
+            with open(path, "rb") as source, archive.open(info, mode="w") as target:
+                for chunk in iter(lambda: source.read(chunk_size), b""):
+                    target.write(chunk)
+                    data = stream.drain()
+                    if data:
+                        yield data
+            data = stream.drain()
+            if data:
+                yield data
+    # Directorio central, escrito al cerrar el ZIP
+    data = stream.drain()
+    if data:
+        yield data
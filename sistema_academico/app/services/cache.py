@@ -0,0 +1,243 @@
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from typing import Any, List, Optional, Tuple
+
+from app.core.config import settings
+
+# Tamaño de bloque para leer archivos sin cargarlos completos en memoria
+CHUNK_SIZE = 1024 * 1024
+
+# Sufijo de los temporales de escrituras en curso (ver DiskCache._write)
+TMP_SUFFIX = ".tmp"
+
+# Cada cuánto se vuelve a medir el directorio para contar lo que escribieron
+# otros procesos
+RESCAN_SECONDS = 300
+
+
+def hash_file(file_path: str) -> str:
+    """
+    Calcula el hash SHA-256 del contenido de un archivo leyéndolo por bloques
+    """
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as file:
+        for chunk in iter(lambda: file.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class DiskCache:
+    """
+    Caché persistente en disco direccionada por clave. Las entradas se
+    reparten en subdirectorios según el prefijo de la clave y, cuando el
+    tamaño total supera el límite, se desalojan las menos usadas recientemente.
+    Con max_age_seconds, además se desalojan las que no se usan hace más de
+    ese tiempo.
+
+    El tamaño total se lleva como un acumulado de lo que escribe y borra
+    este proceso: el directorio solo se recorre cuando el acumulado supera
+    el límite o cada RESCAN_SECONDS.
+    """
+
+    def __init__(self, directory: str, max_bytes: int, max_age_seconds: Optional[int] = None):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self._lock = threading.Lock()
+        self._total: Optional[int] = None  # None hasta el primer recorrido
+        self._scanned_at = 0.0
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key)
+
+    def _is_expired(self, mtime: float, now: float) -> bool:
+        return bool(self.max_age_seconds) and now - mtime > self.max_age_seconds
+
+    def get_path(self, key: str) -> Optional[str]:
+        """
+        Ruta del archivo de una entrada, o None si no existe o expiró.
+        La entrada se marca como usada recientemente para el desalojo LRU.
+        """
+        path = self._path(key)
+        try:
+            if self._is_expired(os.stat(path).st_mtime, time.time()):
+                self.delete(key)
+                return None
+            os.utime(path, None)
+        except FileNotFoundError:
+            return None
+        except OSError:
+            pass
+        return path
+
+    def get(self, key: str) -> Optional[bytes]:
+        """
+        Obtiene el contenido de una entrada, o None si no existe
+        """
+        path = self.get_path(key)
+        if path is None:
+            return None
+        try:
+            with open(path, "rb") as file:
+                return file.read()
+        except FileNotFoundError:
+            return None
+
+    def set(self, key: str, data: bytes) -> None:
+        """
+        Guarda una entrada de forma atómica y aplica el límite de tamaño
+        """
+        if len(data) > self.max_bytes:
+            return
+        self._write(key, lambda file: file.write(data))
+        self.evict()
+
+    def set_file(self, key: str, source_path: str, evict: bool = True) -> None:
+        """
+        Guarda una copia de un archivo como entrada. Con evict=False no se
+        aplica el límite de tamaño, para guardar varias entradas seguidas y
+        aplicarlo una sola vez al final.
+        """
+        if os.path.getsize(source_path) > self.max_bytes:
+            return
+
+        def copy(file):
+            with open(source_path, "rb") as source:
+                shutil.copyfileobj(source, file, CHUNK_SIZE)
+
+        self._write(key, copy)
+        if evict:
+            self.evict()
+
+    def _write(self, key: str, write) -> None:
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        previous_size = self._size(path)
+
+        # Escribir en un temporal y renombrar para que otros procesos
+        # nunca lean una entrada a medio escribir
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=TMP_SUFFIX)
+        try:
+            with os.fdopen(fd, "wb") as file:
+                write(file)
+                size = file.tell()
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self._add_size(size - previous_size)
+
+    @staticmethod
+    def _size(path: str) -> int:
+        try:
+            return os.stat(path).st_size
+        except FileNotFoundError:
+            return 0
+
+    def _add_size(self, delta: int) -> None:
+        with self._lock:
+            if self._total is not None:
+                self._total += delta
+
+    def get_json(self, key: str) -> Optional[Any]:
+        data = self.get(key)
+        if data is None:
+            return None
+        try:
+            return json.loads(gzip.decompress(data).decode("utf-8"))
+        except (OSError, ValueError):
+            # Entrada corrupta: se descarta y se trata como ausente
+            self.delete(key)
+            return None
+
+    def set_json(self, key: str, value: Any) -> None:
+        data = gzip.compress(json.dumps(value, ensure_ascii=False).encode("utf-8"))
+        self.set(key, data)
+
+    def delete(self, key: str) -> None:
+        path = self._path(key)
+        size = self._size(path)
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            return
+        self._add_size(-size)
+
+    def _scan(self) -> List[Tuple[float, int, str]]:
+        """
+        Entradas del directorio como (último uso, tamaño, ruta). Elimina las
+        expiradas y omite los temporales de escrituras en curso, que pueden
+        ser de otros procesos.
+        """
+        entries = []
+        now = time.time()
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith(TMP_SUFFIX):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                    if self._is_expired(stat.st_mtime, now):
+                        os.remove(path)
+                        continue
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def evict(self) -> None:
+        """
+        Aplica el límite de tamaño. Mientras el total acumulado no supere
+        max_bytes no hace nada; si lo supera (o pasó RESCAN_SECONDS desde el
+        último recorrido), recorre el directorio, elimina las entradas
+        expiradas y luego las usadas hace más tiempo hasta respetar max_bytes.
+        """
+        with self._lock:
+            if (
+                self._total is not None
+                and self._total <= self.max_bytes
+                and time.time() - self._scanned_at < RESCAN_SECONDS
+            ):
+                return
+
+            entries = self._scan()
+            total = sum(size for _, size, _ in entries)
+            if total > self.max_bytes:
+                entries.sort()
+                for _, size, path in entries:
+                    if total <= self.max_bytes:
+                        break
+                    try:
+                        os.remove(path)
+                    except FileNotFoundError:
+                        pass
+                    total -= size
+            self._total = total
+            self._scanned_at = time.time()
+
+
+# Caché de resultados de DocumentProcessor.process_document
+extraction_cache = DiskCache(
+    settings.EXTRACTION_CACHE_DIR, settings.EXTRACTION_CACHE_MAX_BYTES
+)
+
+# Entradas de los índices de distractores de cada material y los índices
+# ya construidos de cada curso (ver services/ingestion.py y generation.py)
+distractor_cache = DiskCache(
+    settings.DISTRACTOR_CACHE_DIR, settings.DISTRACTOR_CACHE_MAX_BYTES
+)
+
+# Artefactos de los exámenes generados con semilla (ver services/generation.py)
+exam_cache = DiskCache(
+    settings.GENERATION_CACHE_DIR,
+    settings.GENERATION_CACHE_MAX_BYTES,
+    settings.GENERATION_CACHE_MAX_AGE_SECONDS
+)
@@ -0,0 +1,166 @@
+import threading
+from typing import Any, Dict, List, Optional, Set
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app import crud
+from app.db.courses import Concept, Question
+
+# Nombre del proceso en calibration_state
+CALIBRATION_NAME = "difficulty"
+
+# Proporción de aciertos que separa las dificultades
+EASY_P_VALUE = 0.7  # Desde aquí: fácil
+HARD_P_VALUE = 0.4  # Por debajo: difícil
+
+# Evita dos ejecuciones simultáneas en el mismo proceso; entre procesos lo
+# impide la marca de agua (ver crud.advance_calibration_watermark)
+_run_lock = threading.Lock()
+
+
+def difficulty_labels(p_values: np.ndarray) -> np.ndarray:
+    """
+    Dificultad observada a partir de la proporción de aciertos
+    """
+    return np.select([p_values >= EASY_P_VALUE, p_values < HARD_P_VALUE], ["easy", "hard"], "medium")
+
+
+def count_hits(
+    answers: List[List[int]],
+    key: List[Dict[str, Any]],
+    known_concepts: Optional[Set[int]] = None
+) -> Optional[Dict[str, np.ndarray]]:
+    """
+    Respuestas y aciertos por pregunta de un lote de respuestas de un mismo
+    examen, comparando la matriz completa con la clave. None si las
+    respuestas no corresponden a las preguntas actuales del examen. Con
+    known_concepts, las preguntas cuyo concepto ya no existe (se eliminó al
+    volver a procesar su sección) quedan sin concepto (id 0).
+    """
+    if any(len(row) != len(key) for row in answers):
+        return None
+    correct = np.array([-1 if entry["correct"] is None else entry["correct"] for entry in key])
+    scorable = np.flatnonzero(correct >= 0)
+    hits = np.array(answers, dtype=np.int16).reshape(len(answers), len(key))[:, scorable] == correct[scorable]
+    concept_ids = [key[i]["concept_id"] or 0 for i in scorable]
+    if known_concepts is not None:
+        concept_ids = [concept_id if concept_id in known_concepts else 0 for concept_id in concept_ids]
+    return {
+        "question_ids": np.array([key[i]["question_id"] for i in scorable], dtype=np.int64),
+        "concept_ids": np.array(concept_ids, dtype=np.int64),
+        "responses": np.full(len(scorable), len(answers), dtype=np.int64),
+        "correct": hits.sum(axis=0),
+    }
+
+
+class DifficultyCalibration:
+    """
+    Calibración empírica de la dificultad. Recorre solo las respuestas
+    guardadas desde la ejecución anterior, en lotes: acumula los aciertos de
+    cada concepto con operaciones sobre arreglos y reescribe la dificultad
+    ('easy', 'medium', 'hard') de las preguntas y conceptos con suficientes
+    respuestas. Así el muestreo por dificultad del generador usa la
+    dificultad observada en lugar de la asignada al extraer los conceptos.
+    """
+
+    @staticmethod
+    def run(db: Session, batch_size: int, min_responses: int) -> Dict[str, Any]:
+        """
+        Procesa las respuestas nuevas. Cada lote (estadísticas, dificultades y
+        marca de agua) se confirma en una sola transacción, por lo que una
+        ejecución interrumpida retoma desde el último lote confirmado.
+        """
+        if not _run_lock.acquire(blocking=False):
+            return {"status": "running", "responses": 0, "questions": 0, "concepts": 0}
+        try:
+            status, responses, question_ids, concept_ids = "completed", 0, set(), set()
+            while True:
+                processed = DifficultyCalibration._run_batch(db, batch_size, min_responses)
+                if processed is None:
+                    status = "conflict"
+                    break
+                if not processed["responses"]:
+                    break
+                responses += processed["responses"]
+                question_ids.update(processed["question_ids"])
+                concept_ids.update(processed["concept_ids"])
+            return {
+                "status": status,
+                "responses": responses,
+                "questions": len(question_ids),
+                "concepts": len(concept_ids),
+                "last_response_id": crud.get_calibration_watermark(db, CALIBRATION_NAME),
+            }
+        finally:
+            _run_lock.release()
+
+    @staticmethod
+    def _run_batch(db: Session, batch_size: int, min_responses: int) -> Optional[Dict[str, Any]]:
+        previous_id = crud.get_calibration_watermark(db, CALIBRATION_NAME)
+        rows = crud.get_exam_responses_after(db, after_id=previous_id, limit=batch_size)
+        if not rows:
+            return {"responses": 0, "question_ids": [], "concept_ids": []}
+
+        # 1. Aciertos por pregunta de cada examen del lote
+        by_exam: Dict[int, List[List[int]]] = {}
+        for _, exam_id, answers in rows:
+            by_exam.setdefault(exam_id, []).append(answers)
+        keys = crud.get_exam_keys(db, exam_ids=list(by_exam))
+        known_concepts = set(crud.get_existing_concept_ids(db, concept_ids=list({
+            entry["concept_id"] for key in keys.values() for entry in key if entry["concept_id"]
+        })))
+        counts = [count_hits(answers, keys[exam_id], known_concepts) for exam_id, answers in by_exam.items()]
+        counts = [count for count in counts if count is not None and len(count["question_ids"])]
+
+        question_ids = np.concatenate([count["question_ids"] for count in counts]) if counts else np.empty(0, np.int64)
+        concept_ids = np.concatenate([count["concept_ids"] for count in counts]) if counts else np.empty(0, np.int64)
+        responses = np.concatenate([count["responses"] for count in counts]) if counts else np.empty(0, np.int64)
+        correct = np.concatenate([count["correct"] for count in counts]) if counts else np.empty(0, np.int64)
+
+        # 2. Sumar por concepto (las preguntas sin concepto tienen id 0)
+        with_concept = concept_ids > 0
+        unique_concepts, inverse = np.unique(concept_ids[with_concept], return_inverse=True)
+        concept_responses = np.bincount(inverse, weights=responses[with_concept], minlength=len(unique_concepts))
+        concept_correct = np.bincount(inverse, weights=correct[with_concept], minlength=len(unique_concepts))
+        crud.increment_concept_stats(db, concept_deltas=[
+            {"concept_id": int(concept_id), "responses": int(total), "correct": int(hits)}
+            for concept_id, total, hits in zip(unique_concepts, concept_responses, concept_correct)
+        ])
+
+        # 3. Reescribir la dificultad de lo que tocó el lote y tiene suficientes respuestas
+        question_rows = DifficultyCalibration._calibrated(
+            crud.get_question_stat_counts(db, question_ids=np.unique(question_ids).tolist()), min_responses
+        )
+        concept_rows = DifficultyCalibration._calibrated(
+            crud.get_concept_stat_counts(db, concept_ids=unique_concepts.tolist()), min_responses
+        )
+        crud.set_difficulties(db, Question, question_rows)
+        crud.set_difficulties(db, Concept, concept_rows)
+
+        if not crud.advance_calibration_watermark(db, CALIBRATION_NAME, previous_id, rows[-1][0]):
+            # Otra ejecución procesó este lote mientras tanto
+            db.rollback()
+            return None
+        db.commit()
+        return {
+            "responses": len(rows),
+            "question_ids": [row["id"] for row in question_rows],
+            "concept_ids": [row["id"] for row in concept_rows],
+        }
+
+    @staticmethod
+    def _calibrated(stat_counts: List, min_responses: int) -> List[Dict[str, Any]]:
+        """
+        Dificultad observada de las filas (id, respuestas, aciertos) con al
+        menos min_responses respuestas
+        """
+        if not stat_counts:
+            return []
+        ids, responses, correct = (np.array(column) for column in zip(*stat_counts))
+        enough = responses >= max(min_responses, 1)
+        labels = difficulty_labels(correct[enough] / responses[enough])
+        return [
+            {"id": int(item_id), "difficulty": str(label)}
+            for item_id, label in zip(ids[enough], labels)
+        ]
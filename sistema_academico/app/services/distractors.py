@@ -0,0 +1,127 @@
+import math
+import random
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Tipos de concepto cuyo contenido sirve como distractor: definiciones y
+# explicaciones de secciones (las listas no se parecen a una respuesta)
+DISTRACTOR_CONCEPT_TYPES = ('definition', 'section_content')
+
+# Muestras que se toman de un grupo por cada distractor que falta, para
+# tener margen al descartar candidatos repetidos o del mismo término
+OVERSAMPLE = 3
+
+
+def length_bucket(text: str) -> int:
+    """
+    Grupo de longitud de un texto: media octava de cantidad de palabras
+    (1, 2, 3, 4-5, 6-7, 8-11, 12-15, ...), de modo que los textos de un mismo
+    grupo tengan una longitud parecida
+    """
+    return int(math.log2(max(len(text.split()), 1)) * 2)
+
+
+def normalize_term(term: str) -> str:
+    return " ".join(term.lower().split())
+
+
+class DistractorIndex:
+    """
+    Índice de distractores de un corpus: los textos de las definiciones y
+    secciones agrupados por sección y longitud, con el término de origen de
+    cada uno. Se construye a partir de las entradas guardadas al procesar
+    los materiales y se guarda por curso (ver services/generation.py), y
+    cada consulta solo muestrea unos pocos candidatos de los grupos, sin
+    recorrer el corpus.
+    """
+
+    def __init__(self, entries: Iterable[Tuple[str, str, Optional[int], Optional[str]]]):
+        """
+        entries: tuplas (término, contenido, grupo de longitud, sección)
+        """
+        self.by_section_length: Dict[Tuple[str, int], List[Tuple[str, str]]] = {}
+        self.by_length: Dict[int, List[Tuple[str, str]]] = {}
+        seen = set()
+        for term, content, bucket, section in entries:
+            content = (content or "").strip()
+            if not content or content in seen:
+                continue
+            seen.add(content)
+            if bucket is None:
+                bucket = length_bucket(content)
+            entry = (normalize_term(term or ""), content)
+            self.by_length.setdefault(bucket, []).append(entry)
+            if section:
+                self.by_section_length.setdefault((section, bucket), []).append(entry)
+
+    @staticmethod
+    def entries(concepts: Iterable[Dict]) -> List[List]:
+        """
+        Entradas del índice (término, contenido, grupo de longitud, sección)
+        de conceptos como los de find_concepts_for_questions o
+        crud.get_distractor_concepts, con el grupo ya calculado. Se ordenan
+        por contenido para que el índice de un mismo contenido sea siempre el
+        mismo, sin importar el orden de los conceptos en la base de datos.
+        """
+        entries = [
+            [
+                concept['term'] or "",
+                concept['content'] or "",
+                concept.get('length_bucket'),
+                concept.get('section_hash'),
+            ]
+            for concept in concepts
+            if concept.get('type') in DISTRACTOR_CONCEPT_TYPES
+        ]
+        for entry in entries:
+            if entry[2] is None:
+                entry[2] = length_bucket(entry[1])
+        entries.sort(key=lambda entry: (entry[1], entry[0], entry[3] or ""))
+        return entries
+
+    @classmethod
+    def from_concepts(cls, concepts: Iterable[Dict]) -> "DistractorIndex":
+        """
+        Índice a partir de conceptos como los de find_concepts_for_questions
+        o crud.get_distractor_concepts
+        """
+        return cls(cls.entries(concepts))
+
+    def __len__(self) -> int:
+        return sum(len(entries) for entries in self.by_length.values())
+
+    def distractors(
+        self,
+        answer: str,
+        term: str,
+        count: int,
+        section: Optional[str] = None,
+        rng: Optional[random.Random] = None
+    ) -> List[str]:
+        """
+        Hasta count distractores para la respuesta correcta de un concepto:
+        primero textos de la misma sección y longitud, luego de la misma
+        longitud en todo el corpus y por último de longitudes vecinas. Se
+        descartan la respuesta y los textos del mismo término.
+        """
+        rng = rng or random
+        answer = answer.strip()
+        term = normalize_term(term)
+        bucket = length_bucket(answer)
+
+        groups = []
+        if section:
+            groups.append(self.by_section_length.get((section, bucket)))
+        groups.extend(self.by_length.get(b) for b in (bucket, bucket - 1, bucket + 1))
+
+        selected: List[str] = []
+        for group in groups:
+            if not group:
+                continue
+            missing = count - len(selected)
+            sample_size = min(missing * OVERSAMPLE, len(group))
+            for candidate_term, content in rng.sample(group, sample_size):
+                if candidate_term != term and content != answer and content not in selected:
+                    selected.append(content)
+                    if len(selected) == count:
+                        return selected
+        return selected
@@ -1,11 +1,41 @@
 # app/services/document_processor.py
+import asyncio
+import hashlib
+import io
+import logging
 import os
 import re
 import PyPDF2
 from io import BytesIO
-from typing import Dict, List, Tuple
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
 import docx
 
+from app.core.config import settings
+from app.services.cache import extraction_cache, hash_file
+from app.services.distractors import length_bucket
+from app.services.workers import run_in_process
+
+logger = logging.getLogger(__name__)
+
+# Versión del procesamiento. Debe incrementarse cada vez que cambie la
+# extracción o la estructuración, para invalidar los resultados en caché.
+PROCESSOR_VERSION = "4"
+
+# Patrones precompilados para structure_content
+SECTION_NUMBER_PATTERN = re.compile(r'\d+(?:\.\d+)*\.?\s+\w')
+LIST_ITEM_PATTERN = re.compile(r'\s*(?:\d+\.|•|\*|-)\s')
+SENTENCE_END_PATTERN = re.compile(r'[.!?]')
+# Con lookahead para encontrar también los conectores solapados
+DEFINITION_CONNECTOR_PATTERN = re.compile(r'(?=(\s(?:es|se\sdefine\scomo|se\srefiere\sa)\s))')
+
+
+class DocumentProcessingError(Exception):
+    """
+    Error al extraer el contenido de un documento
+    """
+    pass
+
+
 class DocumentProcessor:
     """
     Clase para procesar documentos PDF y DOCX, extraer su contenido
@@ -13,21 +43,57 @@ class DocumentProcessor:
     """
     
     @staticmethod
-    def extract_text_from_pdf(file_path: str) -> str:
+    def iter_pdf_pages(
+        file_path: str,
+        max_pages: Optional[int] = None,
+        max_text_bytes: Optional[int] = None
+    ) -> Iterator[Tuple[int, str]]:
         """
-        Extrae texto de un archivo PDF
+        Recorre un PDF página a página y devuelve tuplas (número de página, texto),
+        numeradas desde 1. Solo se mantiene en memoria la página actual.
+        
+        La extracción se detiene al llegar a max_pages páginas o cuando el texto
+        extraído supera max_text_bytes bytes en UTF-8 (por defecto, PDF_MAX_PAGES
+        y EXTRACTION_MAX_TEXT_BYTES de la configuración).
         """
+        if max_pages is None:
+            max_pages = settings.PDF_MAX_PAGES
+        if max_text_bytes is None:
+            max_text_bytes = settings.EXTRACTION_MAX_TEXT_BYTES
+        
+        extracted_bytes = 0
         try:
-            text = ""
             with open(file_path, "rb") as file:
                 pdf_reader = PyPDF2.PdfReader(file)
-                for page_num in range(len(pdf_reader.pages)):
-                    page = pdf_reader.pages[page_num]
-                    text += page.extract_text() + "\n\n"
-            return text
+                num_pages = len(pdf_reader.pages)
+                if max_pages:
+                    num_pages = min(num_pages, max_pages)
+                
+                for page_num in range(num_pages):
+                    page_text = pdf_reader.pages[page_num].extract_text() or ""
+                    
+                    # Las vocales con tilde y la ñ ocupan dos bytes en UTF-8
+                    extracted_bytes += len(page_text.encode("utf-8"))
+                    if max_text_bytes and extracted_bytes > max_text_bytes:
+                        logger.warning(
+                            "Extracción de %s truncada en la página %d por superar %d bytes de texto",
+                            file_path, page_num + 1, max_text_bytes
+                        )
+                        return
+                    
+                    yield page_num + 1, page_text
         except Exception as e:
-            print(f"Error al procesar PDF: {e}")
-            return ""
+            raise DocumentProcessingError(f"Error al procesar PDF: {e}") from e
+    
+    @staticmethod
+    def extract_text_from_pdf(file_path: str, max_pages: Optional[int] = None) -> str:
+        """
+        Extrae texto de un archivo PDF
+        """
+        return "".join(
+            f"{page_text}\n\n"
+            for _, page_text in DocumentProcessor.iter_pdf_pages(file_path, max_pages=max_pages)
+        )
     
     @staticmethod
     def extract_text_from_docx(file_path: str) -> str:
@@ -49,19 +115,59 @@ class DocumentProcessor:
             
             return '\n'.join(full_text)
         except Exception as e:
-            print(f"Error al procesar DOCX: {e}")
-            return ""
+            raise DocumentProcessingError(f"Error al procesar DOCX: {e}") from e
     
     @staticmethod
-    def process_document(file_path: str) -> Dict:
+    def cache_key(content_hash: str, file_extension: str) -> str:
+        """
+        Clave de caché: hash del contenido, extensión (que determina el
+        extractor usado) y versión del procesador
+        """
+        return f"{content_hash}-{file_extension.lstrip('.') or 'txt'}-v{PROCESSOR_VERSION}"
+    
+    @staticmethod
+    def process_document(
+        file_path: str, use_cache: bool = True, content_hash: Optional[str] = None
+    ) -> Dict:
         """
         Procesa un documento basado en su extensión
-        y retorna un diccionario con su contenido estructurado
+        y retorna un diccionario con su contenido estructurado.
+        Si el mismo contenido ya fue procesado, se reutiliza el resultado en caché.
+        Si ya se conoce el hash del contenido, puede indicarse en content_hash.
         """
         file_extension = os.path.splitext(file_path)[1].lower()
         
+        if content_hash is None:
+            content_hash = hash_file(file_path)
+        cache_key = None
+        if use_cache and settings.EXTRACTION_CACHE_ENABLED:
+            cache_key = DocumentProcessor.cache_key(content_hash, file_extension)
+            cached = extraction_cache.get_json(cache_key)
+            if cached is not None:
+                return {
+                    'file_path': file_path,
+                    'content_hash': content_hash,
+                    'raw_text': cached['raw_text'],
+                    'processed_content': cached['processed_content']
+                }
+        
+        processed_content = None
         if file_extension == '.pdf':
-            raw_text = DocumentProcessor.extract_text_from_pdf(file_path)
+            # Cada página se estructura y se agrega al texto completo a medida
+            # que se extrae, sin guardar la lista de páginas. Solo al obtener
+            # el texto final conviven dos copias (el búfer y el resultado), y
+            # EXTRACTION_MAX_TEXT_BYTES acota su tamaño.
+            raw_buffer = io.StringIO()
+
+            def pages() -> Iterator[str]:
+                for _, page_text in DocumentProcessor.iter_pdf_pages(file_path):
+                    raw_buffer.write(page_text)
+                    raw_buffer.write("\n\n")
+                    yield page_text
+
+            processed_content = DocumentProcessor.structure_content(pages())
+            raw_text = raw_buffer.getvalue()
+            raw_buffer.close()
         elif file_extension in ['.docx', '.doc']:
             raw_text = DocumentProcessor.extract_text_from_docx(file_path)
         else:
@@ -75,104 +181,216 @@ class DocumentProcessor:
                     raw_text = file.read()
         
         # Procesar el texto para estructurarlo
-        processed_content = DocumentProcessor.structure_content(raw_text)
+        if processed_content is None:
+            processed_content = DocumentProcessor.structure_content(raw_text)
+        
+        # No se guardan extracciones vacías: suelen deberse a errores de lectura
+        if cache_key and raw_text:
+            extraction_cache.set_json(cache_key, {
+                'raw_text': raw_text,
+                'processed_content': processed_content
+            })
         
         return {
             'file_path': file_path,
+            'content_hash': content_hash,
             'raw_text': raw_text,
             'processed_content': processed_content
         }
     
     @staticmethod
-    def structure_content(text: str) -> Dict:
+    def process_document_safe(file_path: str, content_hash: Optional[str] = None) -> Dict:
+        """
+        Igual que process_document, pero en lugar de lanzar excepciones
+        las reporta en la clave 'error'. Pensado para ejecutarse en un
+        proceso de trabajo.
+        """
+        try:
+            result = DocumentProcessor.process_document(file_path, content_hash=content_hash)
+            result['error'] = None
+            return result
+        except Exception as e:
+            return {
+                'file_path': file_path,
+                'content_hash': None,
+                'raw_text': '',
+                'processed_content': None,
+                'error': str(e)
+            }
+    
+    @staticmethod
+    async def process_documents_async(
+        file_paths: List[str], content_hashes: Optional[List[Optional[str]]] = None
+    ) -> List[Dict]:
+        """
+        Procesa varios documentos en paralelo en el pool de procesos, sin
+        bloquear el bucle de eventos. Los resultados se devuelven en el mismo
+        orden que file_paths; los documentos que fallan llevan su 'error'.
+        """
+        if content_hashes is None:
+            content_hashes = [None] * len(file_paths)
+        tasks = [
+            run_in_process(DocumentProcessor.process_document_safe, file_path, content_hash)
+            for file_path, content_hash in zip(file_paths, content_hashes)
+        ]
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        
+        processed = []
+        for file_path, result in zip(file_paths, results):
+            if isinstance(result, Exception):
+                # El proceso de trabajo terminó de forma anormal
+                result = {
+                    'file_path': file_path,
+                    'content_hash': None,
+                    'raw_text': '',
+                    'processed_content': None,
+                    'error': f"Error al procesar el documento: {result!r}"
+                }
+            processed.append(result)
+        return processed
+    
+    @staticmethod
+    def iter_paragraphs(text: Union[str, Iterable[str]]) -> Iterator[str]:
+        """
+        Devuelve los párrafos no vacíos de un texto, o de una secuencia de
+        fragmentos de texto (por ejemplo, las páginas de un PDF)
+        """
+        chunks = [text] if isinstance(text, str) else text
+        for chunk in chunks:
+            for line in chunk.split('\n'):
+                paragraph = line.strip()
+                if paragraph:
+                    yield paragraph
+    
+    @staticmethod
+    def find_definitions(paragraph: str) -> List[Tuple[str, str]]:
+        """
+        Busca definiciones del tipo "X es Y", "X se define como Y" o
+        "X se refiere a Y" en un párrafo y devuelve pares (término, definición).
+        
+        Cada oración (texto terminado en . ! o ?) se analiza por separado y se
+        usa el último conector de la oración, en tiempo lineal respecto al
+        largo del párrafo.
+        """
+        definitions = []
+        sentence_start = 0
+        for sentence_end in SENTENCE_END_PATTERN.finditer(paragraph):
+            sentence = paragraph[sentence_start:sentence_end.start()]
+            sentence_start = sentence_end.end()
+            
+            connectors = [
+                (m.start(1), m.end(1)) for m in DEFINITION_CONNECTOR_PATTERN.finditer(sentence)
+            ]
+            for position, connector_end in reversed(connectors):
+                # El término y la definición no pueden quedar vacíos
+                if position == 0 or connector_end == len(sentence):
+                    continue
+                term = sentence[:position].strip()
+                definition = sentence[connector_end:].strip()
+                if term and definition:
+                    definitions.append((term, definition))
+                break
+        return definitions
+    
+    @staticmethod
+    def structure_content(text: Union[str, Iterable[str]]) -> Dict:
         """
         Estructura el contenido crudo del documento para facilitar 
         la generación de preguntas. Identifica secciones, definiciones, etc.
+        Acepta el texto completo o un iterable de fragmentos (p. ej. páginas),
+        que se consume de forma incremental en una sola pasada.
         """
-        # Dividir por párrafos no vacíos
-        paragraphs = [p.strip() for p in text.split('\n') if p.strip()]
-        
-        # Identificar títulos y secciones
         sections = {}
         current_section = "general"
         sections[current_section] = []
+        # Definiciones por sección: un mismo término puede definirse en
+        # varias, y cada sección conserva las suyas
+        definitions = {current_section: {}}
+        lists = []
+        list_items = []
+        total_paragraphs = 0
         
-        for paragraph in paragraphs:
-            # Detectar si es un título (heurística simple)
-            is_title = False
-            
-            # Si es corto, tiene menos de 7 palabras y termina sin punto
-            if len(paragraph) < 100 and len(paragraph.split()) < 7 and not paragraph.strip().endswith('.'):
-                is_title = True
-            
-            # Si tiene números de sección como "1.", "1.1", etc.
-            if re.match(r'^\d+(\.\d+)*\.?\s+\w+', paragraph):
-                is_title = True
+        for paragraph in DocumentProcessor.iter_paragraphs(text):
+            total_paragraphs += 1
             
-            # Si está todo en mayúsculas
-            if paragraph.isupper() and len(paragraph) > 5:
-                is_title = True
+            # Detectar si es un título (heurística simple):
+            # corto, con menos de 7 palabras y sin punto final,
+            # con números de sección como "1.", "1.1", etc.,
+            # o todo en mayúsculas
+            is_title = (
+                (len(paragraph) < 100 and len(paragraph.split()) < 7 and not paragraph.endswith('.'))
+                or SECTION_NUMBER_PATTERN.match(paragraph) is not None
+                or (paragraph.isupper() and len(paragraph) > 5)
+            )
             
             if is_title:
                 current_section = paragraph
                 sections[current_section] = []
+                definitions[current_section] = {}
             else:
                 sections[current_section].append(paragraph)
-        
-        # Identificar definiciones (patrones de texto como "X es Y", "X se define como Y")
-        definitions = {}
-        for section, paragraphs in sections.items():
-            for paragraph in paragraphs:
-                # Buscar patrones como "X es Y", "X se define como Y"
-                matches = re.findall(r'([^.!?]+)(?:\ses\s|\sse\sdefine\scomo\s|\sse\srefiere\sa\s)([^.!?]+)[.!?]', paragraph)
-                for match in matches:
-                    term = match[0].strip()
-                    definition = match[1].strip()
-                    if term and definition:
-                        definitions[term] = definition
-        
-        # Identificar listas numeradas o con viñetas
-        lists = []
-        list_items = []
-        in_list = False
-        
-        for paragraph in paragraphs:
-            # Detectar elementos de lista numerada o con viñetas
-            if re.match(r'^\s*(\d+\.|•|\*|\-)\s', paragraph):
-                if not in_list:
-                    in_list = True
-                    list_items = []
+                
+                # Identificar definiciones
+                for term, definition in DocumentProcessor.find_definitions(paragraph):
+                    definitions[current_section][term] = definition
+            
+            # Identificar listas numeradas o con viñetas
+            if LIST_ITEM_PATTERN.match(paragraph):
                 list_items.append(paragraph)
-            elif in_list:
-                in_list = False
-                if list_items:
-                    lists.append(list_items.copy())
+            elif list_items:
+                lists.append(list_items)
+                list_items = []
         
-        if in_list and list_items:
+        if list_items:
             lists.append(list_items)
         
         return {
             'sections': sections,
-            'definitions': definitions,
+            'definitions': {section: terms for section, terms in definitions.items() if terms},
             'lists': lists,
-            'total_paragraphs': len(paragraphs)
+            'total_paragraphs': total_paragraphs
+        }
+    
+    @staticmethod
+    def fingerprint(*parts: str) -> str:
+        """
+        Huella (SHA-1) de un fragmento del contenido estructurado
+        """
+        return hashlib.sha1("\0".join(parts).encode("utf-8")).hexdigest()
+    
+    @staticmethod
+    def section_fingerprints(processed_content: Dict) -> Dict[str, str]:
+        """
+        Huella de cada sección (título y párrafos). Si una sección no cambia
+        entre dos versiones de un documento, su huella tampoco.
+        """
+        return {
+            section: DocumentProcessor.fingerprint(section, *paragraphs)
+            for section, paragraphs in processed_content['sections'].items()
         }
     
     @staticmethod
     def find_concepts_for_questions(processed_content: Dict) -> List[Dict]:
         """
-        Identifica conceptos que pueden convertirse en preguntas
+        Identifica conceptos que pueden convertirse en preguntas.
+        Cada concepto lleva en 'section_hash' la huella de la parte del
+        documento de la que proviene, para reprocesar solo lo que cambió.
         """
         concepts = []
+        section_hashes = DocumentProcessor.section_fingerprints(processed_content)
         
-        # Extraer de definiciones
-        for term, definition in processed_content['definitions'].items():
-            concepts.append({
-                'type': 'definition',
-                'term': term,
-                'content': definition,
-                'difficulty': 'medium'
-            })
+        # Extraer de definiciones: cada una queda asociada a la sección donde
+        # aparece, por lo que (sección, término) la identifica
+        for section, terms in processed_content['definitions'].items():
+            for term, definition in terms.items():
+                concepts.append({
+                    'type': 'definition',
+                    'term': term,
+                    'content': definition,
+                    'difficulty': 'medium',
+                    'section_hash': section_hashes[section],
+                    'length_bucket': length_bucket(definition)
+                })
         
         # Extraer de secciones
         for section, paragraphs in processed_content['sections'].items():
@@ -182,7 +400,9 @@ class DocumentProcessor:
                     'type': 'section_content',
                     'term': section,
                     'content': paragraphs[0] if paragraphs else "",
-                    'difficulty': 'medium'
+                    'difficulty': 'medium',
+                    'section_hash': section_hashes[section],
+                    'length_bucket': length_bucket(paragraphs[0])
                 })
         
         # Extraer de listas
@@ -194,7 +414,9 @@ class DocumentProcessor:
                     'type': 'list_items',
                     'term': list_title,
                     'content': list_content,
-                    'difficulty': 'easy'
+                    'difficulty': 'easy',
+                    # Una lista puede abarcar varias secciones: su huella es la de sus elementos
+                    'section_hash': DocumentProcessor.fingerprint(list_title, *list_items)
                 })
         
-        return concepts
\ No newline at end of file
+        return concepts
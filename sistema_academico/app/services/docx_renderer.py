@@ -0,0 +1,365 @@
+import io
+import os
+import re
+import zipfile
+from contextlib import ExitStack
+from typing import Dict, Iterable, List, Optional, Tuple
+from xml.sax.saxutils import escape
+
+from docx import Document
+
+DOCUMENT_PART = "word/document.xml"
+
+# Caracteres que no admite XML 1.0
+INVALID_XML_CHARS = re.compile(r'[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+# Color de las respuestas correctas (verde)
+ANSWER_COLOR = "008000"
+
+# Estilos del documento base usados por el renderizador
+STYLE_NAMES = ["Heading 1", "Heading 2", "List Bullet", "Table Grid"]
+
+# Tamaño de los bloques escritos en el zip
+WRITE_BUFFER_SIZE = 256 * 1024
+
+
+class DocxTemplate:
+    """
+    Plantilla DOCX compilada: las partes del paquete (estilos, numeración,
+    propiedades) ya serializadas y el inicio y final de document.xml, de modo
+    que un documento nuevo solo requiere generar el XML del cuerpo.
+    """
+
+    def __init__(
+        self,
+        parts: List[Tuple[zipfile.ZipInfo, bytes]],
+        document_head: str,
+        document_tail: str,
+        style_ids: Dict[str, str],
+        text_width: int
+    ):
+        self.parts = parts
+        self.document_head = document_head
+        self.document_tail = document_tail
+        self.style_ids = style_ids
+        self.text_width = text_width  # Ancho útil de la página en twips
+
+    @staticmethod
+    def compile() -> "DocxTemplate":
+        """
+        Compila la plantilla a partir del documento por defecto de python-docx,
+        el mismo que usaba ExamGenerator, para conservar su aspecto
+        """
+        document = Document()
+        style_ids = {name: document.styles[name].style_id for name in STYLE_NAMES}
+        section = document.sections[0]
+        text_width = (section.page_width - section.left_margin - section.right_margin) // 635
+
+        buffer = io.BytesIO()
+        document.save(buffer)
+
+        parts = []
+        document_xml = None
+        with zipfile.ZipFile(io.BytesIO(buffer.getvalue())) as package:
+            for info in package.infolist():
+                if info.filename == DOCUMENT_PART:
+                    document_xml = package.read(info).decode("utf-8")
+                parts.append((info, package.read(info)))
+
+        body_start = document_xml.index("<w:body>") + len("<w:body>")
+        sect_match = re.search(r"<w:sectPr[\s\S]*</w:sectPr>", document_xml)
+        return DocxTemplate(
+            parts=parts,
+            document_head=document_xml[:body_start],
+            document_tail=(sect_match.group(0) if sect_match else "") + "</w:body></w:document>",
+            style_ids=style_ids,
+            text_width=int(text_width)
+        )
+
+
+_template: Optional[DocxTemplate] = None
+
+
+def get_template() -> DocxTemplate:
+    """
+    Plantilla compilada, una vez por proceso
+    """
+    global _template
+    if _template is None:
+        _template = DocxTemplate.compile()
+    return _template
+
+
+class DocxStream:
+    """
+    Documento DOCX en escritura: copia las partes de la plantilla y recibe
+    el XML del cuerpo por fragmentos, que escribe en document.xml por bloques
+    """
+
+    def __init__(self, output_path: str):
+        self.output_path = output_path
+        self.template = get_template()
+        self.package = zipfile.ZipFile(output_path, "w", zipfile.ZIP_DEFLATED)
+        self.pending: List[str] = []
+        self.size = 0
+
+        # Partes anteriores a document.xml, en el orden de la plantilla
+        self.remaining_parts = list(self.template.parts)
+        while self.remaining_parts and self.remaining_parts[0][0].filename != DOCUMENT_PART:
+            info, data = self.remaining_parts.pop(0)
+            self.package.writestr(info, data)
+        if self.remaining_parts:
+            self.remaining_parts.pop(0)
+        self.document = self.package.open(DOCUMENT_PART, "w")
+        self.write(self.template.document_head)
+
+    def write(self, chunk: str) -> None:
+        self.pending.append(chunk)
+        self.size += len(chunk)
+        if self.size >= WRITE_BUFFER_SIZE:
+            self.flush()
+
+    def flush(self) -> None:
+        self.document.write("".join(self.pending).encode("utf-8"))
+        self.pending = []
+        self.size = 0
+
+    def close(self) -> None:
+        self.write(self.template.document_tail)
+        self.flush()
+        self.document.close()
+        for info, data in self.remaining_parts:
+            self.package.writestr(info, data)
+        self.package.close()
+
+    def __enter__(self) -> "DocxStream":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            # No se deja un documento a medio escribir
+            self.document.close()
+            self.package.close()
+            os.remove(self.output_path)
+
+
+class DocxRenderer:
+    """
+    Generación rápida de documentos DOCX: el XML del cuerpo se construye
+    como texto y se escribe por bloques directamente en el zip, en lugar de
+    crear cada párrafo y cada run con python-docx.
+    """
+
+    @staticmethod
+    def text(value: str) -> str:
+        """
+        Texto de un run; como python-docx, convierte saltos de línea y
+        tabulaciones en sus elementos
+        """
+        value = escape(INVALID_XML_CHARS.sub("", str(value)))
+        value = value.replace("\t", '</w:t><w:tab/><w:t xml:space="preserve">')
+        return value.replace("\n", '</w:t><w:br/><w:t xml:space="preserve">')
+
+    @staticmethod
+    def run(
+        value: str, bold: bool = False, italic: bool = False, color: Optional[str] = None
+    ) -> str:
+        properties = ""
+        if bold:
+            properties += "<w:b/>"
+        if italic:
+            properties += "<w:i/>"
+        if color:
+            properties += f'<w:color w:val="{color}"/>'
+        if properties:
+            properties = f"<w:rPr>{properties}</w:rPr>"
+        return f'<w:r>{properties}<w:t xml:space="preserve">{DocxRenderer.text(value)}</w:t></w:r>'
+
+    @staticmethod
+    def paragraph(
+        runs: Iterable[str] = (), style: Optional[str] = None, align: Optional[str] = None
+    ) -> str:
+        properties = ""
+        if style:
+            properties += f'<w:pStyle w:val="{get_template().style_ids[style]}"/>'
+        if align:
+            properties += f'<w:jc w:val="{align}"/>'
+        if properties:
+            properties = f"<w:pPr>{properties}</w:pPr>"
+        return f"<w:p>{properties}{''.join(runs)}</w:p>"
+
+    @staticmethod
+    def text_paragraph(value: str, style: Optional[str] = None, align: Optional[str] = None) -> str:
+        return DocxRenderer.paragraph([DocxRenderer.run(value)] if value else [], style, align)
+
+    @staticmethod
+    def table(rows: List[List[str]], style: str = "Table Grid") -> str:
+        """
+        Tabla con celdas de texto y columnas de igual ancho, como
+        Document.add_table de python-docx
+        """
+        cols = max(len(row) for row in rows)
+        width = get_template().text_width // cols
+        cell_properties = f'<w:tcPr><w:tcW w:type="dxa" w:w="{width}"/></w:tcPr>'
+        grid = "".join(f'<w:gridCol w:w="{width}"/>' for _ in range(cols))
+        body = "".join(
+            "<w:tr>" + "".join(
+                f"<w:tc>{cell_properties}{DocxRenderer.text_paragraph(cell)}</w:tc>"
+                for cell in row
+            ) + "</w:tr>"
+            for row in rows
+        )
+        return (
+            f'<w:tbl><w:tblPr><w:tblStyle w:val="{get_template().style_ids[style]}"/>'
+            '<w:tblW w:type="auto" w:w="0"/>'
+            '<w:tblLook w:firstColumn="1" w:firstRow="1" w:lastColumn="0" w:lastRow="0" '
+            'w:noHBand="0" w:noVBand="1" w:val="04A0"/></w:tblPr>'
+            f"<w:tblGrid>{grid}</w:tblGrid>{body}</w:tbl>"
+        )
+
+    @staticmethod
+    def exam_header(compiled: Dict) -> str:
+        """
+        Encabezado del examen, común al examen y a la clave de respuestas
+        """
+        R = DocxRenderer
+        parts = [R.paragraph([R.run(compiled['title'])], style="Heading 1", align="center")]
+        if compiled['description']:
+            parts.append(R.text_paragraph(compiled['description'], align="center"))
+        parts.extend([
+            R.paragraph([R.run('Total de puntos: ', bold=True), R.run(f"{compiled['total_points']}")]),
+            R.text_paragraph('_' * 50),
+            R.paragraph([R.run('Instrucciones:')], style="Heading 2"),
+            R.text_paragraph('Responda cada una de las siguientes preguntas. Lea cuidadosamente antes de responder.'),
+        ])
+        return "".join(parts)
+
+    @staticmethod
+    def answer_sheet_header(compiled: Dict) -> str:
+        R = DocxRenderer
+        parts = [
+            R.paragraph([R.run(f"Hoja de Respuestas: {compiled['title']}")], style="Heading 1", align="center"),
+            R.text_paragraph('Nombre: ______________________________'),
+            R.text_paragraph('ID: ______________________________'),
+            R.text_paragraph('Fecha: ______________________________'),
+            R.text_paragraph('_' * 50),
+        ]
+        if compiled['multiple_choice_numbers']:
+            parts.append(R.paragraph([R.run('Selección Múltiple')], style="Heading 2"))
+        return "".join(parts)
+
+    @staticmethod
+    def answer_sheet_table(rows: List[List[str]], letters: List[str]) -> str:
+        """
+        Tabla de hasta 10 preguntas de selección múltiple con un círculo por opción
+        """
+        return DocxRenderer.table([['Pregunta'] + letters] + rows) + DocxRenderer.paragraph()
+
+    @staticmethod
+    def render_exam_documents(
+        compiled: Dict,
+        exam_path: Optional[str] = None,
+        answer_key_path: Optional[str] = None,
+        answer_sheet_path: Optional[str] = None
+    ) -> Dict[str, str]:
+        """
+        Genera, en una sola pasada sobre las preguntas de un examen compilado
+        con ExamGenerator.compile_exam, el examen, la clave de respuestas y la
+        hoja de respuestas. Los fragmentos comunes (enunciados, opciones) se
+        generan una sola vez. Se omiten los documentos sin ruta.
+        """
+        R = DocxRenderer
+        paths = {
+            'exam': exam_path,
+            'answer_key': answer_key_path,
+            'answer_sheet': answer_sheet_path,
+        }
+        paths = {name: path for name, path in paths.items() if path}
+
+        # Fragmentos que se repiten en todas las preguntas
+        answer_lines = R.text_paragraph("_" * 50) * 4
+        answer_label = R.text_paragraph("Respuesta:", style="List Bullet")
+        sheet_lines = R.text_paragraph("_" * 60) * 8
+        empty = R.paragraph()
+        letters = [chr(65 + j) for j in range(max(4, compiled['max_options']))]
+
+        with ExitStack() as stack:
+            streams = {name: stack.enter_context(DocxStream(path)) for name, path in paths.items()}
+            exam_stream = streams.get('exam')
+            key_stream = streams.get('answer_key')
+            sheet_stream = streams.get('answer_sheet')
+
+            if exam_stream or key_stream:
+                header = R.exam_header(compiled)
+                for stream in (exam_stream, key_stream):
+                    if stream:
+                        stream.write(header)
+            if sheet_stream:
+                sheet_stream.write(R.answer_sheet_header(compiled))
+
+            sheet_rows = []
+            sheet_open = []
+            for compiled_question in compiled['questions']:
+                number = compiled_question['number']
+                question = compiled_question['question']
+                options = compiled_question['options']
+                answer_position = compiled_question['answer_position']
+
+                if exam_stream or key_stream:
+                    statement = R.paragraph([
+                        R.run(f"Pregunta {number} ", bold=True),
+                        R.run(f"({question['points']} puntos) ", italic=True),
+                        R.run(f"[{question['difficulty']}] ", italic=True),
+                    ]) + R.text_paragraph(question['content'])
+                    option_paragraphs = [
+                        R.paragraph([R.run(f"{letter}) {option}")], style="List Bullet")
+                        for letter, option in options
+                    ]
+
+                    if exam_stream:
+                        exam_parts = [statement] + option_paragraphs
+                        if question['question_type'] == 'open':
+                            exam_parts.extend([answer_label, answer_lines])
+                        exam_parts.append(empty)
+                        exam_stream.write("".join(exam_parts))
+
+                    if key_stream:
+                        key_parts = [statement] + option_paragraphs
+                        if answer_position is not None:
+                            letter, option = options[answer_position]
+                            key_parts[1 + answer_position] = R.paragraph(
+                                [R.run(f"{letter}) {option}", bold=True, color=ANSWER_COLOR)],
+                                style="List Bullet"
+                            )
+                        if question['question_type'] == 'open':
+                            key_parts.extend([answer_label, answer_lines])
+                            if 'answer' in question:
+                                key_parts.append(R.paragraph([
+                                    R.run("Respuesta modelo: ", bold=True, color=ANSWER_COLOR),
+                                    R.run(question['answer'], color=ANSWER_COLOR),
+                                ]))
+                        key_parts.append(empty)
+                        key_stream.write("".join(key_parts))
+
+                if sheet_stream:
+                    if options:
+                        sheet_rows.append(
+                            [f"{number}"] + ["○" if j < len(options) else "" for j in range(len(letters))]
+                        )
+                        if len(sheet_rows) == 10:
+                            sheet_stream.write(R.answer_sheet_table(sheet_rows, letters))
+                            sheet_rows = []
+                    elif question['question_type'] == 'open':
+                        sheet_open.append(R.text_paragraph(f"Pregunta {number}:") + sheet_lines + empty)
+
+            if sheet_stream:
+                if sheet_rows:
+                    sheet_stream.write(R.answer_sheet_table(sheet_rows, letters))
+                if sheet_open:
+                    sheet_stream.write(R.paragraph([R.run('Preguntas Abiertas')], style="Heading 2"))
+                    for fragment in sheet_open:
+                        sheet_stream.write(fragment)
+
+        return paths
@@ -2,14 +2,19 @@
 import os
 import random
 import re
-from typing import List, Dict, Any, Optional
-from docx import Document
-from docx.shared import Pt, Inches, RGBColor
-from docx.enum.text import WD_ALIGN_PARAGRAPH
-from docx.oxml.ns import qn
-from docx.oxml import OxmlElement
+from typing import Callable, List, Dict, Any, Optional, Tuple
+import numpy as np
 
+from app.services.docx_renderer import DocxRenderer
+from app.services.distractors import DistractorIndex
 from app.services.document_processor import DocumentProcessor
+from app.services.sampling import StratifiedSampler, allocate, numpy_generator
+
+# Versión de la generación. Debe incrementarse cada vez que cambie el examen
+# que resulta de los mismos conceptos, configuración y semilla (muestreo,
+# preguntas, distractores, variantes o documentos), para invalidar los
+# exámenes en caché.
+GENERATOR_VERSION = "2"
 
 class ExamGenerator:
     """
@@ -17,10 +22,18 @@ class ExamGenerator:
     """
     
     @staticmethod
-    def generate_questions_from_concept(concept: Dict, num_options: int = 4) -> List[Dict]:
+    def generate_questions_from_concept(
+        concept: Dict,
+        num_options: int = 4,
+        rng: Optional[random.Random] = None,
+        distractors: Optional[DistractorIndex] = None
+    ) -> List[Dict]:
         """
-        Genera diferentes tipos de preguntas a partir de un concepto
+        Genera diferentes tipos de preguntas a partir de un concepto. Con rng
+        (un random.Random con semilla) el resultado es reproducible. Con
+        distractors, las opciones incorrectas se toman del corpus del curso.
         """
+        rng = rng or random
         questions = []
         question_type = concept['type']
         term = concept['term']
@@ -43,7 +56,10 @@ class ExamGenerator:
                 'question_type': 'multiple_choice',
                 'difficulty': difficulty,
                 'points': 3.0,
-                'options': ExamGenerator._generate_options(content, num_options),
+                'options': ExamGenerator._generate_options(
+                    content, num_options, rng,
+                    distractors=distractors, term=term, section=concept.get('section_hash')
+                ),
                 'answer': content
             })
         
@@ -58,7 +74,7 @@ class ExamGenerator:
             })
             
             # Pregunta "Verdadero o Falso"
-            is_true = random.choice([True, False])
+            is_true = rng.choice([True, False])
             if is_true:
                 statement = content
                 answer = "Verdadero"
@@ -66,7 +82,7 @@ class ExamGenerator:
                 # Modificar el contenido para hacerlo falso
                 words = content.split()
                 if len(words) > 5:
-                    pos = random.randint(2, len(words) - 3)
+                    pos = rng.randint(2, len(words) - 3)
                     words[pos] = "NO" + words[pos]
                 statement = " ".join(words)
                 answer = "Falso"
@@ -87,13 +103,13 @@ class ExamGenerator:
             
             if len(list_items) >= 4:
                 # Pregunta "¿Cuál de los siguientes NO es parte de X?"
-                valid_items = random.sample(list_items, 3)
+                valid_items = rng.sample(list_items, 3)
                 
                 # Generar una opción incorrecta
                 fake_item = f"Elemento que no es parte de {term}"
                 
                 options = valid_items + [fake_item]
-                random.shuffle(options)
+                rng.shuffle(options)
                 
                 questions.append({
                     'content': f'¿Cuál de los siguientes NO es parte de {term}?',
@@ -113,28 +129,45 @@ class ExamGenerator:
                     'answer': ", ".join(list_items[:3])
                 })
         
+        # Concepto de origen de cada pregunta (solo los conceptos persistidos tienen id)
+        for question in questions:
+            question['concept_id'] = concept.get('id')
+        
         return questions
     
     @staticmethod
-    def _generate_options(correct_answer: str, num_options: int) -> List[str]:
+    def _generate_options(
+        correct_answer: str,
+        num_options: int,
+        rng: Optional[random.Random] = None,
+        distractors: Optional[DistractorIndex] = None,
+        term: str = "",
+        section: Optional[str] = None
+    ) -> List[str]:
         """
-        Genera opciones para preguntas de selección múltiple
+        Genera opciones para preguntas de selección múltiple. Las opciones
+        incorrectas salen primero del índice de distractores (textos de otros
+        conceptos del corpus con longitud parecida) y, si no alcanzan, de
+        modificar la respuesta correcta.
         """
+        rng = rng or random
         options = [correct_answer]
+        if distractors is not None:
+            options.extend(distractors.distractors(correct_answer, term, num_options - 1, section, rng))
         
         # Generar opciones incorrectas modificando la respuesta correcta
         words = correct_answer.split()
         
-        for _ in range(num_options - 1):
+        for _ in range(num_options - len(options)):
             if len(words) > 4:
                 # Modificar algunas palabras
                 fake_answer = words.copy()
-                num_changes = random.randint(1, min(3, len(words) // 3))
+                num_changes = rng.randint(1, min(3, len(words) // 3))
                 
                 for _ in range(num_changes):
-                    pos = random.randint(0, len(fake_answer) - 1)
+                    pos = rng.randint(0, len(fake_answer) - 1)
                     # Reemplazar, eliminar o invertir palabras
-                    action = random.choice(['replace', 'remove', 'swap'])
+                    action = rng.choice(['replace', 'remove', 'swap'])
                     
                     if action == 'replace':
                         fake_answer[pos] = f"NO-{fake_answer[pos]}"
@@ -153,7 +186,7 @@ class ExamGenerator:
                 # Para respuestas cortas, crear opciones genéricas
                 options.append(f"Opción incorrecta {len(options)}")
         
-        random.shuffle(options)
+        rng.shuffle(options)
         return options
     
     @staticmethod
@@ -171,280 +204,257 @@ class ExamGenerator:
             concepts = DocumentProcessor.find_concepts_for_questions(processed_content)
             all_concepts.extend(concepts)
         
+        return ExamGenerator.create_exam_from_concepts(all_concepts, exam_config)
+    
+    @staticmethod
+    def concept_sampler(concepts: List[Dict]) -> StratifiedSampler:
+        """
+        Muestreador de un banco de conceptos, estratificado por dificultad
+        """
+        return StratifiedSampler(concepts, ['difficulty'], defaults={'difficulty': 'medium'})
+    
+    @staticmethod
+    def create_exam_from_concepts(
+        all_concepts: List[Dict], 
+        exam_config: Dict,
+        concept_sampler: Optional[StratifiedSampler] = None,
+        distractors: Optional[DistractorIndex] = None
+    ) -> Dict:
+        """
+        Crea un examen a partir de conceptos ya identificados
+        (por ejemplo, los precalculados al subir los materiales). Para generar
+        varios exámenes del mismo banco, concept_sampler (ver concept_sampler)
+        y distractors se construyen una vez y se reutilizan.
+        """
+        rng = random.Random(exam_config.get('seed'))
+        if concept_sampler is None:
+            concept_sampler = ExamGenerator.concept_sampler(all_concepts)
+        if distractors is None:
+            distractors = DistractorIndex.from_concepts(all_concepts)
+        
         # Seleccionar conceptos según la configuración
-        selected_concepts = ExamGenerator._select_concepts(
-            all_concepts, 
+        selected_concepts, concepts_report = ExamGenerator._select_concepts(
+            concept_sampler, 
             exam_config.get('num_concepts', 10),
-            exam_config.get('difficulty_distribution', {'easy': 0.3, 'medium': 0.5, 'hard': 0.2})
+            exam_config.get('difficulty_distribution', {'easy': 0.3, 'medium': 0.5, 'hard': 0.2}),
+            numpy_generator(rng)
+        )
+        
+        exam = ExamGenerator.create_exam_from_selected_concepts(
+            selected_concepts, exam_config, rng, distractors
         )
+        if concepts_report['missing']:
+            exam.setdefault('shortfall', {})['concepts'] = concepts_report
+        return exam
+    
+    @staticmethod
+    def create_exam_from_selected_concepts(
+        selected_concepts: List[Dict], 
+        exam_config: Dict,
+        rng: Optional[random.Random] = None,
+        distractors: Optional[DistractorIndex] = None
+    ) -> Dict:
+        """
+        Crea un examen a partir de conceptos ya seleccionados
+        (por ejemplo, con select_concepts_from_bank). Todo el azar sale de
+        rng o, si no se indica, de la semilla de exam_config (seed), de modo
+        que con la misma semilla y los mismos conceptos el examen es el mismo.
+        distractors es el índice de distractores del corpus (ver
+        DistractorIndex).
+        """
+        if rng is None:
+            rng = random.Random(exam_config.get('seed'))
         
         # Generar preguntas a partir de los conceptos seleccionados
         questions = []
         for concept in selected_concepts:
             concept_questions = ExamGenerator.generate_questions_from_concept(
                 concept, 
-                num_options=exam_config.get('num_options', 4)
+                num_options=exam_config.get('num_options', 4),
+                rng=rng,
+                distractors=distractors
             )
             questions.extend(concept_questions)
         
         # Seleccionar preguntas según la configuración
-        selected_questions = ExamGenerator._select_questions(
+        selected_questions, questions_report = ExamGenerator._select_questions(
             questions, 
             exam_config.get('num_questions', 20),
             exam_config.get('question_type_distribution', {
                 'multiple_choice': 0.7, 
                 'open': 0.3
-            })
+            }),
+            exam_config.get('difficulty_distribution', {'easy': 0.3, 'medium': 0.5, 'hard': 0.2}),
+            numpy_generator(rng)
         )
         
-        return {
+        exam = {
             'title': exam_config.get('title', 'Examen Generado'),
             'description': exam_config.get('description', 'Examen generado automáticamente'),
             'questions': selected_questions,
             'total_points': sum(q['points'] for q in selected_questions)
         }
+        
+        # Si no hubo preguntas suficientes, el examen sale con las que hay y
+        # se informa cuántas faltaron de cada tipo
+        if questions_report['missing']:
+            exam['shortfall'] = {'questions': questions_report}
+        return exam
     
     @staticmethod
-    def _select_concepts(
-        concepts: List[Dict], 
+    def allocate_counts(
+        available: Dict[str, int],
+        total: int,
+        distribution: Dict[str, float]
+    ) -> Tuple[Dict[str, int], Dict[str, Any]]:
+        """
+        Calcula cuántos elementos tomar de cada grupo según la distribución,
+        sin superar lo disponible. Lo que falte en un grupo se reparte entre
+        los grupos que todavía tengan elementos. Retorna las cantidades y el
+        reporte de lo que faltó (ver sampling.allocate).
+        """
+        return allocate(available, total, distribution)
+    
+    @staticmethod
+    def select_concepts_from_bank(
+        available: Dict[str, int],
+        sample: Callable[[str, int], List[Dict]],
         num_concepts: int,
         difficulty_distribution: Dict[str, float]
-    ) -> List[Dict]:
+    ) -> Tuple[List[Dict], Dict[str, Any]]:
         """
-        Selecciona conceptos según la distribución de dificultad deseada
+        Selecciona conceptos de un banco persistido: available tiene la cantidad
+        de conceptos por dificultad y sample(dificultad, n) devuelve una muestra
+        aleatoria de n conceptos de esa dificultad (ver crud.sample_concepts).
+        Retorna los conceptos y el reporte del reparto (ver sampling.allocate).
         """
-        if not concepts:
-            return []
-        
-        # Agrupar conceptos por dificultad
-        by_difficulty = {'easy': [], 'medium': [], 'hard': []}
+        counts, report = ExamGenerator.allocate_counts(available, num_concepts, difficulty_distribution)
         
-        for concept in concepts:
-            difficulty = concept.get('difficulty', 'medium')
-            by_difficulty[difficulty].append(concept)
-        
-        # Calcular cuántos conceptos de cada dificultad seleccionar
-        counts = {}
-        remaining = num_concepts
-        
-        for difficulty, percentage in difficulty_distribution.items():
-            count = int(num_concepts * percentage)
-            counts[difficulty] = min(count, len(by_difficulty[difficulty]))
-            remaining -= counts[difficulty]
-        
-        # Distribuir conceptos restantes
-        while remaining > 0:
-            for difficulty in ['easy', 'medium', 'hard']:
-                if remaining > 0 and len(by_difficulty[difficulty]) > counts[difficulty]:
-                    counts[difficulty] += 1
-                    remaining -= 1
-        
-        # Seleccionar conceptos
         selected = []
         for difficulty, count in counts.items():
-            selected.extend(random.sample(by_difficulty[difficulty], min(count, len(by_difficulty[difficulty]))))
-        
-        return selected
+            if count > 0:
+                selected.extend(sample(difficulty, count))
+        return selected, report
+    
+    @staticmethod
+    def _select_concepts(
+        concept_sampler: StratifiedSampler, 
+        num_concepts: int,
+        difficulty_distribution: Dict[str, float],
+        rng: Optional[np.random.Generator] = None
+    ) -> Tuple[List[Dict], Dict[str, Any]]:
+        """
+        Selecciona conceptos del banco de concept_sampler según la distribución
+        de dificultad deseada. Retorna los conceptos y el reporte del muestreo
+        (ver sampling.allocate).
+        """
+        return concept_sampler.sample(num_concepts, {'difficulty': difficulty_distribution}, rng)
     
     @staticmethod
     def _select_questions(
         questions: List[Dict], 
         num_questions: int,
-        question_type_distribution: Dict[str, float]
-    ) -> List[Dict]:
+        question_type_distribution: Dict[str, float],
+        difficulty_distribution: Optional[Dict[str, float]] = None,
+        rng: Optional[np.random.Generator] = None
+    ) -> Tuple[List[Dict], Dict[str, Any]]:
         """
-        Selecciona preguntas según la distribución de tipos deseada
+        Selecciona preguntas según la distribución de tipos y de dificultad
+        deseadas (cada estrato tipo/dificultad pesa el producto de ambas).
+        Las preguntas son nuevas en cada examen, así que se agrupan una sola
+        vez por examen. Retorna las preguntas y el reporte del muestreo (ver
+        sampling.allocate).
         """
-        if not questions:
-            return []
-        
-        # Agrupar preguntas por tipo
-        by_type = {}
-        for question in questions:
-            q_type = question.get('question_type', 'multiple_choice')
-            if q_type not in by_type:
-                by_type[q_type] = []
-            by_type[q_type].append(question)
-        
-        # Calcular cuántas preguntas de cada tipo seleccionar
-        counts = {}
-        remaining = num_questions
-        
-        for q_type, percentage in question_type_distribution.items():
-            if q_type in by_type:
-                count = int(num_questions * percentage)
-                counts[q_type] = min(count, len(by_type[q_type]))
-                remaining -= counts[q_type]
-        
-        # Distribuir preguntas restantes
-        while remaining > 0:
-            for q_type in by_type.keys():
-                if remaining > 0 and q_type in counts and len(by_type[q_type]) > counts[q_type]:
-                    counts[q_type] += 1
-                    remaining -= 1
-        
-        # Seleccionar preguntas
-        selected = []
-        for q_type, count in counts.items():
-            if q_type in by_type:
-                selected.extend(random.sample(by_type[q_type], min(count, len(by_type[q_type]))))
+        distributions = {'question_type': question_type_distribution}
+        if difficulty_distribution is not None:
+            distributions['difficulty'] = difficulty_distribution
+        sampler = StratifiedSampler(
+            questions, ['question_type', 'difficulty'],
+            defaults={'question_type': 'multiple_choice', 'difficulty': 'medium'}
+        )
+        selected, report = sampler.sample(num_questions, distributions, rng)
         
         # Ordenar por tipo de pregunta (primero opción múltiple, luego abiertas)
         selected.sort(key=lambda q: 0 if q.get('question_type') == 'multiple_choice' else 1)
         
-        return selected
+        return selected, report
     
     @staticmethod
-    def generate_exam_docx(exam: Dict, output_path: str, include_answers: bool = False) -> str:
+    def compile_exam(exam: Dict) -> Dict:
         """
-        Genera un documento DOCX con el examen
+        Representación intermedia del examen para generar sus documentos:
+        numeración de las preguntas, letras de las opciones y posición de la
+        respuesta correcta, calculadas una sola vez
         """
-        doc = Document()
-        
-        # Estilo del título
-        title = doc.add_heading(exam['title'], level=1)
-        title.alignment = WD_ALIGN_PARAGRAPH.CENTER
-        
-        # Descripción
-        if exam.get('description'):
-            description = doc.add_paragraph(exam['description'])
-            description.alignment = WD_ALIGN_PARAGRAPH.CENTER
-        
-        # Información del examen
-        info = doc.add_paragraph()
-        info.add_run('Total de puntos: ').bold = True
-        info.add_run(f"{exam['total_points']}")
-        
-        # Agregar línea divisoria
-        doc.add_paragraph('_' * 50)
-        
-        # Instrucciones
-        doc.add_heading('Instrucciones:', level=2)
-        doc.add_paragraph('Responda cada una de las siguientes preguntas. Lea cuidadosamente antes de responder.')
-        
-        # Preguntas
-        questions = exam['questions']
-        
-        for i, question in enumerate(questions, 1):
-            # Título de la pregunta
-            q_title = doc.add_paragraph()
-            q_title.add_run(f"Pregunta {i} ").bold = True
-            q_title.add_run(f"({question['points']} puntos) ").italic = True
-            q_title.add_run(f"[{question['difficulty']}] ").italic = True
-            
-            # Contenido de la pregunta
-            doc.add_paragraph(question['content'])
-            
-            # Opciones para preguntas de selección múltiple
+        compiled_questions = []
+        multiple_choice_numbers = []
+        open_numbers = []
+        max_options = 0
+        
+        for number, question in enumerate(exam['questions'], 1):
+            options = []
+            answer_position = None
             if question['question_type'] == 'multiple_choice' and 'options' in question:
+                options = [(chr(65 + j), option) for j, option in enumerate(question['options'])]
+                answer = question.get('answer')
                 for j, option in enumerate(question['options']):
-                    option_text = f"{chr(65 + j)}) {option}"
-                    option_para = doc.add_paragraph(option_text, style='List Bullet')
-                    
-                    # Si se incluyen respuestas, marcar la correcta
-                    if include_answers and option == question.get('answer'):
-                        for run in option_para.runs:
-                            run.bold = True
-                            run.font.color.rgb = RGBColor(0, 128, 0)  # Verde
-            
-            # Espacio para respuestas abiertas
-            if question['question_type'] == 'open':
-                doc.add_paragraph("Respuesta:", style='List Bullet')
-                for _ in range(4):  # Agregar líneas para respuesta
-                    doc.add_paragraph("_" * 50)
-                
-                # Si se incluyen respuestas, mostrar la correcta
-                if include_answers and 'answer' in question:
-                    answer_para = doc.add_paragraph()
-                    answer_para.add_run("Respuesta modelo: ").bold = True
-                    answer_para.add_run(question['answer'])
-                    for run in answer_para.runs:
-                        run.font.color.rgb = RGBColor(0, 128, 0)  # Verde
+                    if option == answer:
+                        answer_position = j
+                        break
+                multiple_choice_numbers.append(number)
+                max_options = max(max_options, len(options))
+            elif question['question_type'] == 'open':
+                open_numbers.append(number)
             
-            # Separador entre preguntas
-            doc.add_paragraph()
-        
-        # Guardar el documento
-        doc.save(output_path)
+            compiled_questions.append({
+                'number': number,
+                'question': question,
+                'options': options,
+                'answer_position': answer_position
+            })
         
-        return output_path
+        return {
+            'title': exam['title'],
+            'description': exam.get('description'),
+            'total_points': exam['total_points'],
+            'questions': compiled_questions,
+            'multiple_choice_numbers': multiple_choice_numbers,
+            'open_numbers': open_numbers,
+            'max_options': max_options
+        }
+    
+    @staticmethod
+    def generate_exam_docx(exam: Dict, output_path: str, include_answers: bool = False) -> str:
+        """
+        Genera un documento DOCX con el examen
+        """
+        compiled = ExamGenerator.compile_exam(exam)
+        if include_answers:
+            return DocxRenderer.render_exam_documents(compiled, answer_key_path=output_path)['answer_key']
+        return DocxRenderer.render_exam_documents(compiled, exam_path=output_path)['exam']
     
     @staticmethod
     def generate_answer_sheet(exam: Dict, output_path: str) -> str:
         """
         Genera una hoja de respuestas para el examen
         """
-        doc = Document()
-        
-        # Estilo del título
-        title = doc.add_heading(f"Hoja de Respuestas: {exam['title']}", level=1)
-        title.alignment = WD_ALIGN_PARAGRAPH.CENTER
-        
-        # Información del estudiante
-        doc.add_paragraph('Nombre: ______________________________')
-        doc.add_paragraph('ID: ______________________________')
-        doc.add_paragraph('Fecha: ______________________________')
-        
-        # Agregar línea divisoria
-        doc.add_paragraph('_' * 50)
-        
-        # Crear tabla para respuestas de selección múltiple
-        multiple_choice_questions = [q for q in exam['questions'] if q['question_type'] == 'multiple_choice']
-        
-        if multiple_choice_questions:
-            doc.add_heading('Selección Múltiple', level=2)
-            
-            # Organizamos 10 preguntas por fila, con opciones A, B, C, D por columna
-            rows_needed = (len(multiple_choice_questions) + 9) // 10
-            
-            for row in range(rows_needed):
-                table = doc.add_table(rows=1, cols=5)
-                table.style = 'Table Grid'
-                
-                # Encabezado
-                hdr_cells = table.rows[0].cells
-                hdr_cells[0].text = 'Pregunta'
-                hdr_cells[1].text = 'A'
-                hdr_cells[2].text = 'B'
-                hdr_cells[3].text = 'C'
-                hdr_cells[4].text = 'D'
-                
-                # Filas de preguntas
-                for i in range(10):
-                    q_idx = row * 10 + i
-                    if q_idx < len(multiple_choice_questions):
-                        q_num = exam['questions'].index(multiple_choice_questions[q_idx]) + 1
-                        
-                        row_cells = table.add_row().cells
-                        row_cells[0].text = f"{q_num}"
-                        
-                        # Círculos para marcar
-                        for j in range(1, 5):
-                            # Si la pregunta tiene menos opciones, no mostramos el círculo
-                            if j-1 < len(multiple_choice_questions[q_idx].get('options', [])):
-                                row_cells[j].text = "○"
-                            else:
-                                row_cells[j].text = ""
-                
-                doc.add_paragraph()
-        
-        # Espacio para preguntas abiertas
-        open_questions = [q for q in exam['questions'] if q['question_type'] == 'open']
-        
-        if open_questions:
-            doc.add_heading('Preguntas Abiertas', level=2)
-            
-            for question in open_questions:
-                q_num = exam['questions'].index(question) + 1
-                doc.add_paragraph(f"Pregunta {q_num}:")
-                
-                # Agregar líneas para la respuesta
-                for _ in range(8):
-                    doc.add_paragraph("_" * 60)
-                
-                doc.add_paragraph()
-        
-        # Guardar el documento
-        doc.save(output_path)
-        
-        return output_path
\ No newline at end of file
+        compiled = ExamGenerator.compile_exam(exam)
+        return DocxRenderer.render_exam_documents(compiled, answer_sheet_path=output_path)['answer_sheet']
+    
+    @staticmethod
+    def generate_exam_documents(
+        exam: Dict,
+        exam_path: Optional[str] = None,
+        answer_key_path: Optional[str] = None,
+        answer_sheet_path: Optional[str] = None
+    ) -> Dict[str, str]:
+        """
+        Genera en una sola pasada el examen, la clave de respuestas y la hoja
+        de respuestas (se omiten los documentos sin ruta)
+        """
+        return DocxRenderer.render_exam_documents(
+            ExamGenerator.compile_exam(exam),
+            exam_path=exam_path,
+            answer_key_path=answer_key_path,
+            answer_sheet_path=answer_sheet_path
+        )
@@ -0,0 +1,606 @@
+import datetime
+import functools
+import hashlib
+import json
+import os
+import pickle
+import random
+import shutil
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+from sqlalchemy.orm import Session
+
+from app import crud
+from app.core.config import settings
+from app.database import SessionLocal
+from app.db.courses import GenerationJob, Material
+from app.schemas.exams import ExamConfig
+from app.services.cache import distractor_cache, exam_cache, hash_file
+from app.services.distractors import DistractorIndex
+from app.services.document_processor import PROCESSOR_VERSION
+from app.services.exam_generator import GENERATOR_VERSION, ExamGenerator
+from app.services.ingestion import MaterialIngestion
+from app.services.variants import ExamVariants
+from app.services.workers import call_in_process, map_in_process, submit_batch_job, submit_job
+
+
+class ExamGenerationError(Exception):
+    """
+    Error de una etapa de generación; el mensaje se muestra al usuario
+    """
+
+
+def render_documents(exam: Dict, paths: Dict[str, str]) -> Dict[str, str]:
+    """
+    Genera en una sola pasada el examen, la clave y la hoja de respuestas de
+    un examen o variante. Se ejecuta en el pool de procesos.
+    """
+    return ExamGenerator.generate_exam_documents(
+        exam,
+        exam_path=paths["exam"],
+        answer_key_path=paths["answer_key"],
+        answer_sheet_path=paths["answer_sheet"]
+    )
+
+
+def _artifact_path(exam_dir: str, job_id: str, name: str) -> str:
+    """
+    Ruta de un artefacto de un trabajo: exam, answer_key, answer_sheet,
+    variant_X, variant_X_answers o variant_X_answer_sheet
+    """
+    if name == "exam":
+        return f"{exam_dir}/{job_id}.docx"
+    return f"{exam_dir}/{job_id}_{'answers' if name == 'answer_key' else name}.docx"
+
+
+def _document_paths(exam_dir: str, job_id: str, prefix: str = "") -> Dict[str, str]:
+    """
+    Rutas del examen, la clave y la hoja de respuestas del examen (prefix
+    vacío) o de una variante (prefix "variant_X")
+    """
+    if not prefix:
+        names = {"exam": "exam", "answer_key": "answer_key", "answer_sheet": "answer_sheet"}
+    else:
+        names = {"exam": prefix, "answer_key": f"{prefix}_answers", "answer_sheet": f"{prefix}_answer_sheet"}
+    return {document: _artifact_path(exam_dir, job_id, name) for document, name in names.items()}
+
+
+def exam_cache_key(materials: List[Material], config: ExamConfig) -> Optional[str]:
+    """
+    Clave de caché de un examen: el contenido de los materiales y la
+    versión de sus bancos de conceptos, las versiones del procesador y del
+    generador, la configuración normalizada y la semilla. Sin semilla cada
+    solicitud es un examen distinto y no se usa la caché.
+    """
+    if config.seed is None or not settings.GENERATION_CACHE_ENABLED:
+        return None
+    try:
+        content_hashes = sorted(
+            [MaterialIngestion.known_content_hash(material) or hash_file(material.file_path),
+             material.concepts_version or 0]
+            for material in materials
+        )
+    except OSError:
+        return None
+
+    normalized = config.dict(exclude={"seed"})
+    for field in ("difficulty_distribution", "question_type_distribution"):
+        distribution = {key: float(value) for key, value in normalized[field].items() if value and value > 0}
+        total = sum(distribution.values()) or 1.0
+        normalized[field] = {key: round(value / total, 6) for key, value in sorted(distribution.items())}
+    if not normalized["generate_variants"] or normalized["num_variants"] <= 1:
+        normalized["generate_variants"] = False
+        normalized["num_variants"] = 1
+
+    payload = json.dumps({
+        "materials": content_hashes,
+        "processor_version": PROCESSOR_VERSION,
+        "generator_version": GENERATOR_VERSION,
+        "config": normalized,
+        "seed": config.seed,
+    }, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def distractor_index_key(content_hashes: List[str]) -> str:
+    """
+    Clave en distractor_cache del índice de distractores de un conjunto de
+    materiales: su contenido y la versión del procesador
+    """
+    payload = json.dumps({
+        "materials": sorted(set(content_hashes)),
+        "processor_version": PROCESSOR_VERSION,
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def build_distractor_index(db: Session, content_hashes: Dict[int, str]) -> DistractorIndex:
+    """
+    Índice de distractores de los materiales (id -> hash del contenido), a
+    partir de las entradas guardadas al procesar cada uno. Los materiales
+    se recorren por contenido, así que el mismo contenido da el mismo índice.
+    """
+    by_hash = {content_hash: material_id for material_id, content_hash in content_hashes.items()}
+    return DistractorIndex(
+        entry
+        for content_hash, material_id in sorted(by_hash.items())
+        for entry in MaterialIngestion.distractor_entries(db, material_id, content_hash)
+    )
+
+
+# Índices de distractores que cada proceso del pool mantiene en memoria
+DISTRACTOR_INDEXES_PER_PROCESS = 8
+
+
+@functools.lru_cache(maxsize=DISTRACTOR_INDEXES_PER_PROCESS)
+def load_distractor_index(key: str) -> DistractorIndex:
+    """
+    Índice de distractores guardado en distractor_cache. Queda en memoria
+    del proceso, de modo que los trabajos siguientes del mismo curso no lo
+    vuelven a leer. LookupError si ya no está en la caché.
+    """
+    data = distractor_cache.get(key)
+    if data is None:
+        raise LookupError(key)
+    return pickle.loads(data)
+
+
+def generate_exam(
+    concepts: List[Dict], exam_config: Dict, distractors: Union[str, DistractorIndex]
+) -> Dict:
+    """
+    Genera las preguntas del examen en un proceso del pool. distractors es
+    el índice o su clave en distractor_cache: con la clave, el proceso no
+    recibe el corpus serializado en cada trabajo.
+    """
+    if isinstance(distractors, str):
+        distractors = load_distractor_index(distractors)
+    return ExamGenerator.create_exam_from_selected_concepts(concepts, exam_config, None, distractors)
+
+
+def _load_cached_exam(cache_key: str) -> Optional[Dict[str, Any]]:
+    """
+    Entrada de la caché de exámenes, solo si siguen todos sus artefactos
+    """
+    cached = exam_cache.get_json(cache_key)
+    if cached is None:
+        return None
+    artifact_paths = {name: exam_cache.get_path(f"{cache_key}_{name}") for name in cached["artifacts"]}
+    if not all(artifact_paths.values()):
+        return None
+    cached["artifact_paths"] = artifact_paths
+    return cached
+
+
+def _store_cached_exam(cache_key: str, state: Dict[str, Any]) -> None:
+    for name, path in state["artifacts"].items():
+        exam_cache.set_file(f"{cache_key}_{name}", path, evict=False)
+    # El manifiesto se guarda al final, cuando ya están todos los artefactos
+    exam_cache.set_json(cache_key, {
+        "exam": state["exam"],
+        "variants": [
+            {key: value for key, value in variant.items() if not key.endswith("path")}
+            for variant in state["variants"]
+        ],
+        "artifacts": list(state["artifacts"]),
+    })
+
+
+def _stage_ingest(db: Session, job: GenerationJob, state: Dict[str, Any]) -> None:
+    materials = crud.get_materials_by_course(db=db, course_id=job.course_id)
+    if not materials:
+        raise ExamGenerationError("El curso no tiene materiales para generar un examen")
+    state["material_ids"] = [material.id for material in materials]
+
+    # Un examen ya generado con los mismos materiales, configuración y
+    # semilla se reutiliza sin procesar ni generar nada
+    state["cache_key"] = exam_cache_key(materials, state["config"])
+    if state["cache_key"]:
+        state["cached"] = _load_cached_exam(state["cache_key"])
+        if state["cached"]:
+            return
+
+    # Los materiales se procesan al subirlos; los que aún estén pendientes
+    # se procesan ahora en paralelo en el pool de procesos
+    failed_materials = MaterialIngestion.ingest_pending(db, materials)
+    if failed_materials:
+        titles = ", ".join(material["title"] for material in failed_materials)
+        raise ExamGenerationError(f"No se pudieron procesar algunos materiales del curso: {titles}")
+
+
+def _stage_select(db: Session, job: GenerationJob, state: Dict[str, Any]) -> None:
+    if state.get("cached"):
+        return
+    config = state["config"]
+    material_ids = state["material_ids"]
+
+    # Todo el azar del trabajo sale de la semilla de la configuración
+    state["rng"] = random.Random(config.seed)
+    rng = state["rng"]
+
+    # Seleccionar conceptos con muestreo indexado sobre el banco persistido
+    state["concepts"], state["concepts_report"] = ExamGenerator.select_concepts_from_bank(
+        crud.count_concepts_by_difficulty(db=db, material_ids=material_ids),
+        lambda difficulty, count: crud.sample_concepts(
+            db=db, material_ids=material_ids, difficulty=difficulty, limit=count, rng=rng
+        ),
+        config.num_concepts,
+        config.difficulty_distribution
+    )
+
+    # Índice de distractores del corpus del curso: se construye una vez por
+    # contenido de los materiales y los trabajos siguientes solo usan su clave
+    state["content_hashes"] = crud.get_material_content_hashes(db=db, material_ids=material_ids)
+    state["distractors"] = distractor_index_key(list(state["content_hashes"].values()))
+    if distractor_cache.get_path(state["distractors"]) is None:
+        index = build_distractor_index(db, state["content_hashes"])
+        distractor_cache.set(state["distractors"], pickle.dumps(index, protocol=pickle.HIGHEST_PROTOCOL))
+
+
+def _stage_generate(db: Session, job: GenerationJob, state: Dict[str, Any]) -> None:
+    if state.get("cached"):
+        return
+    config = state["config"]
+    exam_config = {
+        'title': config.title,
+        'description': config.description,
+        'num_questions': config.num_questions,
+        'num_concepts': config.num_concepts,
+        'num_options': config.num_options,
+        'difficulty_distribution': config.difficulty_distribution,
+        'question_type_distribution': config.question_type_distribution,
+        'seed': state["rng"].getrandbits(64)
+    }
+    # La generación de preguntas es intensiva en CPU: se hace en el pool de
+    # procesos para que los trabajos de un lote se ejecuten en paralelo
+    try:
+        state["exam"] = call_in_process(generate_exam, state["concepts"], exam_config, state["distractors"])
+    except LookupError:
+        # El índice no cabe en la caché o se desalojó entre etapas: se envía
+        # completo al proceso
+        index = build_distractor_index(db, state["content_hashes"])
+        state["exam"] = call_in_process(generate_exam, state["concepts"], exam_config, index)
+    # Si el banco no tenía conceptos suficientes, se informa junto con las
+    # preguntas que faltaron (y queda guardado con el examen en la caché)
+    if state["concepts_report"]["missing"]:
+        state["exam"].setdefault("shortfall", {})["concepts"] = state["concepts_report"]
+
+
+def _restore_cached_exam(job: GenerationJob, state: Dict[str, Any], exam_dir: str) -> None:
+    """
+    Copia los artefactos de la caché a las rutas del trabajo
+    """
+    cached = state["cached"]
+    artifacts = {}
+    for name, cached_path in cached["artifact_paths"].items():
+        artifacts[name] = _artifact_path(exam_dir, job.id, name)
+        shutil.copyfile(cached_path, artifacts[name])
+
+    state["exam"] = cached["exam"]
+    state["artifacts"] = artifacts
+    state["variants"] = []
+    for variant in cached["variants"]:
+        paths = _document_paths(exam_dir, job.id, f"variant_{variant['variant_code']}")
+        state["variants"].append({
+            **variant,
+            "file_path": paths["exam"],
+            "answer_key_path": paths["answer_key"],
+            "answer_sheet_path": paths["answer_sheet"],
+        })
+
+
+def _render_exam(job: GenerationJob, state: Dict[str, Any], exam_dir: str) -> None:
+    config = state["config"]
+    generated_exam = state["exam"]
+
+    # Un grupo de documentos (examen, clave y hoja de respuestas) por examen
+    # o variante: (prefijo de los artefactos, examen, rutas)
+    documents = [("", generated_exam, _document_paths(exam_dir, job.id))]
+
+    # Con semilla, las variantes dependen de la clave de caché y no del
+    # trabajo, de modo que se repiten igual
+    exam_key = state["cache_key"] or job.id
+    exam_variants = []
+    if config.generate_variants and config.num_variants > 1:
+        for variant in ExamVariants.build_variants(generated_exam, config.num_variants, exam_key):
+            code = variant["variant_code"]
+            paths = _document_paths(exam_dir, job.id, f"variant_{code}")
+            documents.append((f"variant_{code}", variant, paths))
+            exam_variants.append({
+                "variant_code": code,
+                "file_path": paths["exam"],
+                "answer_key_path": paths["answer_key"],
+                "answer_sheet_path": paths["answer_sheet"],
+                "seed": variant["seed"],
+                "question_order": variant["question_order"],
+                "option_orders": variant["option_orders"],
+                "answer_key": variant["answer_key"]
+            })
+
+    # El examen y las variantes se generan en paralelo en el pool de procesos
+    results = map_in_process(
+        render_documents,
+        [exam for _, exam, _ in documents],
+        [paths for _, _, paths in documents]
+    )
+    for result in results:
+        if isinstance(result, Exception):
+            raise ExamGenerationError(f"Error al generar los documentos: {result}")
+
+    artifacts = {}
+    for prefix, _, paths in documents:
+        for name, path in paths.items():
+            if not prefix:
+                artifacts[name] = path
+            elif name == "exam":
+                artifacts[prefix] = path
+            else:
+                artifacts[f"{prefix}_{'answers' if name == 'answer_key' else name}"] = path
+
+    state["variants"] = exam_variants
+    state["artifacts"] = artifacts
+
+
+def _stage_render(db: Session, job: GenerationJob, state: Dict[str, Any]) -> None:
+    config = state["config"]
+
+    exam_dir = f"storage/exams/{job.course_id}"
+    os.makedirs(exam_dir, exist_ok=True)
+
+    if state.get("cached"):
+        _restore_cached_exam(job, state, exam_dir)
+    else:
+        _render_exam(job, state, exam_dir)
+        if state["cache_key"]:
+            _store_cached_exam(state["cache_key"], state)
+
+    state["exam_record"] = {
+        "title": config.title,
+        "description": config.description,
+        "course_id": job.course_id,
+        "exam_type": config.exam_type,
+        "creation_date": datetime.datetime.utcnow().isoformat(),
+        "file_path": state["artifacts"]["exam"],
+        "answer_key_path": state["artifacts"]["answer_key"],
+        "answer_sheet_path": state["artifacts"]["answer_sheet"],
+    }
+
+
+def _stage_save(db: Session, job: GenerationJob, state: Dict[str, Any]) -> None:
+    generated_exam = state["exam"]
+    exam = crud.create_exam(
+        db, exam_in=state["exam_record"], user_id=job.created_by_id, variants=state["variants"],
+        questions=generated_exam["questions"]
+    )
+
+    state["result"] = {
+        "exam": {
+            "id": exam.id,
+            **state["exam_record"],
+            "created_by_id": job.created_by_id,
+            "questions": generated_exam["questions"],
+            "total_points": generated_exam["total_points"],
+            "answer_key": ExamVariants.answer_key(generated_exam),
+            "exam_variants": [
+                {
+                    "id": variant.id,
+                    "variant_code": variant.variant_code,
+                    "file_path": variant.file_path,
+                    "answer_key_path": variant.answer_key_path,
+                    "answer_sheet_path": variant.answer_sheet_path
+                }
+                for variant in exam.exam_variants
+            ]
+        },
+        "artifacts": state["artifacts"],
+        "cached": bool(state.get("cached"))
+    }
+    if generated_exam.get("shortfall"):
+        state["result"]["exam"]["shortfall"] = generated_exam["shortfall"]
+
+
+_worker_ids: Dict[int, str] = {}
+_heartbeat_pid: Optional[int] = None
+_heartbeat_lock = threading.Lock()
+
+
+def current_worker_id() -> str:
+    """
+    Identificador de este proceso como dueño de los trabajos que encola. Se
+    calcula por pid para que los procesos creados con fork tengan el suyo.
+    """
+    pid = os.getpid()
+    if pid not in _worker_ids:
+        _worker_ids[pid] = f"{socket.gethostname()}-{pid}-{uuid.uuid4().hex[:8]}"
+    return _worker_ids[pid]
+
+
+def fail_stale_jobs(db: Session) -> int:
+    """
+    Marca como fallidos los trabajos cuyo proceso dejó de dar señales de vida
+    """
+    stale_before = datetime.datetime.utcnow() - datetime.timedelta(
+        seconds=settings.GENERATION_HEARTBEAT_TIMEOUT_SECONDS
+    )
+    return crud.fail_interrupted_generation_jobs(db, stale_before=stale_before.isoformat())
+
+
+def _heartbeat_loop() -> None:
+    worker_id = current_worker_id()
+    while True:
+        time.sleep(settings.GENERATION_HEARTBEAT_SECONDS)
+        db = SessionLocal()
+        try:
+            crud.touch_generation_jobs(db, worker_id=worker_id)
+            fail_stale_jobs(db)
+        except Exception:
+            # Un error de la base de datos no debe detener las señales siguientes
+            db.rollback()
+        finally:
+            db.close()
+
+
+def start_heartbeat() -> None:
+    """
+    Inicia, una vez por proceso, el hilo que renueva la señal de vida de los
+    trabajos de este proceso y da por interrumpidos los de procesos caídos
+    """
+    global _heartbeat_pid
+    with _heartbeat_lock:
+        if _heartbeat_pid == os.getpid():
+            return
+        _heartbeat_pid = os.getpid()
+    threading.Thread(target=_heartbeat_loop, name="generation-heartbeat", daemon=True).start()
+
+
+class ExamGenerationPipeline:
+    """
+    Generación de exámenes como trabajos en segundo plano. Cada trabajo se
+    ejecuta en el pool acotado de generación y avanza por etapas, guardando
+    su progreso en la base de datos para que pueda consultarse.
+    """
+
+    STAGES: List[Tuple[str, Callable]] = [
+        ("ingest", _stage_ingest),
+        ("select", _stage_select),
+        ("generate", _stage_generate),
+        ("render", _stage_render),
+        ("save", _stage_save),
+    ]
+
+    @staticmethod
+    def stage_names() -> List[str]:
+        return [name for name, _ in ExamGenerationPipeline.STAGES]
+
+    @staticmethod
+    def submit(db: Session, course_id: int, config: ExamConfig, user_id: int) -> GenerationJob:
+        """
+        Registra un trabajo de generación y lo encola
+        """
+        start_heartbeat()
+        job = crud.create_generation_job(
+            db, course_id=course_id, config=config.dict(), user_id=user_id,
+            stages=ExamGenerationPipeline.stage_names(), worker_id=current_worker_id()
+        )
+        submit_job(ExamGenerationPipeline.run_job, job.id)
+        return job
+
+    @staticmethod
+    def submit_batch(
+        db: Session, course_ids: List[int], config: ExamConfig, user_id: int
+    ) -> Tuple[str, List[GenerationJob]]:
+        """
+        Registra un lote de trabajos, uno por curso, con la misma configuración,
+        y encola su ejecución en el pool de lotes (ver run_batch)
+        """
+        batch_id, jobs = ExamGenerationPipeline.create_batch(db, course_ids, config, user_id)
+        submit_batch_job(ExamGenerationPipeline.run_batch, [job.id for job in jobs])
+        return batch_id, jobs
+
+    @staticmethod
+    def create_batch(
+        db: Session, course_ids: List[int], config: ExamConfig, user_id: int
+    ) -> Tuple[str, List[GenerationJob]]:
+        """
+        Registra los trabajos de un lote sin encolarlos
+        """
+        start_heartbeat()
+        batch_id = str(uuid.uuid4())
+        jobs = crud.create_generation_jobs(
+            db, course_ids=course_ids, config=config.dict(), user_id=user_id,
+            stages=ExamGenerationPipeline.stage_names(), batch_id=batch_id,
+            worker_id=current_worker_id()
+        )
+        return batch_id, jobs
+
+    @staticmethod
+    def batch_summary(batch_id: str, jobs: List[GenerationJob]) -> Dict[str, Any]:
+        """
+        Estado de un lote: cantidad de trabajos por estado y el detalle de cada curso
+        """
+        status_counts: Dict[str, int] = {}
+        for job in jobs:
+            status_counts[job.status] = status_counts.get(job.status, 0) + 1
+        return {
+            "batch_id": batch_id,
+            "total": len(jobs),
+            "status_counts": status_counts,
+            "jobs": jobs
+        }
+
+    @staticmethod
+    def run_batch(job_ids: List[str]) -> List[Future]:
+        """
+        Procesa de una vez los materiales pendientes de todos los cursos del
+        lote y luego encola sus trabajos en el pool de lotes, que ejecuta
+        tantos a la vez como CPUs. Retorna los futuros de los trabajos.
+        """
+        db = SessionLocal()
+        try:
+            course_ids = [
+                job.course_id for job in
+                (crud.get_generation_job(db, job_id=job_id) for job_id in job_ids)
+                if job is not None
+            ]
+            try:
+                MaterialIngestion.ingest_pending(
+                    db, crud.get_materials_by_courses(db, course_ids=course_ids)
+                )
+            except Exception:
+                # Cada trabajo reintenta y reporta sus propios errores de
+                # extracción en la etapa "ingest"
+                db.rollback()
+        finally:
+            db.close()
+
+        return [submit_batch_job(ExamGenerationPipeline.run_job, job_id) for job_id in job_ids]
+
+    @staticmethod
+    def run_job(job_id: str) -> None:
+        """
+        Ejecuta un trabajo de generación con su propia sesión de base de datos
+        """
+        db = SessionLocal()
+        try:
+            job = crud.get_generation_job(db, job_id=job_id)
+            if not job or job.status != "queued":
+                return
+
+            crud.update_generation_job(db, job, {
+                "status": "running",
+                "started_at": datetime.datetime.utcnow().isoformat(),
+                "worker_id": current_worker_id(),
+                "heartbeat_at": datetime.datetime.utcnow().isoformat()
+            })
+            state = {"config": ExamConfig(**job.config)}
+            stage = None
+            try:
+                for stage, run_stage in ExamGenerationPipeline.STAGES:
+                    crud.set_generation_job_stage(db, job, stage, "running")
+                    run_stage(db, job, state)
+                    crud.set_generation_job_stage(db, job, stage, "completed")
+            except Exception as e:
+                db.rollback()
+                if stage is not None:
+                    crud.set_generation_job_stage(db, job, stage, "failed")
+                error = str(e) if isinstance(e, ExamGenerationError) else f"Error al generar el examen: {e}"
+                crud.update_generation_job(db, job, {
+                    "status": "failed",
+                    "error": error,
+                    "finished_at": datetime.datetime.utcnow().isoformat()
+                })
+                return
+
+            crud.update_generation_job(db, job, {
+                "status": "completed",
+                "stage": None,
+                "result": state["result"],
+                "finished_at": datetime.datetime.utcnow().isoformat()
+            })
+        finally:
+            db.close()
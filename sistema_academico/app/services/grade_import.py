@@ -0,0 +1,219 @@
+import codecs
+import csv
+import datetime
+import math
+import unicodedata
+import zipfile
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+from openpyxl import load_workbook
+from openpyxl.utils.exceptions import InvalidFileException
+from sqlalchemy.orm import Session
+
+from app import crud
+
+# Nombres de columna aceptados (sin tildes ni mayúsculas) para cada campo
+COLUMN_ALIASES = {
+    "identification": ("identification", "identificacion", "cedula", "documento", "student"),
+    "exam_id": ("exam_id", "exam", "examen", "id_examen"),
+    "score": ("score", "nota", "calificacion", "puntaje"),
+    "comments": ("comments", "comentarios", "observaciones"),
+}
+REQUIRED_COLUMNS = ("identification", "exam_id", "score")
+
+
+class GradeImportError(Exception):
+    """
+    Error que invalida todo el archivo (formato o columnas); el mensaje se
+    muestra al usuario
+    """
+
+
+def _normalize_header(value: Any) -> str:
+    text = unicodedata.normalize("NFKD", str(value or "")).encode("ascii", "ignore").decode("ascii")
+    return "_".join(text.strip().lower().split())
+
+
+def _cell_text(value: Any) -> str:
+    if value is None:
+        return ""
+    # Excel guarda los números enteros como float: 1234.0 -> "1234"
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+
+def _prepend(first: str, rest: Iterator[str]) -> Iterator[str]:
+    yield first
+    yield from rest
+
+
+class GradeImport:
+    """
+    Importación masiva de calificaciones de una sección desde CSV o XLSX.
+    El archivo se lee fila por fila, los estudiantes e inscripciones se
+    resuelven con unas pocas consultas para todo el archivo y las
+    calificaciones válidas se insertan en una sola transacción.
+    """
+
+    @staticmethod
+    def _rows_from_csv(file: BinaryIO) -> Iterator[List[str]]:
+        # Decodificar por bloques a medida que csv lee; utf-8-sig descarta el BOM de Excel
+        lines = codecs.iterdecode(file, "utf-8-sig")
+        sample_line = next(lines, "")
+        if not sample_line:
+            return
+        try:
+            dialect = csv.Sniffer().sniff(sample_line, delimiters=",;\t")
+        except csv.Error:
+            dialect = csv.excel
+        yield from csv.reader(_prepend(sample_line, lines), dialect)
+
+    @staticmethod
+    def _rows_from_xlsx(file: BinaryIO) -> Iterator[List[Any]]:
+        # read_only recorre la hoja sin cargarla completa en memoria
+        try:
+            workbook = load_workbook(file, read_only=True, data_only=True)
+        except (InvalidFileException, zipfile.BadZipFile, KeyError) as e:
+            raise GradeImportError(f"No se pudo leer el archivo: {e}")
+        try:
+            for row in workbook.active.iter_rows(values_only=True):
+                yield list(row)
+        finally:
+            workbook.close()
+
+    @staticmethod
+    def read_rows(file: BinaryIO, filename: str) -> Iterator[Tuple[int, Dict[str, str]]]:
+        """
+        Recorre las filas del archivo como (número de fila, campos). Las
+        columnas se identifican por el encabezado de la primera fila.
+        """
+        extension = filename.lower().rsplit(".", 1)[-1] if "." in filename else ""
+        if extension == "csv":
+            rows = GradeImport._rows_from_csv(file)
+        elif extension == "xlsx":
+            rows = GradeImport._rows_from_xlsx(file)
+        else:
+            raise GradeImportError("Formato no soportado. Use un archivo CSV o XLSX")
+
+        try:
+            header = next(rows)
+        except StopIteration:
+            raise GradeImportError("El archivo está vacío")
+        except (UnicodeDecodeError, csv.Error) as e:
+            raise GradeImportError(f"No se pudo leer el archivo: {e}")
+
+        aliases = {alias: field for field, names in COLUMN_ALIASES.items() for alias in names}
+        columns = {}
+        for index, value in enumerate(header):
+            field = aliases.get(_normalize_header(value))
+            if field and field not in columns:
+                columns[field] = index
+        missing = [field for field in REQUIRED_COLUMNS if field not in columns]
+        if missing:
+            raise GradeImportError(f"Faltan columnas en el encabezado: {', '.join(missing)}")
+
+        try:
+            for number, row in enumerate(rows, start=2):
+                if not any(_cell_text(value) for value in row):
+                    continue
+                yield number, {
+                    field: _cell_text(row[index]) if index < len(row) else ""
+                    for field, index in columns.items()
+                }
+        except (UnicodeDecodeError, csv.Error) as e:
+            raise GradeImportError(f"No se pudo leer el archivo: {e}")
+
+    @staticmethod
+    def import_grades(
+        db: Session,
+        section_id: int,
+        course_id: int,
+        rows: Iterator[Tuple[int, Dict[str, str]]],
+        user_id: int,
+        max_rows: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        Valida las filas y registra las calificaciones válidas de una sección.
+        Retorna un reporte con la cantidad importada y el error de cada fila
+        rechazada.
+        """
+        errors: List[Dict[str, Any]] = []
+        parsed = []
+        total_rows = 0
+
+        # 1. Validar el formato de cada fila
+        for number, fields in rows:
+            total_rows += 1
+            if max_rows and total_rows > max_rows:
+                raise GradeImportError(f"El archivo supera el máximo de {max_rows} filas")
+
+            identification = fields.get("identification") or None
+            error = None
+            exam_id = score = None
+            try:
+                exam_id = int(fields.get("exam_id", ""))
+            except ValueError:
+                error = "El examen debe ser un número"
+            try:
+                score = float(fields.get("score", "").replace(",", "."))
+                if not math.isfinite(score):
+                    raise ValueError(score)
+            except ValueError:
+                error = error or "La nota debe ser un número"
+            if not identification:
+                error = "Falta la identificación del estudiante"
+
+            if error:
+                errors.append({"row": number, "identification": identification, "exam_id": exam_id, "error": error})
+            else:
+                parsed.append((number, identification, exam_id, score, fields.get("comments") or None))
+
+        # 2. Resolver inscripciones, exámenes y calificaciones existentes con
+        # unas pocas consultas para todo el archivo
+        enrollments = crud.get_section_enrollments_by_identification(db, section_id=section_id)
+        exam_courses = crud.get_exam_courses(db, exam_ids=[row[2] for row in parsed])
+        graded = crud.get_graded_pairs_by_section(db, section_id=section_id, exam_ids=list(exam_courses))
+        unknown = {row[1] for row in parsed if row[1] not in enrollments}
+        registered = crud.get_existing_identifications(db, unknown) if unknown else set()
+
+        # 3. Validar cada fila contra la base de datos y contra las anteriores del archivo
+        grading_date = datetime.datetime.utcnow().isoformat()
+        grades_in = []
+        for number, identification, exam_id, score, comments in parsed:
+            enrollment = enrollments.get(identification)
+            if enrollment is None:
+                error = (
+                    "El estudiante no está inscrito en la sección" if identification in registered
+                    else "Estudiante no encontrado"
+                )
+            elif exam_id not in exam_courses:
+                error = "Examen no encontrado"
+            elif exam_courses[exam_id] != course_id:
+                error = "El examen no pertenece al curso de la sección"
+            elif (enrollment[0], exam_id) in graded:
+                error = "Ya existe una calificación para este examen"
+            else:
+                error = None
+
+            if error:
+                errors.append({"row": number, "identification": identification, "exam_id": exam_id, "error": error})
+                continue
+
+            # Una misma fila repetida en el archivo cuenta como duplicado
+            graded.add((enrollment[0], exam_id))
+            grades_in.append({
+                "student_id": enrollment[1],
+                "enrollment_id": enrollment[0],
+                "exam_id": exam_id,
+                "score": score,
+                "comments": comments,
+                "graded_by_id": user_id,
+                "grading_date": grading_date,
+            })
+
+        # 4. Insertar todas las calificaciones válidas en una transacción
+        imported = crud.create_grades(db, grades_in=grades_in)
+
+        errors.sort(key=lambda error: error["row"])
+        return {"total_rows": total_rows, "imported": imported, "errors": errors}
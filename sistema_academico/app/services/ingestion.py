@@ -0,0 +1,213 @@
+import hashlib
+import os
+from typing import Dict, List, Optional
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app import crud
+from app.database import SessionLocal
+from app.db.courses import Material
+from app.services.cache import distractor_cache, hash_file
+from app.services.distractors import DISTRACTOR_CONCEPT_TYPES, DistractorIndex
+from app.services.document_processor import DocumentProcessor, PROCESSOR_VERSION
+from app.services.workers import call_in_process, map_in_process
+
+
+class MaterialIngestion:
+    """
+    Clase para extraer el contenido de los materiales al subirlos y guardarlo
+    en la base de datos, de modo que la generación de exámenes no tenga que
+    procesar los archivos.
+    """
+    
+    @staticmethod
+    def store_result(db: Session, material: Material, result: Dict) -> bool:
+        """
+        Guarda el resultado de DocumentProcessor.process_document_safe para un
+        material. Retorna False si la extracción falló.
+        """
+        if result['error']:
+            crud.set_material_ingestion_status(db, material, "failed", result['error'])
+            return False
+        
+        concepts = DocumentProcessor.find_concepts_for_questions(result['processed_content'])
+        stat = os.stat(result['file_path'])
+        try:
+            crud.save_material_content(db, material, {
+                'content_hash': result['content_hash'],
+                'file_mtime': stat.st_mtime,
+                'file_size': stat.st_size,
+                'processor_version': PROCESSOR_VERSION,
+                'raw_text': result['raw_text'],
+                'processed_content': result['processed_content'],
+                'concepts': concepts
+            })
+        except IntegrityError:
+            # Otro trabajo (p. ej. un lote y un examen individual del mismo
+            # curso) guardó el contenido de este material al mismo tiempo
+            db.rollback()
+            db.refresh(material)
+            return material.ingestion_status == "ready"
+        
+        # Las entradas del índice de distractores quedan agrupadas desde ya,
+        # para que cada examen no tenga que recorrer los conceptos
+        distractor_cache.set_json(
+            MaterialIngestion.distractor_entries_key(result['content_hash']),
+            DistractorIndex.entries(concepts)
+        )
+        return True
+    
+    @staticmethod
+    def distractor_entries_key(content_hash: str) -> str:
+        """
+        Clave en distractor_cache de las entradas del índice de distractores
+        de un contenido procesado con la versión actual del procesador
+        """
+        payload = f"material:{content_hash}:{PROCESSOR_VERSION}"
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    
+    @staticmethod
+    def distractor_entries(db: Session, material_id: int, content_hash: str) -> List[List]:
+        """
+        Entradas del índice de distractores de un material (ver
+        DistractorIndex.entries) guardadas al procesarlo. Si no están en la
+        caché (material procesado antes o entrada desalojada) se arman con
+        sus conceptos persistidos y se vuelven a guardar.
+        """
+        key = MaterialIngestion.distractor_entries_key(content_hash)
+        entries = distractor_cache.get_json(key)
+        if entries is None:
+            entries = DistractorIndex.entries(crud.get_distractor_concepts(
+                db=db, material_ids=[material_id], concept_types=list(DISTRACTOR_CONCEPT_TYPES)
+            ))
+            distractor_cache.set_json(key, entries)
+        return entries
+    
+    @staticmethod
+    def known_content_hash(material: Material) -> Optional[str]:
+        """
+        Hash del contenido si el material está en el almacenamiento por
+        contenido, para no tener que recalcularlo al procesarlo
+        """
+        return material.blob.content_hash if material.blob is not None else None
+    
+    @staticmethod
+    def has_changed(db: Session, material: Material) -> bool:
+        """
+        Indica si el archivo de un material cambió desde la última extracción.
+        Primero compara fecha de modificación y tamaño; solo si difieren se
+        calcula el hash del contenido.
+        """
+        content = crud.get_material_content(db, material_id=material.id)
+        if content is None or content.processor_version != PROCESSOR_VERSION:
+            return True
+        
+        # Los archivos del almacenamiento por contenido nunca se modifican
+        if material.blob is not None:
+            return material.blob.content_hash != content.content_hash
+        
+        stat = os.stat(material.file_path)
+        if content.file_mtime == stat.st_mtime and content.file_size == stat.st_size:
+            return False
+        
+        if hash_file(material.file_path) != content.content_hash:
+            return True
+        
+        # Mismo contenido con otra fecha (p. ej. el archivo se copió de nuevo)
+        crud.touch_material_content(db, content, stat.st_mtime, stat.st_size)
+        return False
+    
+    @staticmethod
+    def ingest_material(material_id: int, force: bool = False) -> None:
+        """
+        Tarea en segundo plano: extrae y guarda el contenido de un material.
+        Usa su propia sesión de base de datos y procesa el archivo en el pool
+        de procesos. Si el archivo no cambió desde la última extracción no se
+        vuelve a procesar, salvo con force=True. Si cambió, el documento se
+        extrae y estructura completo (hay que leerlo para saber qué secciones
+        cambiaron), pero en el banco de conceptos solo se reemplazan los de
+        las secciones modificadas; los demás conservan su id, su dificultad
+        calibrada y sus estadísticas.
+        """
+        db = SessionLocal()
+        try:
+            material = crud.get_material(db, material_id=material_id)
+            if not material:
+                return
+            
+            try:
+                if not force and not MaterialIngestion.has_changed(db, material):
+                    if material.ingestion_status != "ready":
+                        crud.set_material_ingestion_status(db, material, "ready")
+                    return
+                
+                result = call_in_process(
+                    DocumentProcessor.process_document_safe,
+                    material.file_path,
+                    MaterialIngestion.known_content_hash(material)
+                )
+            except Exception as e:
+                result = {'error': f"Error al procesar el documento: {e!r}"}
+            
+            MaterialIngestion.store_result(db, material, result)
+        finally:
+            db.close()
+    
+    @staticmethod
+    async def ensure_ingested(db: Session, materials: List[Material]) -> List[Dict]:
+        """
+        Procesa en el momento, en paralelo, los materiales que todavía no tienen
+        su contenido extraído. Retorna los errores de los materiales que no se
+        pudieron procesar.
+        """
+        pending = [m for m in materials if m.ingestion_status in (None, "pending")]
+        if pending:
+            results = await DocumentProcessor.process_documents_async(
+                [material.file_path for material in pending],
+                [MaterialIngestion.known_content_hash(material) for material in pending]
+            )
+            for material, result in zip(pending, results):
+                MaterialIngestion.store_result(db, material, result)
+        
+        return MaterialIngestion.failed_materials(materials)
+    
+    @staticmethod
+    def ingest_pending(db: Session, materials: List[Material]) -> List[Dict]:
+        """
+        Versión síncrona de ensure_ingested, para código que se ejecuta fuera
+        del bucle de eventos (trabajos de generación, línea de comandos)
+        """
+        # Los materiales con el mismo contenido (p. ej. compartidos entre
+        # cursos de un lote) se procesan una sola vez
+        groups: Dict[str, List[Material]] = {}
+        for material in materials:
+            if material.ingestion_status in (None, "pending"):
+                key = MaterialIngestion.known_content_hash(material) or material.file_path
+                groups.setdefault(key, []).append(material)
+        
+        if groups:
+            representatives = [group[0] for group in groups.values()]
+            results = map_in_process(
+                DocumentProcessor.process_document_safe,
+                [material.file_path for material in representatives],
+                [MaterialIngestion.known_content_hash(material) for material in representatives]
+            )
+            for group, result in zip(groups.values(), results):
+                if isinstance(result, Exception):
+                    result = {'error': f"Error al procesar el documento: {result!r}"}
+                for material in group:
+                    MaterialIngestion.store_result(db, material, result)
+        
+        return MaterialIngestion.failed_materials(materials)
+    
+    @staticmethod
+    def failed_materials(materials: List[Material]) -> List[Dict]:
+        """
+        Errores de los materiales cuya extracción falló
+        """
+        return [
+            {"material_id": material.id, "title": material.title, "error": material.ingestion_error}
+            for material in materials
+            if material.ingestion_status == "failed"
+        ]
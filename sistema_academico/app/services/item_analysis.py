@@ -0,0 +1,218 @@
+import math
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app import crud
+from app.services.auto_grading import BLANK, INVALID, AnswerKey
+
+# Límites para marcar una pregunta en el reporte
+HARD_P_VALUE = 0.2  # Menos aciertos: muy difícil
+EASY_P_VALUE = 0.9  # Más aciertos: muy fácil
+MIN_DISCRIMINATION = 0.2  # Correlación punto-biserial mínima esperada
+MIN_DISTRACTOR_RATE = 0.05  # Un distractor que casi nadie elige no funciona
+
+
+def _point_biserial(
+    n: np.ndarray, chosen: np.ndarray, chosen_sum: np.ndarray, total_sum: np.ndarray, total_sq_sum: np.ndarray
+) -> np.ndarray:
+    """
+    Correlación punto-biserial entre elegir (1) o no (0) y un puntaje, a
+    partir de sumas: cantidad n, elegidos, suma del puntaje de quienes
+    eligieron, suma del puntaje y de su cuadrado. NaN cuando no está definida.
+    """
+    with np.errstate(divide="ignore", invalid="ignore"):
+        p = chosen / n
+        mean_chosen = chosen_sum / chosen
+        mean_other = (total_sum - chosen_sum) / (n - chosen)
+        variance = total_sq_sum / n - (total_sum / n) ** 2
+        r = (mean_chosen - mean_other) * np.sqrt(p * (1 - p)) / np.sqrt(variance)
+    return np.where((chosen > 0) & (chosen < n) & (variance > 1e-12), r, np.nan)
+
+
+def _optional(value: float, digits: int = 4) -> Optional[float]:
+    return None if value is None or math.isnan(value) else round(float(value), digits)
+
+
+class ItemAnalysis:
+    """
+    Análisis de ítems de los exámenes de selección múltiple: índice de
+    dificultad (p), discriminación punto-biserial, frecuencia de cada opción
+    y confiabilidad KR-20. Cada lote calificado suma sus conteos a agregados
+    guardados por examen, pregunta y opción; el reporte se calcula solo con
+    esos agregados, sin recorrer las respuestas anteriores.
+    """
+
+    @staticmethod
+    def record(
+        db: Session,
+        exam_id: int,
+        key: AnswerKey,
+        original: np.ndarray,
+        responses_in: List[Dict[str, Any]]
+    ) -> None:
+        """
+        Guarda un lote de respuestas calificadas (original: una fila por
+        estudiante en el orden del examen original, ver
+        AnswerKey.original_answers) y acumula sus conteos. No hace commit:
+        forma parte de la transacción que registra las calificaciones.
+        """
+        if not len(original):
+            return
+        scorable = np.flatnonzero(key.correct[0] != BLANK)
+        answers = original[:, scorable]
+        hits = answers == key.correct[0, scorable]
+        totals = hits.sum(axis=1).astype(np.float64)
+
+        # Conteos por opción con una matriz (estudiante, pregunta, opción)
+        option_ids = key.option_ids[scorable]
+        chosen = answers[:, :, None] == np.arange(option_ids.shape[1])
+        chosen_counts = chosen.sum(axis=0)
+        chosen_sums = np.einsum("s,sqk->qk", totals, chosen)
+
+        for response, answers_row in zip(responses_in, original.tolist()):
+            response["answers"] = answers_row
+        crud.create_exam_responses(db, responses_in=responses_in)
+
+        crud.increment_item_stats(
+            db,
+            exam_id=exam_id,
+            exam_delta={
+                "examinees": len(totals),
+                "total_sum": float(totals.sum()),
+                "total_sq_sum": float((totals ** 2).sum()),
+            },
+            question_deltas=[
+                {
+                    "question_id": int(question_id),
+                    "responses": len(totals),
+                    "correct": int(correct),
+                    "blank": int(blank),
+                    "invalid": int(invalid),
+                    "correct_total_sum": float(correct_sum),
+                }
+                for question_id, correct, blank, invalid, correct_sum in zip(
+                    key.question_ids[scorable],
+                    hits.sum(axis=0),
+                    (answers == BLANK).sum(axis=0),
+                    (answers == INVALID).sum(axis=0),
+                    totals @ hits,
+                )
+            ],
+            option_deltas=[
+                {
+                    "option_id": int(option_ids[q, k]),
+                    "question_id": int(key.question_ids[scorable[q]]),
+                    "chosen": int(chosen_counts[q, k]),
+                    "chosen_total_sum": float(chosen_sums[q, k]),
+                }
+                for q, k in zip(*np.nonzero(option_ids >= 0))
+            ]
+        )
+
+    @staticmethod
+    def report(db: Session, exam, min_responses: int) -> Dict[str, Any]:
+        """
+        Reporte de análisis de ítems de un examen a partir de sus agregados.
+        Las preguntas con al menos min_responses respuestas se marcan si son
+        muy fáciles o muy difíciles, discriminan poco o tienen distractores
+        que no funcionan.
+        """
+        exam_stat, question_stats, option_stats = crud.get_item_stats(db, exam_id=exam.id)
+        questions = [
+            question for question in exam.questions
+            if question.question_type == 'multiple_choice' and question.id in question_stats
+        ]
+        n = exam_stat.examinees if exam_stat else 0
+        total_sum = exam_stat.total_sum if exam_stat else 0.0
+        total_sq_sum = exam_stat.total_sq_sum if exam_stat else 0.0
+
+        stats = [question_stats[question.id] for question in questions]
+        responses = np.array([stat.responses for stat in stats], dtype=np.float64)
+        correct = np.array([stat.correct for stat in stats], dtype=np.float64)
+        correct_sum = np.array([stat.correct_total_sum for stat in stats], dtype=np.float64)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            p_values = correct / responses
+            blank_rates = np.array([stat.blank for stat in stats]) / responses
+
+        # Discriminación contra el total sin la propia pregunta (ítem-resto):
+        # sus sumas se obtienen de los agregados sin volver a las respuestas
+        discrimination = _point_biserial(
+            responses, correct, correct_sum - correct,
+            total_sum - correct, total_sq_sum - 2 * correct_sum + correct
+        )
+
+        mean = variance = kr20 = None
+        if n:
+            mean = total_sum / n
+            variance = max(total_sq_sum / n - mean ** 2, 0.0)
+            k = len(questions)
+            if n > 1 and k > 1 and variance > 1e-12:
+                kr20 = k / (k - 1) * (1 - float(np.nansum(p_values * (1 - p_values))) / variance)
+
+        report_questions = []
+        for index, question in enumerate(questions):
+            option_rows = [(option, option_stats.get(option.id)) for option in question.options]
+            chosen = np.array([stat.chosen if stat else 0 for _, stat in option_rows], dtype=np.float64)
+            chosen_sum = np.array([stat.chosen_total_sum if stat else 0 for _, stat in option_rows], dtype=np.float64)
+            n_question = np.full(len(option_rows), responses[index])
+            option_discrimination = _point_biserial(
+                n_question, chosen, chosen_sum, np.full(len(option_rows), total_sum), np.full(len(option_rows), total_sq_sum)
+            )
+            with np.errstate(divide="ignore", invalid="ignore"):
+                rates = chosen / responses[index]
+                option_means = chosen_sum / chosen
+
+            options = [
+                {
+                    "option_id": option.id,
+                    "position": option.position,
+                    "content": option.content,
+                    "is_correct": option.is_correct,
+                    "chosen": int(chosen[j]),
+                    "rate": _optional(rates[j]),
+                    "mean_total": _optional(option_means[j]),
+                    "point_biserial": _optional(option_discrimination[j]),
+                }
+                for j, (option, _) in enumerate(option_rows)
+            ]
+
+            flags = []
+            if responses[index] >= min_responses:
+                p_value, r = p_values[index], discrimination[index]
+                if p_value < HARD_P_VALUE:
+                    flags.append("Muy difícil")
+                elif p_value > EASY_P_VALUE:
+                    flags.append("Muy fácil")
+                if not np.isnan(r) and r < MIN_DISCRIMINATION:
+                    flags.append("Discrimina poco" if r >= 0 else "Discriminación negativa: revisar la clave")
+                for option in options:
+                    if option["is_correct"]:
+                        continue
+                    if (option["point_biserial"] or 0) > 0:
+                        flags.append(f"El distractor {chr(65 + option['position'])} atrae a los mejores puntajes")
+                    elif (option["rate"] or 0) < MIN_DISTRACTOR_RATE:
+                        flags.append(f"El distractor {chr(65 + option['position'])} casi no se elige")
+
+            report_questions.append({
+                "question_id": question.id,
+                "number": question.position + 1,
+                "content": question.content,
+                "difficulty": question.difficulty,
+                "responses": int(responses[index]),
+                "p_value": _optional(p_values[index]),
+                "point_biserial": _optional(discrimination[index]),
+                "blank_rate": _optional(blank_rates[index]),
+                "options": options,
+                "flags": flags,
+            })
+
+        return {
+            "exam_id": exam.id,
+            "examinees": n,
+            "mean_correct": _optional(mean),
+            "sd_correct": _optional(math.sqrt(variance)) if variance is not None else None,
+            "kr20": _optional(kr20),
+            "questions": report_questions,
+        }
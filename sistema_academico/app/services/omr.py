@@ -0,0 +1,447 @@
+import io
+import os
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont, UnidentifiedImageError
+from sqlalchemy.orm import Session
+
+from app.services.auto_grading import BLANK, INVALID, AnswerKey, AutoGrader
+from app.services.workers import map_in_process
+
+# Geometría de la hoja de lectura óptica, en milímetros sobre una página A4
+PAGE_WIDTH_MM = 210.0
+PAGE_HEIGHT_MM = 297.0
+FIDUCIAL_SIZE_MM = 8.0
+FIDUCIAL_CENTERS_MM = ((14.0, 14.0), (196.0, 14.0), (14.0, 283.0), (196.0, 283.0))
+FIDUCIAL_SEARCH_MM = 11.0  # Distancia máxima de cada marca a su posición nominal
+BUBBLE_DIAMETER_MM = 4.2
+ID_PITCH_MM = 6.0
+ID_TOP_MM = 50.0
+ID_LEFT_MM = 24.0
+VARIANT_ROWS = 10
+VARIANT_COLUMN_MM = 14.0
+QUESTION_PITCH_MM = 6.5
+QUESTION_TOP_MM = 118.0
+QUESTION_BOTTOM_MM = 274.0
+QUESTION_LEFT_MM = 20.0
+QUESTION_RIGHT_MM = 192.0
+QUESTION_LABEL_MM = 10.0  # Ancho del número de pregunta antes de las burbujas
+QUESTION_GAP_MM = 5.0
+
+# Resolución con la que se dibuja la hoja para imprimirla
+RENDER_DPI = 150
+
+# Fracción del radio de la burbuja que se mide: deja fuera el contorno impreso
+SAMPLE_RADIUS = 0.6
+
+# Valores de una respuesta leída que no es una opción (una marca múltiple
+# se califica como respuesta inválida)
+MULTIPLE = INVALID
+
+# Formatos de escaneo admitidos (los TIFF pueden tener varias páginas)
+SCAN_EXTENSIONS = (".tif", ".tiff", ".png", ".jpg", ".jpeg")
+
+
+class OMRError(Exception):
+    """
+    Error que impide leer las hojas (examen no apto, archivo ilegible); el
+    mensaje se muestra al usuario
+    """
+
+
+def _font(size: int):
+    try:
+        return ImageFont.truetype("DejaVuSans.ttf", size)
+    except OSError:
+        return ImageFont.load_default()
+
+
+class SheetLayout:
+    """
+    Posición de cada burbuja de la hoja de lectura óptica de un examen, en
+    milímetros: la identificación (una columna de dígitos 0-9 por carácter),
+    la variante, si el examen tiene variantes, y las preguntas de selección
+    múltiple en columnas. Se calcula igual al dibujar la hoja y al leerla.
+    """
+
+    def __init__(
+        self,
+        question_numbers: Sequence[int],
+        num_options: int,
+        variant_codes: Sequence[str] = (),
+        id_digits: int = 10
+    ):
+        self.question_numbers = list(question_numbers)
+        self.num_options = num_options
+        self.variant_codes = list(variant_codes)
+        self.id_digits = id_digits
+
+        # Identificación: columna por carácter, fila por dígito
+        self.id_centers = np.array([
+            (ID_LEFT_MM + column * ID_PITCH_MM, ID_TOP_MM + digit * ID_PITCH_MM)
+            for column in range(id_digits)
+            for digit in range(10)
+        ]).reshape(-1, 2)
+
+        # Variante: columnas de hasta VARIANT_ROWS códigos a la derecha de la identificación
+        self.variant_left = ID_LEFT_MM + id_digits * ID_PITCH_MM + 12.0
+        self.variant_centers = np.array([
+            (self.variant_left + (k // VARIANT_ROWS) * VARIANT_COLUMN_MM, ID_TOP_MM + (k % VARIANT_ROWS) * ID_PITCH_MM)
+            for k in range(len(self.variant_codes))
+        ]).reshape(-1, 2)
+        if len(self.variant_codes) and self.variant_centers[:, 0].max() > QUESTION_RIGHT_MM:
+            raise OMRError("La identificación y las variantes no caben en la hoja")
+
+        # Preguntas: columnas de rows_per_column preguntas
+        self.rows_per_column = int((QUESTION_BOTTOM_MM - QUESTION_TOP_MM) // QUESTION_PITCH_MM) + 1
+        self.column_width = QUESTION_LABEL_MM + num_options * QUESTION_PITCH_MM + QUESTION_GAP_MM
+        last_bubble = QUESTION_LABEL_MM + (num_options - 1) * QUESTION_PITCH_MM + BUBBLE_DIAMETER_MM / 2
+        self.columns = max(0, int((QUESTION_RIGHT_MM - QUESTION_LEFT_MM - last_bubble) // self.column_width) + 1)
+        capacity = self.columns * self.rows_per_column
+        if len(self.question_numbers) > capacity:
+            raise OMRError(
+                f"La hoja de lectura óptica admite hasta {capacity} preguntas de selección múltiple "
+                f"con {num_options} opciones"
+            )
+
+        self.row_origins = np.array([self.row_origin(index) for index in range(len(self.question_numbers))]).reshape(-1, 2)
+        offsets = QUESTION_LABEL_MM + np.arange(num_options) * QUESTION_PITCH_MM
+        self.question_centers = np.stack([
+            self.row_origins[:, :1] + offsets,
+            np.repeat(self.row_origins[:, 1:], num_options, axis=1),
+        ], axis=-1).reshape(-1, 2)
+
+    def row_origin(self, index: int) -> Tuple[float, float]:
+        column, row = divmod(index, self.rows_per_column)
+        return QUESTION_LEFT_MM + column * self.column_width, QUESTION_TOP_MM + row * QUESTION_PITCH_MM
+
+    def render(self, title: str, subtitle: str, dpi: int = RENDER_DPI) -> Image.Image:
+        """
+        Dibuja la hoja para imprimirla
+        """
+        scale = dpi / 25.4
+        width, height = round(PAGE_WIDTH_MM * scale), round(PAGE_HEIGHT_MM * scale)
+        image = Image.new("L", (width, height), 255)
+        draw = ImageDraw.Draw(image)
+        text_font, small_font = _font(round(3.2 * scale)), _font(round(2.4 * scale))
+
+        def px(x: float, y: float) -> Tuple[int, int]:
+            return round(x * scale), round(y * scale)
+
+        def text(x: float, y: float, value: str, font=small_font) -> None:
+            # (x, y) es el centro del texto
+            left, top, right, bottom = draw.textbbox((0, 0), value, font=font)
+            cx, cy = px(x, y)
+            draw.text((cx - (right - left) / 2 - left, cy - (bottom - top) / 2 - top), value, font=font, fill=0)
+
+        def bubble(x: float, y: float) -> None:
+            radius = BUBBLE_DIAMETER_MM / 2 * scale
+            cx, cy = px(x, y)
+            draw.ellipse((cx - radius, cy - radius, cx + radius, cy + radius), outline=0, width=max(1, round(0.25 * scale)))
+
+        half = FIDUCIAL_SIZE_MM / 2
+        for x, y in FIDUCIAL_CENTERS_MM:
+            draw.rectangle((px(x - half, y - half), px(x + half, y + half)), fill=0)
+
+        draw.text(px(26, 9), title[:70], font=text_font, fill=0)
+        draw.text(px(26, 17), subtitle, font=small_font, fill=0)
+        draw.text(px(26, 25), "Nombre: " + "_" * 45, font=small_font, fill=0)
+        draw.text(
+            px(26, 33),
+            "Rellene por completo un círculo por columna de la identificación y por pregunta, con tinta oscura.",
+            font=small_font, fill=0
+        )
+
+        draw.text(px(ID_LEFT_MM - 4, 41), "Identificación", font=small_font, fill=0)
+        for digit in range(10):
+            text(ID_LEFT_MM - 5, ID_TOP_MM + digit * ID_PITCH_MM, str(digit))
+        for x, y in self.id_centers:
+            bubble(x, y)
+
+        if self.variant_codes:
+            draw.text(px(self.variant_left - 4, 41), "Variante", font=small_font, fill=0)
+            for code, (x, y) in zip(self.variant_codes, self.variant_centers):
+                text(x - 5, y, code)
+                bubble(x, y)
+
+        draw.text(px(QUESTION_LEFT_MM, 108.5), "Respuestas", font=small_font, fill=0)
+        letters = [chr(65 + j) for j in range(self.num_options)]
+        for column in range(min(self.columns, -(-len(self.question_numbers) // self.rows_per_column))):
+            x0 = QUESTION_LEFT_MM + column * self.column_width
+            for j, letter in enumerate(letters):
+                text(x0 + QUESTION_LABEL_MM + j * QUESTION_PITCH_MM, QUESTION_TOP_MM - 4.5, letter)
+        for number, (x0, y0) in zip(self.question_numbers, self.row_origins):
+            text(x0 + 3, y0, str(number))
+        for x, y in self.question_centers:
+            bubble(x, y)
+        return image
+
+    def render_pdf(self, title: str, subtitle: str, dpi: int = RENDER_DPI) -> bytes:
+        buffer = io.BytesIO()
+        self.render(title, subtitle, dpi).save(buffer, "PDF", resolution=dpi)
+        return buffer.getvalue()
+
+
+def _otsu_threshold(pixels: np.ndarray) -> int:
+    """
+    Umbral de Otsu sobre el histograma de grises: separa tinta y papel sin
+    depender del brillo del escáner
+    """
+    histogram = np.bincount(pixels.ravel(), minlength=256).astype(np.float64)
+    levels = np.arange(256)
+    weight = np.cumsum(histogram)
+    total = weight[-1]
+    mean = np.cumsum(histogram * levels)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        between = (mean[-1] * weight - mean * total) ** 2 / (weight * (total - weight))
+    between[~np.isfinite(between)] = 0
+    return int(np.argmax(between))
+
+
+def _find_fiducial(dark: np.ndarray, center: Tuple[float, float], scale: Tuple[float, float]) -> Optional[Tuple[float, float]]:
+    """
+    Centro en píxeles del cuadrado de referencia más cercano a su posición
+    nominal: la ventana de tamaño de la marca con más píxeles oscuros,
+    buscada con una imagen integral
+    """
+    sx, sy = scale
+    x0 = max(0, int((center[0] - FIDUCIAL_SEARCH_MM) * sx))
+    x1 = min(dark.shape[1], int((center[0] + FIDUCIAL_SEARCH_MM) * sx))
+    y0 = max(0, int((center[1] - FIDUCIAL_SEARCH_MM) * sy))
+    y1 = min(dark.shape[0], int((center[1] + FIDUCIAL_SEARCH_MM) * sy))
+    side = max(2, int(FIDUCIAL_SIZE_MM * 0.8 * min(sx, sy)))
+    window = dark[y0:y1, x0:x1]
+    if window.shape[0] <= side or window.shape[1] <= side:
+        return None
+
+    integral = np.zeros((window.shape[0] + 1, window.shape[1] + 1), dtype=np.int32)
+    integral[1:, 1:] = window.cumsum(axis=0, dtype=np.int32).cumsum(axis=1)
+    sums = integral[side:, side:] - integral[:-side, side:] - integral[side:, :-side] + integral[:-side, :-side]
+    y, x = np.unravel_index(np.argmax(sums), sums.shape)
+    if sums[y, x] < 0.75 * side * side:
+        return None
+    return x0 + x + side / 2, y0 + y + side / 2
+
+
+def _choices(fills: np.ndarray, threshold: float) -> np.ndarray:
+    """
+    Opción marcada en cada fila de fracciones de relleno: su índice, BLANK
+    si no hay ninguna o MULTIPLE si hay más de una
+    """
+    marked = fills >= threshold
+    count = marked.sum(axis=1)
+    return np.where(count == 0, BLANK, np.where(count > 1, MULTIPLE, np.argmax(fills, axis=1)))
+
+
+def read_page(image: Image.Image, layout: SheetLayout, fill_threshold: float, work_dpi: int) -> Dict[str, Any]:
+    """
+    Lee una página escaneada: ubica las cuatro marcas de referencia, calcula
+    la transformación afín de la hoja a la imagen (corrige inclinación,
+    escala y desplazamiento sin rotar la imagen) y mide el relleno de cada
+    burbuja en su posición transformada.
+    """
+    # Trabajar a baja resolución: los JPEG se decodifican directamente reducidos
+    target = (round(PAGE_WIDTH_MM / 25.4 * work_dpi), round(PAGE_HEIGHT_MM / 25.4 * work_dpi))
+    if image.format == "JPEG":
+        image.draft("L", target)
+    image = image.convert("L")
+    factor = min(image.width // target[0], image.height // target[1])
+    if factor > 1:
+        image = image.reduce(factor)
+
+    pixels = np.asarray(image)
+    dark = pixels < _otsu_threshold(pixels)
+    scale = (dark.shape[1] / PAGE_WIDTH_MM, dark.shape[0] / PAGE_HEIGHT_MM)
+
+    found = [_find_fiducial(dark, center, scale) for center in FIDUCIAL_CENTERS_MM]
+    if any(point is None for point in found):
+        return {"error": "No se encontraron las marcas de referencia de la hoja"}
+
+    # Transformación afín por mínimos cuadrados con las cuatro marcas
+    source = np.hstack([np.array(FIDUCIAL_CENTERS_MM), np.ones((4, 1))])
+    target_points = np.array(found)
+    transform = np.linalg.lstsq(source, target_points, rcond=None)[0]
+    residual = np.abs(source @ transform - target_points).max()
+    pixels_per_mm = np.sqrt(abs(np.linalg.det(transform[:2])))
+    if residual > 1.5 * pixels_per_mm:
+        return {"error": "La hoja está deformada o las marcas de referencia no coinciden"}
+
+    # Píxeles de un disco centrado en cada burbuja
+    radius = BUBBLE_DIAMETER_MM / 2 * SAMPLE_RADIUS * pixels_per_mm
+    span = np.arange(-int(radius), int(radius) + 1)
+    dx, dy = np.meshgrid(span, span)
+    inside = dx ** 2 + dy ** 2 <= radius ** 2
+    disk = np.stack([dx[inside], dy[inside]], axis=1)
+
+    def fills(centers_mm: np.ndarray) -> np.ndarray:
+        centers = np.hstack([centers_mm, np.ones((len(centers_mm), 1))]) @ transform
+        points = np.rint(centers[:, None, :] + disk[None, :, :]).astype(np.intp)
+        x = np.clip(points[..., 0], 0, dark.shape[1] - 1)
+        y = np.clip(points[..., 1], 0, dark.shape[0] - 1)
+        return dark[y, x].mean(axis=1)
+
+    digits = _choices(fills(layout.id_centers).reshape(layout.id_digits, 10), fill_threshold)
+    if (digits == MULTIPLE).any():
+        return {"error": "Identificación ilegible: hay columnas con más de un dígito marcado"}
+    identification = "".join(str(digit) for digit in digits if digit != BLANK)
+
+    variant_code = None
+    if layout.variant_codes:
+        variant = _choices(fills(layout.variant_centers).reshape(1, -1), fill_threshold)[0]
+        if variant == MULTIPLE:
+            return {"identification": identification, "error": "Hay más de una variante marcada"}
+        if variant != BLANK:
+            variant_code = layout.variant_codes[variant]
+
+    answers = np.empty(0, dtype=np.intp)
+    if layout.question_numbers:
+        answers = _choices(fills(layout.question_centers).reshape(-1, layout.num_options), fill_threshold)
+    return {"identification": identification, "variant_code": variant_code, "answers": answers.tolist()}
+
+
+def read_pages(
+    path: str, frames: List[int], layout: SheetLayout, fill_threshold: float, work_dpi: int
+) -> List[Dict[str, Any]]:
+    """
+    Lee un grupo de páginas de un mismo archivo. Se ejecuta en el pool de
+    procesos: cada tarea abre el archivo una vez y recorre sus páginas.
+    """
+    results = []
+    with Image.open(path) as image:
+        for frame in frames:
+            try:
+                image.seek(frame)
+                results.append(read_page(image, layout, fill_threshold, work_dpi))
+            except (OSError, ValueError) as e:
+                results.append({"error": f"No se pudo leer la página: {e}"})
+    return results
+
+
+class OpticalMarkReader:
+    """
+    Lectura óptica de hojas de respuestas escaneadas. Las páginas se leen en
+    paralelo en el pool de procesos, se califican contra la clave guardada
+    del examen (o de la variante marcada) y las calificaciones se registran
+    con una sola inserción masiva.
+    """
+
+    @staticmethod
+    def multiple_choice_questions(exam) -> List[Any]:
+        return [
+            question for question in exam.questions
+            if question.question_type == 'multiple_choice' and question.options
+        ]
+
+    @staticmethod
+    def layout_for_exam(exam, id_digits: int) -> SheetLayout:
+        """
+        Disposición de la hoja de un examen guardado. Los números de pregunta y
+        las letras coinciden con la hoja de respuestas DOCX.
+        """
+        questions = OpticalMarkReader.multiple_choice_questions(exam)
+        if not questions:
+            raise OMRError("El examen no tiene preguntas de selección múltiple")
+        num_options = max(4, max(len(question.options) for question in questions))
+        return SheetLayout(
+            question_numbers=[question.position + 1 for question in questions],
+            num_options=num_options,
+            variant_codes=sorted(variant.variant_code for variant in exam.exam_variants),
+            id_digits=id_digits
+        )
+
+    @staticmethod
+    def read_scans(
+        files: List[Tuple[str, str]],
+        layout: SheetLayout,
+        fill_threshold: float,
+        work_dpi: int,
+        pages_per_task: int,
+        max_pages: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Lee todas las páginas de los archivos (nombre, ruta) en el pool de
+        procesos, en tareas de pages_per_task páginas. Retorna una lectura por
+        página, en orden, con su número y archivo.
+        """
+        tasks = []
+        for filename, path in files:
+            try:
+                with Image.open(path) as image:
+                    num_frames = getattr(image, "n_frames", 1)
+            except (UnidentifiedImageError, OSError):
+                raise OMRError(f"No se pudo leer la imagen {filename}")
+            for start in range(0, num_frames, pages_per_task):
+                tasks.append((filename, path, list(range(start, min(start + pages_per_task, num_frames)))))
+
+        total_pages = sum(len(frames) for _, _, frames in tasks)
+        if max_pages and total_pages > max_pages:
+            raise OMRError(f"Se admiten hasta {max_pages} páginas por carga")
+
+        results = map_in_process(
+            read_pages,
+            [path for _, path, _ in tasks],
+            [frames for _, _, frames in tasks],
+            [layout] * len(tasks),
+            [fill_threshold] * len(tasks),
+            [work_dpi] * len(tasks),
+        )
+
+        pages = []
+        for (filename, _, frames), result in zip(tasks, results):
+            if isinstance(result, Exception):
+                result = [{"error": f"No se pudo leer la página: {result}"}] * len(frames)
+            for page in result:
+                pages.append(dict(page, page=len(pages) + 1, file=filename))
+        return pages
+
+    @staticmethod
+    def grade_pages(
+        db: Session,
+        section_id: int,
+        exam,
+        pages: List[Dict[str, Any]],
+        user_id: int
+    ) -> Dict[str, Any]:
+        """
+        Califica las páginas leídas con AutoGrader contra la clave del examen
+        o de la variante marcada. Retorna un reporte con el resultado de cada
+        página calificada y el error de cada página rechazada.
+        """
+        key = AnswerKey.compile(exam)
+        questions = OpticalMarkReader.multiple_choice_questions(exam)
+        columns = np.array([question.position for question in questions], dtype=np.intp)
+
+        # Las respuestas de la hoja van en las columnas de sus números de pregunta
+        entries = []
+        answers = np.full((len(pages), key.num_questions), BLANK, dtype=np.int16)
+        for row, page in enumerate(pages):
+            entry = {
+                "identification": page.get("identification"),
+                "variant_code": page.get("variant_code"),
+                "error": page.get("error"),
+                "ref": {"page": page["page"], "file": page.get("file")},
+            }
+            if not entry["error"] and len(key.versions) > 1 and not entry["variant_code"]:
+                entry["error"] = "Falta la variante del examen"
+            if not entry["error"]:
+                answers[row, columns] = page["answers"]
+            entries.append(entry)
+
+        report = AutoGrader.grade_section(
+            db, section_id=section_id, exam=exam, key=key, entries=entries, answers=answers,
+            user_id=user_id, source="Lectura óptica"
+        )
+        return {
+            "total_pages": report["total"],
+            "imported": report["imported"],
+            "results": report["results"],
+            "errors": report["errors"],
+        }
+
+
+def scan_extension(filename: str) -> str:
+    extension = os.path.splitext(filename or "")[1].lower()
+    if extension not in SCAN_EXTENSIONS:
+        raise OMRError("Formato no soportado. Use imágenes TIFF (de una o varias páginas), PNG o JPEG")
+    return extension
@@ -0,0 +1,185 @@
+import random
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+def numpy_generator(rng: random.Random) -> np.random.Generator:
+    """
+    Generador de NumPy derivado de un random.Random, para que una sola
+    semilla determine tanto el azar de Python como el de NumPy
+    """
+    return np.random.default_rng(rng.getrandbits(64))
+
+
+def largest_remainder(total: int, weights: np.ndarray) -> np.ndarray:
+    """
+    Reparte total unidades en proporción a weights con el método del mayor
+    resto, de modo que la suma sea exactamente total
+    """
+    counts = np.zeros(len(weights), dtype=np.int64)
+    weight_sum = weights.sum()
+    if total <= 0 or weight_sum <= 0:
+        return counts
+    exact = total * weights / weight_sum
+    counts = np.floor(exact).astype(np.int64)
+    missing = total - int(counts.sum())
+    if missing > 0:
+        counts[np.argsort(-(exact - counts), kind="stable")[:missing]] += 1
+    return counts
+
+
+def allocate(
+    available: Dict[Any, int],
+    total: int,
+    weights: Dict[Any, float]
+) -> Tuple[Dict[Any, int], Dict[str, Any]]:
+    """
+    Reparte total elementos entre estratos según sus pesos, sin superar lo
+    disponible en cada uno. Lo que no cabe en un estrato se redistribuye
+    entre los que tienen elementos de sobra, primero entre los estratos con
+    peso y luego entre el resto. Retorna las cantidades por estrato y un
+    reporte con lo que faltó si no hay elementos suficientes.
+    """
+    strata = list(available)
+    capacity = np.array([max(int(available[s]), 0) for s in strata], dtype=np.int64)
+    weight = np.array([max(float(weights.get(s, 0.0)), 0.0) for s in strata], dtype=np.float64)
+
+    requested = largest_remainder(total, weight)
+    counts = np.minimum(requested, capacity)
+    remaining = int(min(total, capacity.sum())) - int(counts.sum())
+
+    # Primero los estratos con peso; luego el resto, en proporción a lo
+    # disponible. Cada vuelta coloca todo lo que falta o llena al menos un
+    # estrato, así que hay como mucho una vuelta por estrato.
+    for pass_weight in (weight, np.where(weight == 0, capacity, 0).astype(np.float64)):
+        while remaining > 0:
+            spare = capacity - counts
+            open_weight = np.where(spare > 0, pass_weight, 0.0)
+            if open_weight.sum() == 0:
+                break
+            share = np.minimum(largest_remainder(remaining, open_weight), spare)
+            counts += share
+            remaining -= int(share.sum())
+
+    selected = int(counts.sum())
+    report = {
+        "requested": total,
+        "selected": selected,
+        "missing": total - selected,
+        "by_stratum": {
+            _stratum_name(s): {
+                "requested": int(requested[i]),
+                "available": int(capacity[i]),
+                "selected": int(counts[i]),
+            }
+            for i, s in enumerate(strata)
+        },
+    }
+    return {s: int(counts[i]) for i, s in enumerate(strata)}, report
+
+
+def _stratum_name(stratum: Any) -> str:
+    if isinstance(stratum, tuple):
+        return "/".join(str(value) for value in stratum)
+    return str(stratum)
+
+
+class StratifiedSampler:
+    """
+    Muestreo estratificado sobre un banco de elementos (conceptos o
+    preguntas). Los estratos se calculan una sola vez al construir el
+    muestreador, en tiempo lineal, y cada muestra solo sortea índices con
+    NumPy, de modo que un mismo banco puede muestrearse muchas veces.
+    """
+
+    def __init__(
+        self,
+        items: Sequence[Dict],
+        fields: Sequence[str],
+        defaults: Optional[Dict[str, Any]] = None
+    ):
+        self.items = items
+        self.fields = list(fields)
+        defaults = defaults or {}
+
+        # Codificar los valores de cada campo como enteros consecutivos, en
+        # orden de primera aparición (los valores pueden ser de cualquier tipo
+        # hashable, incluido None, por lo que no se ordenan)
+        count = len(items)
+        codes = np.zeros(count, dtype=np.int64)
+        field_values = []
+        for field in self.fields:
+            default = defaults.get(field)
+            value_codes: Dict[Any, int] = {}
+            field_codes = np.fromiter(
+                (value_codes.setdefault(item.get(field, default), len(value_codes)) for item in items),
+                dtype=np.int64, count=count
+            )
+            field_values.append(list(value_codes))
+            codes = codes * len(value_codes) + field_codes
+
+        # Cada estrato (combinación de valores de los campos) es un entero
+        stratum_codes, codes = np.unique(codes, return_inverse=True)
+        self.strata: List[Tuple] = []
+        for stratum_code in stratum_codes.tolist():
+            stratum = []
+            for values in reversed(field_values):
+                stratum_code, value_code = divmod(stratum_code, len(values))
+                stratum.append(values[value_code])
+            self.strata.append(tuple(reversed(stratum)))
+
+        # Índices de los elementos agrupados por estrato
+        order = np.argsort(codes, kind="stable")
+        sizes = np.bincount(codes, minlength=len(self.strata))
+        self.indices_by_stratum = np.split(order, np.cumsum(sizes)[:-1]) if len(self.strata) else []
+
+    def available(self) -> Dict[Tuple, int]:
+        return {stratum: len(indices) for stratum, indices in zip(self.strata, self.indices_by_stratum)}
+
+    def weights(self, distributions: Dict[str, Dict[str, float]]) -> Dict[Tuple, float]:
+        """
+        Peso de cada estrato: el producto de los pesos de sus valores en la
+        distribución de cada campo. Un campo sin distribución no pondera.
+        """
+        weights = {}
+        for stratum in self.strata:
+            weight = 1.0
+            for field, value in zip(self.fields, stratum):
+                distribution = distributions.get(field)
+                if distribution is not None:
+                    weight *= float(distribution.get(value, 0.0))
+            weights[stratum] = weight
+        return weights
+
+    def sample_indices(
+        self,
+        total: int,
+        distributions: Dict[str, Dict[str, float]],
+        rng: Optional[np.random.Generator] = None
+    ) -> Tuple[np.ndarray, Dict[str, Any]]:
+        """
+        Sortea sin reemplazo los índices de total elementos según las
+        distribuciones por campo. Retorna los índices y el reporte de allocate.
+        """
+        rng = rng if rng is not None else np.random.default_rng()
+        counts, report = allocate(self.available(), total, self.weights(distributions))
+        chosen = [
+            rng.choice(indices, size=counts[stratum], replace=False)
+            for stratum, indices in zip(self.strata, self.indices_by_stratum)
+            if counts[stratum] > 0
+        ]
+        selected = np.concatenate(chosen) if chosen else np.empty(0, dtype=np.int64)
+        return selected, report
+
+    def sample(
+        self,
+        total: int,
+        distributions: Dict[str, Dict[str, float]],
+        rng: Optional[np.random.Generator] = None
+    ) -> Tuple[List[Dict], Dict[str, Any]]:
+        """
+        Igual que sample_indices, pero retorna los elementos
+        """
+        indices, report = self.sample_indices(total, distributions, rng)
+        return [self.items[i] for i in indices.tolist()], report
@@ -0,0 +1,109 @@
+import hashlib
+import os
+import uuid
+from typing import Dict
+
+import aiofiles
+from fastapi import UploadFile
+
+from app import crud
+from app.core.config import settings
+from app.database import SessionLocal
+from app.services.cache import CHUNK_SIZE
+
+
+class BlobStorage:
+    """
+    Almacenamiento de archivos direccionado por contenido: cada archivo
+    distinto se guarda una sola vez, en subdirectorios según su hash, y los
+    materiales apuntan a él. Un conteo de referencias determina cuándo se
+    puede borrar.
+    """
+    
+    @staticmethod
+    def blob_path(content_hash: str, file_extension: str) -> str:
+        return os.path.join(
+            settings.BLOB_STORAGE_DIR,
+            content_hash[:2],
+            content_hash[2:4],
+            f"{content_hash}{file_extension}"
+        )
+    
+    @staticmethod
+    async def save_upload(file: UploadFile, file_extension: str) -> Dict:
+        """
+        Guarda un archivo subido en un temporal calculando su hash mientras
+        se recibe. Retorna los datos para crud.acquire_blob; después de
+        confirmar la referencia hay que llamar a finish_upload, que deja el
+        archivo en su lugar. El temporal se conserva hasta entonces porque
+        un archivo que ya existe puede borrarlo collect_garbage mientras
+        tanto, si no tenía referencias.
+        """
+        tmp_dir = os.path.join(settings.BLOB_STORAGE_DIR, "tmp")
+        os.makedirs(tmp_dir, exist_ok=True)
+        tmp_path = os.path.join(tmp_dir, f"{uuid.uuid4()}.part")
+        
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            async with aiofiles.open(tmp_path, "wb") as buffer:
+                while True:
+                    chunk = await file.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    digest.update(chunk)
+                    size += len(chunk)
+                    await buffer.write(chunk)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        
+        content_hash = digest.hexdigest()
+        return {
+            "key": f"{content_hash}{file_extension}",
+            "content_hash": content_hash,
+            "file_path": BlobStorage.blob_path(content_hash, file_extension),
+            "size": size,
+            "tmp_path": tmp_path,
+        }
+    
+    @staticmethod
+    def finish_upload(blob_in: Dict, referenced: bool = True) -> None:
+        """
+        Termina una subida de save_upload. Con referenced=True (la referencia
+        de crud.acquire_blob ya se confirmó, así que collect_garbage no puede
+        borrar el archivo) el temporal pasa a ser el archivo si todavía no
+        existe; si no, o con referenced=False, se descarta.
+        """
+        tmp_path = blob_in["tmp_path"]
+        if referenced and not os.path.exists(blob_in["file_path"]):
+            os.makedirs(os.path.dirname(blob_in["file_path"]), exist_ok=True)
+            os.replace(tmp_path, blob_in["file_path"])
+        elif os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    
+    @staticmethod
+    def collect_garbage() -> int:
+        """
+        Tarea en segundo plano: elimina los archivos que no usa ningún material
+        desde hace más de BLOB_GC_GRACE_SECONDS. Retorna cuántos se eliminaron.
+        Los archivos se borran antes de confirmar el borrado de sus registros:
+        una subida que vuelve a referenciar uno de ellos espera a esa
+        confirmación, crea un registro nuevo y finish_upload repone el archivo.
+        """
+        db = SessionLocal()
+        try:
+            file_paths = crud.collect_unreferenced_blobs(
+                db, grace_seconds=settings.BLOB_GC_GRACE_SECONDS
+            )
+            for file_path in file_paths:
+                if os.path.exists(file_path):
+                    os.remove(file_path)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+        return len(file_paths)
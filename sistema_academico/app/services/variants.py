@@ -0,0 +1,116 @@
+import hashlib
+import random
+from typing import Dict, List
+
+from app.services.exam_generator import ExamGenerator
+
+# Conjuntos de opciones cuyo orden tiene sentido y no se permuta
+FIXED_OPTION_SETS = [
+    ['Verdadero', 'Falso'],
+]
+
+
+class ExamVariants:
+    """
+    Clase para generar variantes de un examen. Cada variante permuta el orden
+    de las preguntas y de las opciones de forma determinista a partir de su
+    código, de modo que siempre puede reconstruirse con su clave de respuestas.
+    """
+
+    @staticmethod
+    def variant_code(index: int) -> str:
+        """
+        Código de la variante: A, B, ..., Z, AA, AB, ...
+        """
+        code = ""
+        index += 1
+        while index > 0:
+            index, remainder = divmod(index - 1, 26)
+            code = chr(65 + remainder) + code
+        return code
+
+    @staticmethod
+    def variant_seed(exam_key: str, variant_code: str) -> str:
+        """
+        Semilla de una variante: depende solo del examen y del código
+        """
+        return hashlib.sha256(f"{exam_key}:{variant_code}".encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def answer_key(exam: Dict) -> List[Dict]:
+        """
+        Clave de respuestas de un examen: la letra correcta para las preguntas
+        de selección múltiple y la respuesta modelo para las abiertas
+        """
+        key = []
+        for compiled_question in ExamGenerator.compile_exam(exam)['questions']:
+            question = compiled_question['question']
+            entry = {
+                'number': compiled_question['number'],
+                'question_type': question['question_type'],
+                'points': question['points'],
+            }
+            if compiled_question['options']:
+                position = compiled_question['answer_position']
+                entry['answer'] = compiled_question['options'][position][0] if position is not None else None
+            else:
+                entry['answer'] = question.get('answer')
+            key.append(entry)
+        return key
+
+    @staticmethod
+    def build_variant(exam: Dict, variant_code: str, exam_key: str) -> Dict:
+        """
+        Construye una variante del examen. Las preguntas se permutan dentro de
+        cada tipo, conservando la disposición del examen (primero selección
+        múltiple, luego abiertas), y las opciones dentro de cada pregunta.
+        """
+        seed = ExamVariants.variant_seed(exam_key, variant_code)
+        rng = random.Random(seed)
+        questions = exam['questions']
+
+        # Bloques consecutivos de preguntas del mismo tipo
+        question_order = []
+        block = []
+        for index, question in enumerate(questions):
+            if block and questions[block[-1]]['question_type'] != question['question_type']:
+                rng.shuffle(block)
+                question_order.extend(block)
+                block = []
+            block.append(index)
+        rng.shuffle(block)
+        question_order.extend(block)
+
+        option_orders = {}
+        variant_questions = []
+        for index in question_order:
+            question = dict(questions[index])
+            options = question.get('options')
+            if options and options not in FIXED_OPTION_SETS:
+                order = list(range(len(options)))
+                rng.shuffle(order)
+                option_orders[str(index)] = order
+                question['options'] = [options[i] for i in order]
+            variant_questions.append(question)
+
+        variant = dict(exam)
+        variant.update({
+            'title': f"{exam['title']} - Variante {variant_code}",
+            'questions': variant_questions,
+            'variant_code': variant_code,
+            'seed': seed,
+            'question_order': question_order,
+            'option_orders': option_orders,
+        })
+        variant['answer_key'] = ExamVariants.answer_key(variant)
+        return variant
+
+    @staticmethod
+    def build_variants(exam: Dict, num_variants: int, exam_key: str) -> List[Dict]:
+        """
+        Construye num_variants variantes del examen (A, B, C, ...)
+        """
+        return [
+            ExamVariants.build_variant(exam, ExamVariants.variant_code(i), exam_key)
+            for i in range(num_variants)
+        ]
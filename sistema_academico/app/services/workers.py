@@ -0,0 +1,156 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Iterable, List, Optional
+
+from app.core.config import settings
+
+_process_pool: Optional[ProcessPoolExecutor] = None
+_generation_pool: Optional[ThreadPoolExecutor] = None
+_batch_pool: Optional[ThreadPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    """
+    Devuelve el pool de procesos compartido para tareas intensivas en CPU
+    (extracción de documentos, renderizado). Se crea al primer uso.
+    """
+    global _process_pool
+    with _pool_lock:
+        if _process_pool is None:
+            _process_pool = ProcessPoolExecutor(
+                max_workers=settings.PROCESS_POOL_MAX_WORKERS
+            )
+        return _process_pool
+
+
+def _reset_process_pool(broken_pool: ProcessPoolExecutor) -> None:
+    global _process_pool
+    with _pool_lock:
+        if _process_pool is broken_pool:
+            _process_pool = None
+    broken_pool.shutdown(wait=False)
+
+
+async def run_in_process(func: Callable, *args: Any) -> Any:
+    """
+    Ejecuta func(*args) en el pool de procesos sin bloquear el bucle de eventos.
+    func y sus argumentos deben poder serializarse con pickle.
+    """
+    pool = get_process_pool()
+    loop = asyncio.get_running_loop()
+    try:
+        return await loop.run_in_executor(pool, func, *args)
+    except BrokenProcessPool:
+        # Un proceso de trabajo murió (p. ej. por falta de memoria): se
+        # descarta el pool para que la siguiente tarea cree uno nuevo
+        _reset_process_pool(pool)
+        raise
+
+
+def call_in_process(func: Callable, *args: Any) -> Any:
+    """
+    Versión síncrona de run_in_process, para código que ya se ejecuta fuera
+    del bucle de eventos (tareas en segundo plano, hilos de trabajo)
+    """
+    pool = get_process_pool()
+    try:
+        return pool.submit(func, *args).result()
+    except BrokenProcessPool:
+        _reset_process_pool(pool)
+        raise
+
+
+def map_in_process(func: Callable, *iterables: Iterable) -> List[Any]:
+    """
+    Ejecuta func en paralelo en el pool de procesos con cada grupo de
+    argumentos y espera todos los resultados. Como asyncio.gather con
+    return_exceptions=True, las excepciones se retornan en la posición del
+    resultado correspondiente en lugar de lanzarse.
+    """
+    pool = get_process_pool()
+    try:
+        futures = [pool.submit(func, *args) for args in zip(*iterables)]
+    except BrokenProcessPool:
+        _reset_process_pool(pool)
+        raise
+
+    results = []
+    broken = False
+    for future in futures:
+        try:
+            results.append(future.result())
+        except Exception as e:
+            broken = broken or isinstance(e, BrokenProcessPool)
+            results.append(e)
+    if broken:
+        _reset_process_pool(pool)
+    return results
+
+
+def get_generation_pool() -> ThreadPoolExecutor:
+    """
+    Devuelve el pool acotado de hilos que ejecuta los trabajos de generación
+    de exámenes. Cada trabajo coordina sus etapas y delega el trabajo de CPU
+    al pool de procesos, de modo que nunca se bloquea el bucle de eventos.
+    """
+    global _generation_pool
+    with _pool_lock:
+        if _generation_pool is None:
+            _generation_pool = ThreadPoolExecutor(
+                max_workers=settings.GENERATION_MAX_WORKERS,
+                thread_name_prefix="exam-generation"
+            )
+        return _generation_pool
+
+
+def submit_job(func: Callable, *args: Any) -> Future:
+    """
+    Encola func(*args) en el pool de generación
+    """
+    return get_generation_pool().submit(func, *args)
+
+
+def get_batch_pool() -> ThreadPoolExecutor:
+    """
+    Devuelve el pool de hilos de los trabajos de generación por lotes,
+    separado del pool de generación para que un lote grande no demore los
+    exámenes pedidos de a uno. Por defecto ejecuta tantos trabajos a la vez
+    como CPUs, ya que cada trabajo pasa la mayor parte del tiempo esperando
+    al pool de procesos.
+    """
+    global _batch_pool
+    with _pool_lock:
+        if _batch_pool is None:
+            _batch_pool = ThreadPoolExecutor(
+                max_workers=settings.GENERATION_BATCH_MAX_WORKERS or os.cpu_count() or 1,
+                thread_name_prefix="exam-generation-batch"
+            )
+        return _batch_pool
+
+
+def submit_batch_job(func: Callable, *args: Any) -> Future:
+    """
+    Encola func(*args) en el pool de lotes
+    """
+    return get_batch_pool().submit(func, *args)
+
+
+def shutdown_pools() -> None:
+    """
+    Cierra los pools de trabajo. Se llama al apagar la aplicación.
+    """
+    global _process_pool, _generation_pool, _batch_pool
+    with _pool_lock:
+        pool, _process_pool = _process_pool, None
+        generation_pool, _generation_pool = _generation_pool, None
+        batch_pool, _batch_pool = _batch_pool, None
+    # Los trabajos en curso usan el pool de procesos: se cierran primero
+    for thread_pool in (generation_pool, batch_pool):
+        if thread_pool is not None:
+            thread_pool.shutdown(wait=True, cancel_futures=True)
+    if pool is not None:
+        pool.shutdown(wait=True)
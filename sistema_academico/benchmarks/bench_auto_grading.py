@@ -0,0 +1,105 @@
+# benchmarks/bench_auto_grading.py
+"""
+Mide la calificación automática de una sección: codificar las respuestas
+por letra y calificarlas con la clave compilada (AnswerKey) frente a un
+recorrido pregunta por pregunta con la clave por letra de cada versión.
+
+Uso (desde sistema_academico/):
+    python -m benchmarks.bench_auto_grading --students 1000 --questions 100 --variants 3
+"""
+import argparse
+import random
+import time
+from types import SimpleNamespace
+
+import numpy as np
+
+from app.services.auto_grading import AnswerKey, encode_answers, score_answers
+from app.services.variants import ExamVariants
+
+
+def generate_exam(num_questions: int, rng: random.Random) -> dict:
+    questions = []
+    for i in range(num_questions):
+        options = [f"Opción {i}.{j}" for j in range(4)]
+        questions.append({
+            "content": f"Pregunta {i}",
+            "question_type": "multiple_choice",
+            "points": 1 + i % 3,
+            "options": options,
+            "answer": rng.choice(options),
+        })
+    return {"title": "Benchmark", "questions": questions, "total_points": 0}
+
+
+def stored_exam(exam: dict, variants: list):
+    """
+    Examen con la forma de los modelos guardados que usa AnswerKey.compile
+    """
+    questions = [
+        SimpleNamespace(
+            id=index + 1,
+            question_type=question["question_type"],
+            points=question["points"],
+            options=[
+                SimpleNamespace(id=index * 10 + j, is_correct=option == question["answer"])
+                for j, option in enumerate(question["options"])
+            ],
+        )
+        for index, question in enumerate(exam["questions"])
+    ]
+    exam_variants = [
+        SimpleNamespace(
+            variant_code=variant["variant_code"],
+            question_order=variant["question_order"],
+            option_orders=variant["option_orders"],
+            answer_key=variant["answer_key"],
+        )
+        for variant in variants
+    ]
+    return SimpleNamespace(questions=questions, exam_variants=exam_variants)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--students", type=int, default=1000, help="Estudiantes de la sección")
+    parser.add_argument("--questions", type=int, default=100, help="Preguntas del examen")
+    parser.add_argument("--variants", type=int, default=3, help="Variantes del examen")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    exam = generate_exam(args.questions, rng)
+    variants = ExamVariants.build_variants(exam, args.variants, "benchmark")
+    letter_keys = {None: ExamVariants.answer_key(exam)}
+    letter_keys.update({variant["variant_code"]: variant["answer_key"] for variant in variants})
+
+    codes = [rng.choice(list(letter_keys)) for _ in range(args.students)]
+    responses = [
+        [entry["answer"] if rng.random() < 0.6 else rng.choice("ABCD") for entry in letter_keys[code]]
+        for code in codes
+    ]
+    print(f"Sección: {args.students} estudiantes, {args.questions} preguntas, {args.variants} variantes")
+
+    start = time.perf_counter()
+    key = AnswerKey.compile(stored_exam(exam, variants))
+    compiled = time.perf_counter()
+    answers = encode_answers(responses, key.num_questions)
+    encoded = time.perf_counter()
+    scored = score_answers(key, np.array([key.version_index[code] for code in codes]), answers)
+    finished = time.perf_counter()
+    print(
+        f"arreglos: compilar la clave {(compiled - start) * 1000:.1f} ms, codificar {(encoded - compiled) * 1000:.1f} ms, "
+        f"calificar {(finished - encoded) * 1000:.2f} ms"
+    )
+
+    start = time.perf_counter()
+    scores = [
+        sum(entry["points"] for entry, answer in zip(letter_keys[code], answers_row) if answer == entry["answer"])
+        for code, answers_row in zip(codes, responses)
+    ]
+    print(f"pregunta por pregunta: {(time.perf_counter() - start) * 1000:.1f} ms")
+    print(f"mismos puntajes: {np.allclose(scores, scored['score'])}")
+
+
+if __name__ == "__main__":
+    main()
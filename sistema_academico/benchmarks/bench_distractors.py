@@ -0,0 +1,54 @@
+# benchmarks/bench_distractors.py
+"""
+Mide la generación de opciones de selección múltiple con el índice de
+distractores (DistractorIndex) frente a la modificación de la respuesta
+correcta, sobre los conceptos de un corpus sintético en español.
+
+Uso (desde sistema_academico/):
+    python -m benchmarks.bench_distractors --size-mb 5 --questions 5000
+"""
+import argparse
+import random
+import time
+
+from app.services.distractors import DISTRACTOR_CONCEPT_TYPES, DistractorIndex
+from app.services.document_processor import DocumentProcessor
+from app.services.exam_generator import ExamGenerator
+from benchmarks.corpus import generate_spanish_text
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size-mb", type=float, default=2.0, help="Tamaño del corpus en MB")
+    parser.add_argument("--questions", type=int, default=5000, help="Preguntas a generar")
+    parser.add_argument("--num-options", type=int, default=4, help="Opciones por pregunta")
+    args = parser.parse_args()
+
+    text = generate_spanish_text(int(args.size_mb * 1024 * 1024))
+    concepts = DocumentProcessor.find_concepts_for_questions(DocumentProcessor.structure_content(text))
+    candidates = [concept for concept in concepts if concept["type"] in DISTRACTOR_CONCEPT_TYPES]
+    print(f"Corpus: {args.size_mb:.1f} MB, {len(candidates)} conceptos con distractores")
+
+    start = time.perf_counter()
+    index = DistractorIndex.from_concepts(concepts)
+    print(f"construir el índice: {(time.perf_counter() - start) * 1000:.1f} ms ({len(index)} textos)")
+
+    rng = random.Random(0)
+    questions = [rng.choice(candidates) for _ in range(args.questions)]
+
+    for label, distractors in (("índice de distractores", index), ("modificar la respuesta", None)):
+        start = time.perf_counter()
+        for concept in questions:
+            ExamGenerator._generate_options(
+                concept["content"], args.num_options, rng,
+                distractors=distractors, term=concept["term"], section=concept.get("section_hash")
+            )
+        elapsed = time.perf_counter() - start
+        print(
+            f"{label}: {args.questions} preguntas en {elapsed * 1000:.1f} ms "
+            f"({elapsed / args.questions * 1e6:.1f} µs por pregunta)"
+        )
+
+
+if __name__ == "__main__":
+    main()
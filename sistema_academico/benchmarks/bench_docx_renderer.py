@@ -0,0 +1,142 @@
+# benchmarks/bench_docx_renderer.py
+"""
+Compara la generación de exámenes DOCX con DocxRenderer (a través de
+ExamGenerator.generate_exam_docx) frente a la
+implementación anterior con python-docx, en documentos por segundo.
+
+Uso (desde sistema_academico/):
+    python -m benchmarks.bench_docx_renderer --questions 50 500 5000
+"""
+import argparse
+import os
+import tempfile
+import time
+from typing import Callable, Dict
+
+from docx import Document
+from docx.enum.text import WD_ALIGN_PARAGRAPH
+from docx.shared import RGBColor
+
+from app.services.docx_renderer import get_template
+from app.services.exam_generator import ExamGenerator
+from benchmarks.corpus import generate_exam
+
+
+def legacy_generate_exam_docx(exam: Dict, output_path: str, include_answers: bool = False) -> str:
+    """
+    Copia de la implementación anterior de ExamGenerator.generate_exam_docx
+    (un llamado a python-docx por párrafo y run), conservada solo como
+    referencia para este benchmark
+    """
+    doc = Document()
+
+    # Estilo del título
+    title = doc.add_heading(exam['title'], level=1)
+    title.alignment = WD_ALIGN_PARAGRAPH.CENTER
+
+    # Descripción
+    if exam.get('description'):
+        description = doc.add_paragraph(exam['description'])
+        description.alignment = WD_ALIGN_PARAGRAPH.CENTER
+
+    # Información del examen
+    info = doc.add_paragraph()
+    info.add_run('Total de puntos: ').bold = True
+    info.add_run(f"{exam['total_points']}")
+
+    # Agregar línea divisoria
+    doc.add_paragraph('_' * 50)
+
+    # Instrucciones
+    doc.add_heading('Instrucciones:', level=2)
+    doc.add_paragraph('Responda cada una de las siguientes preguntas. Lea cuidadosamente antes de responder.')
+
+    # Preguntas
+    questions = exam['questions']
+
+    for i, question in enumerate(questions, 1):
+        # Título de la pregunta
+        q_title = doc.add_paragraph()
+        q_title.add_run(f"Pregunta {i} ").bold = True
+        q_title.add_run(f"({question['points']} puntos) ").italic = True
+        q_title.add_run(f"[{question['difficulty']}] ").italic = True
+
+        # Contenido de la pregunta
+        doc.add_paragraph(question['content'])
+
+        # Opciones para preguntas de selección múltiple
+        if question['question_type'] == 'multiple_choice' and 'options' in question:
+            for j, option in enumerate(question['options']):
+                option_text = f"{chr(65 + j)}) {option}"
+                option_para = doc.add_paragraph(option_text, style='List Bullet')
+
+                # Si se incluyen respuestas, marcar la correcta
+                if include_answers and option == question.get('answer'):
+                    for run in option_para.runs:
+                        run.bold = True
+                        run.font.color.rgb = RGBColor(0, 128, 0)  # Verde
+
+        # Espacio para respuestas abiertas
+        if question['question_type'] == 'open':
+            doc.add_paragraph("Respuesta:", style='List Bullet')
+            for _ in range(4):  # Agregar líneas para respuesta
+                doc.add_paragraph("_" * 50)
+
+            # Si se incluyen respuestas, mostrar la correcta
+            if include_answers and 'answer' in question:
+                answer_para = doc.add_paragraph()
+                answer_para.add_run("Respuesta modelo: ").bold = True
+                answer_para.add_run(question['answer'])
+                for run in answer_para.runs:
+                    run.font.color.rgb = RGBColor(0, 128, 0)  # Verde
+
+        # Separador entre preguntas
+        doc.add_paragraph()
+
+    # Guardar el documento
+    doc.save(output_path)
+
+    return output_path
+
+
+def measure(render: Callable, exam: Dict, output_path: str, repeat: int) -> float:
+    """
+    Mejor tiempo de repeat ejecuciones (examen con respuestas)
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        render(exam, output_path, include_answers=True)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--questions", nargs="+", type=int, default=[50, 500, 5000], help="Preguntas por examen")
+    parser.add_argument("--repeat", type=int, default=3, help="Repeticiones por implementación")
+    parser.add_argument("--skip-legacy", action="store_true", help="No medir la implementación anterior")
+    args = parser.parse_args()
+
+    # La plantilla se compila una vez por proceso; no se incluye en la medición
+    get_template()
+
+    renderers = [("DocxRenderer", ExamGenerator.generate_exam_docx)]
+    if not args.skip_legacy:
+        renderers.append(("python-docx", legacy_generate_exam_docx))
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for num_questions in args.questions:
+            exam = generate_exam(num_questions)
+            for name, render in renderers:
+                output_path = os.path.join(tmp_dir, f"{name}_{num_questions}.docx")
+                elapsed = measure(render, exam, output_path, args.repeat)
+                size_kb = os.path.getsize(output_path) / 1024
+                print(
+                    f"{num_questions:>5} preguntas  {name:<12} {elapsed:8.3f} s  "
+                    f"{1 / elapsed:8.2f} documentos/s  {size_kb:8.0f} KB"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+# benchmarks/bench_exam_persistence.py
+"""
+Mide cuánto tarda guardar un examen generado con sus preguntas y opciones:
+inserciones masivas (crud.create_exam) frente a un objeto ORM por fila con
+flush, sobre una base SQLite temporal.
+
+Uso (desde sistema_academico/):
+    python -m benchmarks.bench_exam_persistence --questions 500
+"""
+import argparse
+import datetime
+import os
+import tempfile
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app import crud
+from app.database import Base
+from app.db import courses, users  # noqa: F401 (registra los modelos en Base)
+from app.db.courses import Exam, Question, QuestionOption
+from benchmarks.corpus import generate_exam
+
+
+def exam_record() -> dict:
+    return {
+        "title": "Benchmark",
+        "course_id": 1,
+        "exam_type": "parcial",
+        "creation_date": datetime.datetime.utcnow().isoformat(),
+    }
+
+
+def save_per_row(db, exam: dict) -> None:
+    """
+    Guardado anterior: un objeto ORM y un flush por pregunta
+    """
+    db_exam = Exam(**exam_record(), created_by_id=1)
+    db.add(db_exam)
+    db.flush()
+    for question in exam["questions"]:
+        db_question = Question(
+            exam_id=db_exam.id,
+            content=question["content"],
+            question_type=question["question_type"],
+            difficulty=question["difficulty"],
+            points=question["points"],
+        )
+        db.add(db_question)
+        db.flush()
+        for option in question.get("options") or []:
+            db.add(QuestionOption(
+                question_id=db_question.id, content=option, is_correct=option == question["answer"]
+            ))
+    db.commit()
+
+
+def save_bulk(db, exam: dict) -> None:
+    crud.create_exam(db, exam_in=exam_record(), user_id=1, questions=exam["questions"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--questions", type=int, default=500, help="Preguntas por examen")
+    parser.add_argument("--num-options", type=int, default=4, help="Opciones por pregunta")
+    parser.add_argument("--repeat", type=int, default=3, help="Repeticiones por implementación")
+    args = parser.parse_args()
+
+    exam = generate_exam(args.questions, num_options=args.num_options)
+    num_options = sum(len(question.get("options") or []) for question in exam["questions"])
+    print(f"Examen: {args.questions} preguntas, {num_options} opciones")
+
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_engine(f"sqlite:///{os.path.join(directory, 'bench.db')}")
+        Base.metadata.create_all(bind=engine)
+        Session = sessionmaker(bind=engine)
+
+        for label, save in (("inserción masiva", save_bulk), ("una fila por flush", save_per_row)):
+            best = float("inf")
+            for _ in range(args.repeat):
+                db = Session()
+                try:
+                    start = time.perf_counter()
+                    save(db, exam)
+                    best = min(best, time.perf_counter() - start)
+                finally:
+                    db.close()
+            print(f"{label}: {best * 1000:.1f} ms")
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+# benchmarks/bench_omr.py
+"""
+Mide la lectura óptica de hojas de respuestas: páginas por segundo leyendo
+un TIFF de varias páginas en un solo proceso y en el pool de procesos, con
+hojas sintéticas rellenadas, inclinadas y con ruido de escáner.
+
+Uso (desde sistema_academico/):
+    python -m benchmarks.bench_omr --pages 200 --questions 80 --dpi 200
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+from app.services.omr import OpticalMarkReader, SheetLayout, read_pages
+from app.services.workers import shutdown_pools
+
+FILL_THRESHOLD = 0.45
+WORK_DPI = 100
+
+
+def filled_sheet(layout: SheetLayout, rng: random.Random, dpi: int) -> Image.Image:
+    """
+    Hoja con una identificación y respuestas al azar, girada hasta 2 grados
+    """
+    image = layout.render("Benchmark", "Examen 1", dpi=dpi)
+    draw = ImageDraw.Draw(image)
+    scale = dpi / 25.4
+    radius = 2.0 * scale
+
+    marks = [layout.id_centers[column * 10 + rng.randrange(10)] for column in range(layout.id_digits)]
+    marks += [
+        layout.question_centers[index * layout.num_options + rng.randrange(layout.num_options)]
+        for index in range(len(layout.question_numbers))
+    ]
+    for x, y in marks:
+        draw.ellipse((x * scale - radius, y * scale - radius, x * scale + radius, y * scale + radius), fill=30)
+
+    image = image.rotate(rng.uniform(-2, 2), resample=Image.BILINEAR, fillcolor=255)
+    noise = np.random.default_rng(rng.randrange(2 ** 32)).normal(0, 15, (image.height, image.width))
+    return Image.fromarray(np.clip(np.asarray(image) + noise - 10, 0, 255).astype(np.uint8))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=200, help="Páginas del escaneo")
+    parser.add_argument("--questions", type=int, default=80, help="Preguntas de selección múltiple")
+    parser.add_argument("--dpi", type=int, default=200, help="Resolución del escaneo")
+    parser.add_argument("--pages-per-task", type=int, default=8, help="Páginas por tarea del pool")
+    args = parser.parse_args()
+
+    layout = SheetLayout(list(range(1, args.questions + 1)), num_options=4)
+    rng = random.Random(0)
+    # Pocas hojas distintas repetidas: generarlas cuesta más que leerlas
+    sheets = [filled_sheet(layout, rng, args.dpi) for _ in range(min(args.pages, 10))]
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "scan.tif")
+        pages = [sheets[i % len(sheets)] for i in range(args.pages)]
+        pages[0].save(path, save_all=True, append_images=pages[1:], compression="tiff_deflate")
+        print(f"Escaneo: {args.pages} páginas a {args.dpi} dpi, {os.path.getsize(path) / 2 ** 20:.1f} MB")
+
+        start = time.perf_counter()
+        results = read_pages(path, list(range(args.pages)), layout, FILL_THRESHOLD, WORK_DPI)
+        elapsed = time.perf_counter() - start
+        failed = sum(1 for result in results if "error" in result)
+        print(f"un proceso: {args.pages / elapsed:.1f} páginas/s ({elapsed / args.pages * 1000:.1f} ms por página, {failed} con error)")
+
+        start = time.perf_counter()
+        results = OpticalMarkReader.read_scans(
+            [("scan.tif", path)], layout, FILL_THRESHOLD, WORK_DPI, pages_per_task=args.pages_per_task
+        )
+        elapsed = time.perf_counter() - start
+        failed = sum(1 for result in results if "error" in result)
+        print(f"pool de procesos ({os.cpu_count()} CPUs): {args.pages / elapsed:.1f} páginas/s ({failed} con error)")
+    shutdown_pools()
+
+
+if __name__ == "__main__":
+    main()
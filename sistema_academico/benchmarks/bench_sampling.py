@@ -0,0 +1,69 @@
+# benchmarks/bench_sampling.py
+"""
+Mide el muestreo estratificado de preguntas (StratifiedSampler) sobre
+bancos grandes: el costo de agrupar el banco una vez y el de cada muestra.
+
+Uso (desde sistema_academico/):
+    python -m benchmarks.bench_sampling --sizes 100000 1000000
+"""
+import argparse
+import random
+import time
+from typing import Dict, List
+
+import numpy as np
+
+from app.services.sampling import StratifiedSampler
+
+QUESTION_TYPES = ["multiple_choice", "open"]
+DIFFICULTIES = ["easy", "medium", "hard"]
+
+
+def generate_bank(size: int, seed: int = 0) -> List[Dict]:
+    """
+    Banco sintético de preguntas con tipos y dificultades al azar
+    """
+    rng = random.Random(seed)
+    return [
+        {
+            "id": i,
+            "question_type": rng.choice(QUESTION_TYPES),
+            "difficulty": rng.choice(DIFFICULTIES),
+        }
+        for i in range(size)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100_000, 1_000_000], help="Tamaños del banco")
+    parser.add_argument("--num-questions", type=int, default=50, help="Preguntas por muestra")
+    parser.add_argument("--samples", type=int, default=100, help="Muestras por banco")
+    args = parser.parse_args()
+
+    distributions = {
+        "question_type": {"multiple_choice": 0.7, "open": 0.3},
+        "difficulty": {"easy": 0.3, "medium": 0.5, "hard": 0.2},
+    }
+    rng = np.random.default_rng(0)
+
+    for size in args.sizes:
+        bank = generate_bank(size)
+
+        start = time.perf_counter()
+        sampler = StratifiedSampler(bank, ["question_type", "difficulty"])
+        build = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for _ in range(args.samples):
+            sampler.sample(args.num_questions, distributions, rng)
+        per_sample = (time.perf_counter() - start) / args.samples
+
+        print(
+            f"banco de {size} preguntas: agrupar {build * 1000:.1f} ms, "
+            f"muestra de {args.num_questions} {per_sample * 1000:.3f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+# benchmarks/bench_structure_content.py
+"""
+Compara el rendimiento de DocumentProcessor.structure_content con la
+implementación anterior (varias pasadas y regex con retroceso) sobre
+textos grandes en español.
+
+Uso (desde sistema_academico/):
+    python -m benchmarks.bench_structure_content --size-mb 5
+"""
+import argparse
+import re
+import time
+from typing import Dict
+
+from app.services.document_processor import DocumentProcessor
+from benchmarks.corpus import generate_spanish_text
+
+
+def legacy_structure_content(text: str) -> Dict:
+    """
+    Copia de la implementación anterior de structure_content, conservada
+    solo como referencia para este benchmark
+    """
+    paragraphs = [p.strip() for p in text.split('\n') if p.strip()]
+    sections = {}
+    current_section = "general"
+    sections[current_section] = []
+    for paragraph in paragraphs:
+        is_title = False
+        if len(paragraph) < 100 and len(paragraph.split()) < 7 and not paragraph.strip().endswith('.'):
+            is_title = True
+        if re.match(r'^\d+(\.\d+)*\.?\s+\w+', paragraph):
+            is_title = True
+        if paragraph.isupper() and len(paragraph) > 5:
+            is_title = True
+        if is_title:
+            current_section = paragraph
+            sections[current_section] = []
+        else:
+            sections[current_section].append(paragraph)
+    definitions = {}
+    for section, paragraphs in sections.items():
+        for paragraph in paragraphs:
+            matches = re.findall(r'([^.!?]+)(?:\ses\s|\sse\sdefine\scomo\s|\sse\srefiere\sa\s)([^.!?]+)[.!?]', paragraph)
+            for match in matches:
+                term = match[0].strip()
+                definition = match[1].strip()
+                if term and definition:
+                    definitions[term] = definition
+    lists = []
+    list_items = []
+    in_list = False
+    for paragraph in paragraphs:
+        if re.match(r'^\s*(\d+\.|•|\*|\-)\s', paragraph):
+            if not in_list:
+                in_list = True
+                list_items = []
+            list_items.append(paragraph)
+        elif in_list:
+            in_list = False
+            if list_items:
+                lists.append(list_items.copy())
+    if in_list and list_items:
+        lists.append(list_items)
+    return {
+        'sections': sections,
+        'definitions': definitions,
+        'lists': lists,
+        'total_paragraphs': len(paragraphs)
+    }
+
+
+def measure(func, text: str, repeat: int) -> float:
+    """
+    Devuelve el mejor tiempo (en segundos) de repeat ejecuciones
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(text)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size-mb", type=float, default=2.0, help="Tamaño del texto en MB")
+    parser.add_argument("--repeat", type=int, default=3, help="Repeticiones por implementación")
+    parser.add_argument("--skip-legacy", action="store_true", help="No medir la implementación anterior")
+    args = parser.parse_args()
+
+    text = generate_spanish_text(int(args.size_mb * 1024 * 1024))
+    size_mb = len(text.encode("utf-8")) / (1024 * 1024)
+
+    print(f"Texto: {size_mb:.2f} MB")
+    elapsed = measure(DocumentProcessor.structure_content, text, args.repeat)
+    print(f"structure_content (una pasada): {elapsed:.3f} s, {size_mb / elapsed:.2f} MB/s")
+
+    if not args.skip_legacy:
+        elapsed = measure(legacy_structure_content, text, args.repeat)
+        print(f"structure_content (anterior):   {elapsed:.3f} s, {size_mb / elapsed:.2f} MB/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+# benchmarks/corpus.py
+"""
+Generación de corpus sintéticos en español (TXT, DOCX y PDF) de tamaño
+controlado, reproducibles a partir de una semilla.
+"""
+import os
+import random
+from typing import Dict, List
+
+WORDS = (
+    "la célula membrana proceso energía sistema función estructura organismo "
+    "análisis método población ecosistema reacción molécula proteína núcleo "
+    "información desarrollo capacidad relación ejemplo elemento principio teoría"
+).split()
+
+CONNECTORS = ["es", "se define como", "se refiere a"]
+
+# Geometría de las páginas del PDF (carta, Helvetica 10 pt)
+PDF_LINE_WIDTH = 90
+PDF_LINES_PER_PAGE = 60
+
+
+def generate_spanish_text(size_bytes: int, seed: int = 42) -> str:
+    """
+    Genera un texto sintético en español con títulos, definiciones, listas
+    y párrafos largos sin puntuación (el peor caso de la regex anterior)
+    """
+    rng = random.Random(seed)
+    parts = []
+    size = 0
+    section = 0
+
+    def words(n: int) -> str:
+        return " ".join(rng.choice(WORDS) for _ in range(n))
+
+    while size < size_bytes:
+        section += 1
+        block = [f"{section}. {words(3).capitalize()}"]
+        for _ in range(rng.randint(2, 5)):
+            block.append(
+                f"{words(3).capitalize()} {rng.choice(CONNECTORS)} {words(12)}. "
+                f"{words(15).capitalize()}."
+            )
+        block.extend(f"- {words(5)}" for _ in range(rng.randint(3, 6)))
+        # Párrafo largo sin signos de puntuación
+        block.append(words(rng.randint(150, 400)))
+        chunk = "\n".join(block) + "\n"
+        parts.append(chunk)
+        size += len(chunk.encode("utf-8"))
+    return "".join(parts)
+
+
+def generate_exam(num_questions: int, seed: int = 42, num_options: int = 4) -> Dict:
+    """
+    Genera un examen sintético con el formato de ExamGenerator: 70 % de
+    preguntas de selección múltiple y 30 % abiertas
+    """
+    rng = random.Random(seed)
+
+    def words(n: int) -> str:
+        return " ".join(rng.choice(WORDS) for _ in range(n))
+
+    questions = []
+    for i in range(num_questions):
+        answer = words(rng.randint(8, 20))
+        if i < num_questions * 0.7:
+            options = [answer] + [words(rng.randint(8, 20)) for _ in range(num_options - 1)]
+            rng.shuffle(options)
+            questions.append({
+                'content': f'¿Cuál de las siguientes opciones describe correctamente {words(2)}?',
+                'question_type': 'multiple_choice',
+                'difficulty': rng.choice(['easy', 'medium', 'hard']),
+                'points': 3.0,
+                'options': options,
+                'answer': answer
+            })
+        else:
+            questions.append({
+                'content': f'Explique el concepto de {words(2)}',
+                'question_type': 'open',
+                'difficulty': rng.choice(['easy', 'medium', 'hard']),
+                'points': 5.0,
+                'answer': answer
+            })
+
+    return {
+        'title': 'Examen de prueba',
+        'description': 'Examen sintético para benchmarks',
+        'questions': questions,
+        'total_points': sum(q['points'] for q in questions)
+    }
+
+
+def write_txt(text: str, file_path: str) -> str:
+    with open(file_path, "w", encoding="utf-8") as file:
+        file.write(text)
+    return file_path
+
+
+def write_docx(text: str, file_path: str) -> str:
+    import docx
+
+    document = docx.Document()
+    for paragraph in text.split("\n"):
+        if paragraph:
+            document.add_paragraph(paragraph)
+    document.save(file_path)
+    return file_path
+
+
+def _wrap_lines(text: str) -> List[str]:
+    lines = []
+    for paragraph in text.split("\n"):
+        line = ""
+        for word in paragraph.split():
+            if line and len(line) + 1 + len(word) > PDF_LINE_WIDTH:
+                lines.append(line)
+                line = word
+            else:
+                line = f"{line} {word}" if line else word
+        lines.append(line)
+    return lines
+
+
+def _pdf_string(line: str) -> bytes:
+    encoded = line.encode("cp1252", errors="replace")
+    return b"(" + encoded.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)") + b")"
+
+
+def write_pdf(text: str, file_path: str) -> str:
+    """
+    Escribe un PDF de texto simple sin dependencias externas: una fuente
+    Helvetica con codificación WinAnsi y un flujo de contenido por página
+    """
+    lines = _wrap_lines(text)
+    pages = [
+        lines[i:i + PDF_LINES_PER_PAGE]
+        for i in range(0, len(lines), PDF_LINES_PER_PAGE)
+    ] or [[]]
+
+    # Objetos: 1 catálogo, 2 páginas, 3 fuente, luego (página, contenido) por página
+    objects = {
+        1: b"<< /Type /Catalog /Pages 2 0 R >>",
+        3: b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>",
+    }
+    kids = []
+    for index, page_lines in enumerate(pages):
+        page_id = 4 + 2 * index
+        content_id = page_id + 1
+        kids.append(f"{page_id} 0 R".encode())
+
+        stream = b"BT /F1 10 Tf 12 TL 50 760 Td\n" + b"".join(
+            _pdf_string(line) + b" Tj T*\n" for line in page_lines
+        ) + b"ET"
+        objects[page_id] = (
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            b"/Resources << /Font << /F1 3 0 R >> >> "
+            + f"/Contents {content_id} 0 R >>".encode()
+        )
+        objects[content_id] = (
+            f"<< /Length {len(stream)} >>\nstream\n".encode() + stream + b"\nendstream"
+        )
+    objects[2] = (
+        b"<< /Type /Pages /Kids [" + b" ".join(kids) + b"] "
+        + f"/Count {len(pages)} >>".encode()
+    )
+
+    output = bytearray(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+    offsets = {}
+    for object_id in sorted(objects):
+        offsets[object_id] = len(output)
+        output += f"{object_id} 0 obj\n".encode() + objects[object_id] + b"\nendobj\n"
+
+    xref_offset = len(output)
+    size = max(objects) + 1
+    output += f"xref\n0 {size}\n".encode()
+    output += b"0000000000 65535 f \n"
+    for object_id in range(1, size):
+        output += f"{offsets[object_id]:010d} 00000 n \n".encode()
+    output += (
+        f"trailer\n<< /Size {size} /Root 1 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n".encode()
+    )
+
+    with open(file_path, "wb") as file:
+        file.write(output)
+    return file_path
+
+
+WRITERS = {
+    "txt": write_txt,
+    "docx": write_docx,
+    "pdf": write_pdf,
+}
+
+
+def generate_corpus(directory: str, formats: List[str], sizes_mb: List[float], seed: int = 42) -> List[dict]:
+    """
+    Genera un documento por cada formato y tamaño (en MB de texto) dentro de
+    directory. Retorna la descripción de cada archivo generado.
+    """
+    os.makedirs(directory, exist_ok=True)
+    corpus = []
+    for size_mb in sizes_mb:
+        text = generate_spanish_text(int(size_mb * 1024 * 1024), seed=seed)
+        for file_format in formats:
+            file_path = os.path.join(directory, f"corpus_{size_mb:g}mb.{file_format}")
+            WRITERS[file_format](text, file_path)
+            corpus.append({
+                "format": file_format,
+                "size_mb": size_mb,
+                "file_path": file_path,
+                "file_bytes": os.path.getsize(file_path),
+            })
+    return corpus
@@ -0,0 +1,192 @@
+# benchmarks/run.py
+"""
+Benchmark de extracción de documentos sobre un corpus sintético (PDF, DOCX
+y TXT). Mide, por formato y tamaño, el tiempo y el pico de memoria de:
+
+    extract    extracción del texto (DocumentProcessor)
+    structure  DocumentProcessor.structure_content
+    regex      DocumentProcessor.find_definitions sobre todos los párrafos
+    concepts   DocumentProcessor.find_concepts_for_questions
+
+Los resultados se escriben en JSON para compararlos entre commits.
+
+Uso (desde sistema_academico/):
+    python -m benchmarks.run --sizes 1 5 --output resultados.json
+    python -m benchmarks.run --baseline resultados.json --threshold 0.2
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+from app.services.document_processor import PROCESSOR_VERSION, DocumentProcessor
+from benchmarks.corpus import WRITERS, generate_corpus
+
+STAGES = ["extract", "structure", "regex", "concepts"]
+
+
+def extract_text(file_path: str) -> str:
+    """
+    Extrae el texto con el mismo extractor que usa process_document
+    """
+    extension = os.path.splitext(file_path)[1].lower()
+    if extension == ".pdf":
+        return DocumentProcessor.extract_text_from_pdf(file_path)
+    if extension in [".docx", ".doc"]:
+        return DocumentProcessor.extract_text_from_docx(file_path)
+    with open(file_path, "r", encoding="utf-8") as file:
+        return file.read()
+
+
+def find_all_definitions(text: str) -> int:
+    count = 0
+    for paragraph in DocumentProcessor.iter_paragraphs(text):
+        count += len(DocumentProcessor.find_definitions(paragraph))
+    return count
+
+
+def measure(func: Callable, arg, repeat: int) -> Tuple[float, int]:
+    """
+    Retorna el mejor tiempo de repeat ejecuciones y el pico de memoria de
+    una ejecución adicional con tracemalloc (que ralentiza la medición de
+    tiempo, por eso se hace aparte)
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(arg)
+        best = min(best, time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        func(arg)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return best, peak
+
+
+def benchmark_document(file_path: str, repeat: int) -> Dict:
+    text = extract_text(file_path)
+    processed_content = DocumentProcessor.structure_content(text)
+    text_mb = len(text.encode("utf-8")) / (1024 * 1024)
+
+    stage_args = {
+        "extract": (extract_text, file_path),
+        "structure": (DocumentProcessor.structure_content, text),
+        "regex": (find_all_definitions, text),
+        "concepts": (DocumentProcessor.find_concepts_for_questions, processed_content),
+    }
+    stages = {}
+    for stage in STAGES:
+        func, arg = stage_args[stage]
+        seconds, peak = measure(func, arg, repeat)
+        stages[stage] = {
+            "seconds": round(seconds, 6),
+            "mb_per_s": round(text_mb / seconds, 3) if seconds else None,
+            "peak_memory_bytes": peak,
+        }
+
+    return {
+        "text_bytes": len(text.encode("utf-8")),
+        "concepts": len(DocumentProcessor.find_concepts_for_questions(processed_content)),
+        "stages": stages,
+    }
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare_with_baseline(results: Dict, baseline: Dict, threshold: float) -> List[str]:
+    """
+    Compara los tiempos con una ejecución anterior. Retorna una descripción
+    por cada etapa que empeoró más de threshold (fracción)
+    """
+    previous = {
+        (entry["format"], entry["size_mb"]): entry["stages"]
+        for entry in baseline.get("results", [])
+    }
+    regressions = []
+    for entry in results["results"]:
+        base_stages = previous.get((entry["format"], entry["size_mb"]))
+        if not base_stages:
+            continue
+        for stage, current in entry["stages"].items():
+            base = base_stages.get(stage)
+            if not base or not base["seconds"]:
+                continue
+            ratio = current["seconds"] / base["seconds"]
+            if ratio > 1 + threshold:
+                regressions.append(
+                    f"{entry['format']} {entry['size_mb']:g} MB {stage}: "
+                    f"{base['seconds']:.3f} s -> {current['seconds']:.3f} s ({ratio:.2f}x)"
+                )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--formats", nargs="+", choices=sorted(WRITERS), default=sorted(WRITERS), help="Formatos del corpus")
+    parser.add_argument("--sizes", nargs="+", type=float, default=[1.0], help="Tamaños del texto en MB")
+    parser.add_argument("--repeat", type=int, default=3, help="Repeticiones por etapa (se toma la mejor)")
+    parser.add_argument("--seed", type=int, default=42, help="Semilla del corpus")
+    parser.add_argument("--corpus-dir", help="Directorio del corpus (por defecto, uno temporal)")
+    parser.add_argument("--output", help="Archivo JSON de resultados (por defecto, salida estándar)")
+    parser.add_argument("--baseline", help="Resultados JSON anteriores con los que comparar")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Empeoramiento tolerado respecto a la línea base")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        corpus = generate_corpus(args.corpus_dir or tmp_dir, args.formats, args.sizes, seed=args.seed)
+        entries = []
+        for document in corpus:
+            print(f"{document['format']} {document['size_mb']:g} MB...", file=sys.stderr)
+            entry = {key: document[key] for key in ("format", "size_mb", "file_bytes")}
+            entry.update(benchmark_document(document["file_path"], args.repeat))
+            entries.append(entry)
+
+    results = {
+        "metadata": {
+            "commit": git_commit(),
+            "processor_version": PROCESSOR_VERSION,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": datetime.utcnow().isoformat(),
+            "repeat": args.repeat,
+            "seed": args.seed,
+        },
+        "results": entries,
+    }
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            file.write(output)
+    else:
+        print(output)
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as file:
+            baseline = json.load(file)
+        regressions = compare_with_baseline(results, baseline, args.threshold)
+        for regression in regressions:
+            print(f"REGRESIÓN {regression}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
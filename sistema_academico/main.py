@@ -7,13 +7,17 @@ from sqlalchemy.orm import Session
 from starlette.responses import RedirectResponse
 
 from app.database import Base, engine, SessionLocal, get_db
+from app.db.search import create_material_search_index
 from app.core.config import settings
 from app.api import api_router
 from app import crud
 from app.schemas.users import UserCreate
+from app.services.generation import fail_stale_jobs, start_heartbeat
+from app.services.workers import shutdown_pools
 
 # Crear las tablas en la base de datos
 Base.metadata.create_all(bind=engine)
+create_material_search_index(engine)
 
 app = FastAPI(title=settings.PROJECT_NAME)
 
@@ -43,6 +47,23 @@ def create_superuser():
     finally:
         db.close()
 
+# Los trabajos de generación no sobreviven a un reinicio: se dan por
+# interrumpidos los de procesos sin señal de vida, no los de otros procesos
+# del servidor que siguen ejecutándose
+@app.on_event("startup")
+def fail_interrupted_jobs():
+    db = SessionLocal()
+    try:
+        fail_stale_jobs(db)
+    finally:
+        db.close()
+    start_heartbeat()
+
+# Cerrar los pools de trabajo al apagar la aplicación
+@app.on_event("shutdown")
+def close_worker_pools():
+    shutdown_pools()
+
 # Rutas frontend
 @app.get("/")
 async def index(request: Request):
@@ -0,0 +1,46 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.core.config import settings
+from app.database import Base
+from app.db import courses, users  # noqa: F401 (registra los modelos)
+from app.db.search import create_material_search_index
+from app.services import workers
+
+
+@pytest.fixture
+def db():
+    """
+    Sesión sobre una base de datos SQLite en memoria con todas las tablas
+    """
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    create_material_search_index(engine)
+    session = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    try:
+        yield session
+    finally:
+        session.close()
+        engine.dispose()
+
+
+@pytest.fixture
+def user(db):
+    user = users.User(email="docente@example.com", hashed_password="x", full_name="Docente", is_superuser=True)
+    db.add(user)
+    db.commit()
+    db.refresh(user)
+    return user
+
+
+@pytest.fixture
+def process_pool(monkeypatch):
+    """
+    Pool de procesos nuevo para la prueba, sin caché de extracción: los
+    procesos de trabajo se crean después de desactivarla
+    """
+    monkeypatch.setattr(settings, "EXTRACTION_CACHE_ENABLED", False)
+    workers.shutdown_pools()
+    yield
+    workers.shutdown_pools()
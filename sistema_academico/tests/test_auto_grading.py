@@ -0,0 +1,105 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from app.services.auto_grading import BLANK, INVALID, AnswerKey, encode_answers, score_answers
+
+
+def make_exam():
+    """
+    Examen de tres preguntas: dos de selección múltiple (4 y 3 opciones) y
+    una abierta. La variante A permuta preguntas y opciones; la B solo tiene
+    su clave por letra.
+    """
+    def question(question_id, question_type, points, num_options=0, correct=None):
+        options = [
+            SimpleNamespace(id=question_id * 10 + j, is_correct=j == correct)
+            for j in range(num_options)
+        ]
+        return SimpleNamespace(id=question_id, question_type=question_type, points=points, options=options)
+
+    questions = [
+        question(1, "multiple_choice", 2, num_options=4, correct=1),
+        question(2, "multiple_choice", 3, num_options=3, correct=2),
+        question(3, "open", 5),
+    ]
+    variants = [
+        SimpleNamespace(
+            variant_code="B",
+            question_order=None,
+            option_orders=None,
+            answer_key=[
+                {"number": 1, "answer": "D"},
+                {"number": 2, "answer": "A"},
+                {"number": 3, "answer": None},
+            ],
+        ),
+        SimpleNamespace(
+            variant_code="A",
+            question_order=[2, 0, 1],
+            option_orders={"0": [3, 2, 1, 0], "1": [2, 0, 1]},
+            answer_key=None,
+        ),
+    ]
+    return SimpleNamespace(questions=questions, exam_variants=variants)
+
+
+def test_compile_applies_variant_permutations():
+    key = AnswerKey.compile(make_exam())
+    assert key.versions == [None, "A", "B"]
+    assert key.correct.tolist() == [[1, 2, BLANK], [BLANK, 2, 0], [3, 0, BLANK]]
+    assert key.points.tolist() == [[2, 3, 5], [5, 2, 3], [2, 3, 5]]
+    assert key.question_index[1].tolist() == [2, 0, 1]
+    assert key.option_ids[1].tolist() == [20, 21, 22, -1]
+
+
+def test_score_shuffled_variant_and_map_to_original_order():
+    key = AnswerKey.compile(make_exam())
+    versions = np.array([key.version_index[None], key.version_index["A"]])
+    # La misma respuesta del estudiante en el examen original y en la variante A
+    answers = encode_answers([["B", "C", None], [None, "C", "A"]], key.num_questions)
+
+    scored = score_answers(key, versions, answers)
+    assert scored["correct"].tolist() == [2, 2]
+    assert scored["score"].tolist() == [5.0, 5.0]
+    assert scored["answered"].tolist() == [2, 2]
+
+    original = key.original_answers(versions, answers)
+    assert original.tolist() == [[1, 2, BLANK], [1, 2, BLANK]]
+
+
+def test_out_of_range_letters_are_invalid():
+    key = AnswerKey.compile(make_exam())
+    versions = np.array([key.version_index[None], key.version_index["A"]])
+    # D no es una opción de la pregunta 2 (tiene 3), Z no es opción de
+    # ninguna, la pregunta abierta no tiene opciones y '?' no es una letra
+    answers = encode_answers([["Z", "D", "A"], ["A", "?", "D"]], key.num_questions)
+    assert answers.tolist() == [[25, 3, 0], [0, INVALID, 3]]
+
+    scored = score_answers(key, versions, answers)
+    assert scored["correct"].tolist() == [0, 0]
+    assert scored["score"].tolist() == [0.0, 0.0]
+
+    original = key.original_answers(versions, answers)
+    assert original.tolist() == [[INVALID, INVALID, INVALID], [INVALID, INVALID, INVALID]]
+
+
+def test_too_many_answers_are_rejected():
+    key = AnswerKey.compile(make_exam())
+    with pytest.raises(ValueError):
+        encode_answers([["A", "B"], ["A", "B", "C", "D"]], key.num_questions)
+
+
+def test_variant_without_permutations_uses_letter_key():
+    key = AnswerKey.compile(make_exam())
+    versions = np.array([key.version_index["B"]] * 2)
+    answers = encode_answers([["D", "A", "-"], ["B", "C"]], key.num_questions)
+
+    scored = score_answers(key, versions, answers)
+    assert scored["correct"].tolist() == [2, 0]
+    assert scored["score"].tolist() == [5.0, 0.0]
+
+    # Sin permutaciones, la variante se toma en el orden del examen original
+    original = key.original_answers(versions, answers)
+    assert original.tolist() == [[3, 0, BLANK], [1, 2, BLANK]]
@@ -0,0 +1,60 @@
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from app import crud
+from app.schemas.courses import CourseCreate, MaterialCreate
+from app.schemas.exams import ExamConfig
+from app.services import generation, ingestion
+from app.services.generation import ExamGenerationPipeline
+
+NOTES = """Biología celular
+La célula es la unidad básica de los seres vivos.
+El núcleo es el orgánulo que guarda el material genético.
+"""
+
+
+@pytest.fixture(autouse=True)
+def batch_env(tmp_path, monkeypatch, db, process_pool):
+    monkeypatch.setattr(ingestion.distractor_cache, "directory", str(tmp_path / "distractors"))
+    monkeypatch.setattr(generation, "SessionLocal", sessionmaker(bind=db.get_bind()))
+    # Sin hilo de señales de vida sobre la base de datos de la aplicación
+    monkeypatch.setattr(generation, "start_heartbeat", lambda: None)
+
+
+def test_batch_ingests_shared_materials_once_and_queues_every_course(db, user, tmp_path, monkeypatch):
+    shared = tmp_path / "compartido.txt"
+    shared.write_text(NOTES, encoding="utf-8")
+    own = tmp_path / "propio.txt"
+    own.write_text(NOTES.replace("célula", "neurona"), encoding="utf-8")
+    courses = [crud.create_course(db, CourseCreate(name=f"Biología {i}"), user.id) for i in range(3)]
+    materials = [
+        crud.create_material(db, MaterialCreate(title="Apuntes", file_type="txt"), user.id, str(shared), course.id)
+        for course in courses
+    ]
+    materials.append(
+        crud.create_material(db, MaterialCreate(title="Extra", file_type="txt"), user.id, str(own), courses[0].id)
+    )
+
+    extracted = []
+
+    def map_in_process(func, file_paths, content_hashes):
+        extracted.extend(file_paths)
+        return [func(file_path, content_hash) for file_path, content_hash in zip(file_paths, content_hashes)]
+
+    queued = []
+    monkeypatch.setattr(ingestion, "map_in_process", map_in_process)
+    monkeypatch.setattr(generation, "submit_batch_job", lambda func, job_id: queued.append(job_id))
+
+    config = ExamConfig(title="Parcial", exam_type="parcial", seed=1)
+    batch_id, jobs = ExamGenerationPipeline.create_batch(db, [course.id for course in courses], config, user.id)
+    ExamGenerationPipeline.run_batch([job.id for job in jobs])
+
+    assert sorted(extracted) == sorted([str(shared), str(own)])
+    assert queued == [job.id for job in jobs]
+    db.expire_all()
+    assert {material.ingestion_status for material in materials} == {"ready"}
+
+    jobs = crud.get_generation_jobs_by_batch(db, batch_id=batch_id)
+    summary = ExamGenerationPipeline.batch_summary(batch_id, jobs)
+    assert summary["total"] == 3 and summary["status_counts"] == {"queued": 3}
+    assert sorted(job.course_id for job in summary["jobs"]) == sorted(course.id for course in courses)
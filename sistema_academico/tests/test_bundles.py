@@ -0,0 +1,34 @@
+import io
+import os
+import zipfile
+
+from app.services.bundles import stream_zip
+
+
+def test_streamed_zip_is_valid_and_starts_before_reading_later_files(tmp_path):
+    contents = {
+        "examen.docx": os.urandom(300 * 1024),
+        "clave_respuestas.docx": b"Clave " * 5000,
+        "vacío.txt": b"",
+    }
+    for name, data in contents.items():
+        (tmp_path / name).write_bytes(data)
+
+    requested = []
+
+    def files():
+        for name in contents:
+            requested.append(name)
+            yield f"parcial/{name}", str(tmp_path / name)
+
+    chunks = stream_zip(files(), chunk_size=16 * 1024)
+    first = next(chunks)
+    assert first.startswith(b"PK\x03\x04") and requested == ["examen.docx"]
+    data = first + b"".join(chunks)
+
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        assert archive.testzip() is None
+        assert archive.namelist() == [f"parcial/{name}" for name in contents]
+        for name, expected in contents.items():
+            assert archive.read(f"parcial/{name}") == expected
+            assert archive.getinfo(f"parcial/{name}").compress_type == zipfile.ZIP_DEFLATED
@@ -0,0 +1,56 @@
+import os
+
+from app.services import cache
+from app.services.cache import DiskCache
+
+
+def count_walks(monkeypatch):
+    calls = []
+    walk = os.walk
+
+    def counting_walk(*args, **kwargs):
+        calls.append(args)
+        return walk(*args, **kwargs)
+
+    monkeypatch.setattr(cache.os, "walk", counting_walk)
+    return calls
+
+
+def test_set_within_limit_scans_only_once(tmp_path, monkeypatch):
+    calls = count_walks(monkeypatch)
+    disk_cache = DiskCache(str(tmp_path), max_bytes=1000)
+    for i in range(20):
+        disk_cache.set(f"key{i:02d}", b"x" * 10)
+    assert len(calls) == 1
+    assert disk_cache.get("key05") == b"x" * 10
+
+
+def test_evicts_least_recently_used_when_over_limit(tmp_path):
+    disk_cache = DiskCache(str(tmp_path), max_bytes=250)
+    for i in range(3):
+        disk_cache.set(f"key{i}", b"x" * 100)
+        path = disk_cache.get_path(f"key{i}")
+        os.utime(path, (i, i))
+    assert disk_cache.get("key0") is None
+    assert disk_cache.get("key1") == b"x" * 100
+    assert disk_cache.get("key2") == b"x" * 100
+
+
+def test_overwrite_counts_only_the_difference(tmp_path, monkeypatch):
+    calls = count_walks(monkeypatch)
+    disk_cache = DiskCache(str(tmp_path), max_bytes=150)
+    for _ in range(10):
+        disk_cache.set("same", b"x" * 100)
+    assert len(calls) == 1
+    assert disk_cache.get("same") == b"x" * 100
+
+
+def test_eviction_skips_files_being_written(tmp_path):
+    disk_cache = DiskCache(str(tmp_path), max_bytes=150)
+    in_flight = tmp_path / "ke" / "other.tmp"
+    in_flight.parent.mkdir()
+    in_flight.write_bytes(b"y" * 1000)
+    disk_cache.set("key0", b"x" * 100)
+    disk_cache.set("key1", b"x" * 100)
+    assert in_flight.exists()
+    assert disk_cache.get("key1") == b"x" * 100
@@ -0,0 +1,120 @@
+import numpy as np
+
+from app import crud
+from app.db.courses import Concept, ConceptStat, Question
+from app.schemas.courses import CourseCreate, MaterialCreate
+from app.services.auto_grading import AnswerKey
+from app.services.calibration import DifficultyCalibration, count_hits, difficulty_labels
+from app.services.document_processor import PROCESSOR_VERSION, DocumentProcessor
+from app.services.exam_generator import ExamGenerator
+from app.services.item_analysis import ItemAnalysis
+
+CELL_SECTION = """Biología celular
+La célula es la unidad básica de los seres vivos.
+El núcleo es el orgánulo que guarda el material genético.
+La membrana es la capa que separa la célula de su entorno.
+"""
+
+PLANT_SECTION = """Fotosíntesis
+La clorofila es el pigmento verde que capta la luz.
+El estoma es el poro por donde la hoja intercambia gases.
+La glucosa es el azúcar que produce la planta.
+"""
+
+CHANGED_PLANT_SECTION = """Fotosíntesis
+La clorofila es el pigmento que absorbe la luz roja y azul.
+El estoma es la abertura que regula la transpiración.
+"""
+
+
+def ingest(db, material, text):
+    processed = DocumentProcessor.structure_content(text)
+    crud.save_material_content(db, material, {
+        "content_hash": DocumentProcessor.fingerprint(text),
+        "processor_version": PROCESSOR_VERSION,
+        "raw_text": text,
+        "processed_content": processed,
+        "concepts": DocumentProcessor.find_concepts_for_questions(processed),
+    })
+
+
+def test_difficulty_labels_thresholds():
+    labels = difficulty_labels(np.array([1.0, 0.7, 0.69, 0.4, 0.39, 0.0]))
+    assert labels.tolist() == ["easy", "easy", "medium", "medium", "hard", "hard"]
+
+
+def test_count_hits_skips_unknown_concepts_and_mismatched_rows():
+    key = [
+        {"question_id": 1, "concept_id": 10, "correct": 0},
+        {"question_id": 2, "concept_id": 11, "correct": 2},
+        {"question_id": 3, "concept_id": None, "correct": None},
+    ]
+    counts = count_hits([[0, 2, -1], [1, 2, -1]], key, known_concepts={10})
+    assert counts["question_ids"].tolist() == [1, 2]
+    assert counts["concept_ids"].tolist() == [10, 0]
+    assert counts["correct"].tolist() == [1, 2]
+    assert count_hits([[0, 2]], key) is None
+
+
+def test_watermark_is_compare_and_set(db):
+    assert crud.get_calibration_watermark(db, "test") == 0
+    assert crud.advance_calibration_watermark(db, "test", 0, 5)
+    db.commit()
+    # Otra ejecución que leyó la marca anterior no puede avanzarla
+    assert not crud.advance_calibration_watermark(db, "test", 0, 8)
+    assert crud.advance_calibration_watermark(db, "test", 5, 8)
+    db.commit()
+    assert crud.get_calibration_watermark(db, "test") == 8
+
+
+def test_calibration_after_reingesting_a_changed_section(db, user):
+    # 1. Procesar el material
+    course = crud.create_course(db, CourseCreate(name="Biología"), user.id)
+    material = crud.create_material(db, MaterialCreate(title="Apuntes", file_type="txt"), user.id, "apuntes.txt", course.id)
+    ingest(db, material, CELL_SECTION + PLANT_SECTION)
+    concepts = crud.get_concepts_by_materials(db, material_ids=[material.id])
+    plant_hash = DocumentProcessor.section_fingerprints(DocumentProcessor.structure_content(PLANT_SECTION))["Fotosíntesis"]
+    plant_ids = {concept["id"] for concept in concepts if concept["section_hash"] == plant_hash}
+    assert plant_ids and len(plant_ids) < len(concepts)
+
+    # 2. Generar y guardar un examen con todos los conceptos
+    generated = ExamGenerator.create_exam_from_selected_concepts(concepts, {
+        "num_questions": 100, "question_type_distribution": {"multiple_choice": 1.0}, "seed": 1,
+    })
+    exam = crud.create_exam(db, {
+        "title": "Parcial", "course_id": course.id, "exam_type": "parcial", "creation_date": "2026-01-01",
+    }, user.id, questions=generated["questions"])
+
+    # 3. Calificar: todos aciertan todas las preguntas
+    exam = crud.get_exam_with_questions(db, exam_id=exam.id)
+    key = AnswerKey.compile(exam)
+    answers = np.tile(key.correct[0], (5, 1))
+    ItemAnalysis.record(db, exam.id, key, answers, [
+        {"exam_id": exam.id, "enrollment_id": i, "student_id": i, "variant_code": None, "correct": 0, "score": 0.0}
+        for i in range(len(answers))
+    ])
+    db.commit()
+
+    plant_questions = {question.id for question in exam.questions if question.concept_id in plant_ids}
+    kept_ids = {question.concept_id for question in exam.questions if question.concept_id not in plant_ids}
+    assert plant_questions and kept_ids
+
+    # 4. Cambiar una sección y volver a procesar el material. SQLite puede
+    # reutilizar los ids eliminados para los conceptos nuevos, así que las
+    # preguntas de la sección cambiada deben quedar sin concepto
+    ingest(db, material, CELL_SECTION + CHANGED_PLANT_SECTION)
+    assert not db.query(Concept).filter(Concept.section_hash == plant_hash).count()
+    assert db.query(Question).filter(Question.id.in_(plant_questions), Question.concept_id.isnot(None)).count() == 0
+
+    # 5. Calibrar: los aciertos de las preguntas de la sección cambiada no
+    # crean estadísticas de conceptos que ya no existen
+    result = DifficultyCalibration.run(db, batch_size=2, min_responses=1)
+    assert result["status"] == "completed"
+    assert result["responses"] == 5
+
+    stats = {stat.concept_id: stat for stat in db.query(ConceptStat)}
+    existing = {row[0] for row in db.query(Concept.id)}
+    assert stats and set(stats) <= existing
+    assert set(stats) == kept_ids
+    assert all(stat.responses == stat.correct for stat in stats.values())
+    assert {row[0] for row in db.query(Concept.difficulty).filter(Concept.id.in_(kept_ids))} == {"easy"}
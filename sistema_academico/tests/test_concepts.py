@@ -0,0 +1,166 @@
+import os
+import random
+
+from app import crud
+from app.db.courses import Concept
+from app.schemas.courses import MaterialCreate
+from app.services.cache import hash_file
+from app.services.document_processor import PROCESSOR_VERSION, DocumentProcessor
+from app.services.ingestion import MaterialIngestion
+
+
+class ScriptedRandom:
+    """
+    Generador cuyos puntos de muestreo (random()) son los indicados
+    """
+
+    def __init__(self, pivots):
+        self.pivots = list(pivots)
+        self.sample = random.Random(0).sample
+
+    def random(self):
+        return self.pivots.pop(0)
+
+
+def create_material(db, user, concepts):
+    """
+    Material con un concepto por (dificultad, sample_key)
+    """
+    material = crud.create_material(db, MaterialCreate(title="Apuntes", file_type="txt"), user.id, "apuntes.txt")
+    for position, (difficulty, sample_key) in enumerate(concepts):
+        db.add(Concept(
+            material_id=material.id, concept_type="definition", term=f"Término {position}",
+            content=f"Contenido {position}", difficulty=difficulty, position=position, sample_key=sample_key,
+        ))
+    db.commit()
+    return material
+
+
+def test_sampling_wraps_around_the_end_of_the_index(db, user):
+    keys = [0.05, 0.15, 0.25, 0.35, 0.45, 0.55, 0.65, 0.75]
+    material = create_material(db, user, [("medium", key) for key in keys] + [("easy", 0.99)])
+
+    # Un punto después de la última clave da la vuelta a la primera; uno que
+    # repite concepto se descarta y se prueba otro
+    concepts = crud.sample_concepts(
+        db, material_ids=[material.id], difficulty="medium", limit=3, rng=ScriptedRandom([0.9, 0.1, 0.12, 0.6])
+    )
+    assert [concept["term"] for concept in concepts] == ["Término 0", "Término 1", "Término 6"]
+    assert {concept["difficulty"] for concept in concepts} == {"medium"}
+
+
+def test_sampling_splits_the_quota_across_materials(db, user):
+    first = create_material(db, user, [("hard", i / 20) for i in range(20)])
+    second = create_material(db, user, [("hard", i / 10) for i in range(10)] + [("easy", 0.5)])
+    material_ids = [first.id, second.id]
+    assert crud.count_concepts_by_difficulty(db, material_ids=material_ids) == {"hard": 30, "easy": 1}
+
+    rng = random.Random(3)
+    concepts = crud.sample_concepts(db, material_ids=material_ids, difficulty="hard", limit=12, rng=rng)
+    assert len(concepts) == 12 and len({concept["id"] for concept in concepts}) == 12
+    assert {concept["material_id"] for concept in concepts} <= set(material_ids)
+
+    # Con la misma semilla la muestra es la misma
+    again = crud.sample_concepts(db, material_ids=material_ids, difficulty="hard", limit=12, rng=random.Random(3))
+    assert [concept["id"] for concept in again] == [concept["id"] for concept in concepts]
+
+    # Si se piden más conceptos de los que hay, se devuelven todos
+    easy = crud.sample_concepts(db, material_ids=material_ids, difficulty="easy", limit=5, rng=rng)
+    assert [concept["term"] for concept in easy] == ["Término 10"]
+
+
+CELLS = """Biología celular
+La célula es la unidad básica de los seres vivos.
+El núcleo es el orgánulo que guarda el material genético.
+"""
+
+PLANTS = """Fotosíntesis
+La clorofila es el pigmento verde que capta la luz.
+El estoma es el poro por donde la hoja intercambia gases.
+"""
+
+CHANGED_PLANTS = """Fotosíntesis
+La clorofila es el pigmento que absorbe la luz roja y azul.
+"""
+
+ANIMALS = """Zoología
+El vertebrado es el animal que tiene columna vertebral.
+"""
+
+
+def concepts_for(text):
+    return DocumentProcessor.find_concepts_for_questions(DocumentProcessor.structure_content(text))
+
+
+def bank(db, material):
+    return {
+        (concept["section_hash"], concept["type"], concept["term"]): concept
+        for concept in crud.get_concepts_by_materials(db, material_ids=[material.id])
+    }
+
+
+def test_reprocessing_keeps_the_concepts_of_unchanged_sections(db, user):
+    material = create_material(db, user, [])
+    crud.sync_material_concepts(db, material.id, concepts_for(CELLS + PLANTS))
+    db.commit()
+    before = bank(db, material)
+    cells_hash = DocumentProcessor.section_fingerprints(DocumentProcessor.structure_content(CELLS))["Biología celular"]
+    kept = {key: concept for key, concept in before.items() if key[0] == cells_hash}
+    assert kept and len(kept) < len(before)
+
+    # La calibración cambió la dificultad de un concepto que se conserva
+    calibrated = next(iter(kept.values()))
+    crud.set_difficulties(db, Concept, [{"id": calibrated["id"], "difficulty": "hard"}])
+    db.commit()
+
+    # Se modifica una sección y se agrega otra al principio
+    result = crud.sync_material_concepts(db, material.id, concepts_for(ANIMALS + CELLS + CHANGED_PLANTS))
+    db.commit()
+    after = bank(db, material)
+
+    assert result == {
+        "kept": len(kept),
+        "removed": len(before) - len(kept),
+        "added": len(after) - len(kept),
+    }
+    for key, concept in kept.items():
+        assert after[key]["id"] == concept["id"]
+        assert after[key]["position"] > concept["position"]
+    assert after[next(key for key in kept if kept[key] is calibrated)]["difficulty"] == "hard"
+    assert not set(before) - set(kept) & set(after)
+    assert [concept["position"] for concept in crud.get_concepts_by_materials(db, material_ids=[material.id])] == (
+        list(range(len(after)))
+    )
+
+    # Sin conservar, se reemplazan todos
+    result = crud.sync_material_concepts(
+        db, material.id, concepts_for(ANIMALS + CELLS + CHANGED_PLANTS), keep_unchanged=False
+    )
+    assert result == {"kept": 0, "removed": len(after), "added": len(after)}
+
+
+def test_change_detection_compares_hash_only_when_mtime_or_size_differ(db, user, tmp_path):
+    path = tmp_path / "apuntes.txt"
+    path.write_text(CELLS, encoding="utf-8")
+    material = crud.create_material(db, MaterialCreate(title="Apuntes", file_type="txt"), user.id, str(path))
+    assert MaterialIngestion.has_changed(db, material)
+
+    stat = os.stat(path)
+    crud.save_material_content(db, material, {
+        "content_hash": hash_file(str(path)),
+        "file_mtime": stat.st_mtime,
+        "file_size": stat.st_size,
+        "processor_version": PROCESSOR_VERSION,
+        "raw_text": CELLS,
+        "processed_content": DocumentProcessor.structure_content(CELLS),
+        "concepts": concepts_for(CELLS),
+    })
+    assert not MaterialIngestion.has_changed(db, material)
+
+    # El mismo contenido con otra fecha no cuenta como cambio y actualiza la fecha
+    os.utime(path, (stat.st_atime, stat.st_mtime + 60))
+    assert not MaterialIngestion.has_changed(db, material)
+    assert crud.get_material_content(db, material_id=material.id).file_mtime == stat.st_mtime + 60
+
+    path.write_text(CELLS + PLANTS, encoding="utf-8")
+    assert MaterialIngestion.has_changed(db, material)
@@ -0,0 +1,34 @@
+import pickle
+import random
+
+from app.services.distractors import DistractorIndex, length_bucket
+
+
+def make_concepts():
+    return [
+        {"type": "definition", "term": f"término {i}", "content": f"definición número {i} del término", "section_hash": "s1"}
+        for i in range(20)
+    ] + [
+        {"type": "list", "term": "lista", "content": "uno, dos, tres"},
+        {"type": "section_content", "term": "Sección", "content": "texto largo " * 10, "length_bucket": 4},
+    ]
+
+
+def test_entries_are_independent_of_concept_order():
+    concepts = make_concepts()
+    shuffled = list(concepts)
+    random.Random(0).shuffle(shuffled)
+    entries = DistractorIndex.entries(concepts)
+    assert entries == DistractorIndex.entries(shuffled)
+    assert len(entries) == 21
+    assert all(entry[2] == length_bucket(entry[1]) for entry in entries if entry[0] != "Sección")
+
+
+def test_index_survives_pickling_and_skips_same_term():
+    index = pickle.loads(pickle.dumps(DistractorIndex(DistractorIndex.entries(make_concepts()))))
+    assert len(index) == 21
+    distractors = index.distractors(
+        "definición número 3 del término", "Término 3", 3, section="s1", rng=random.Random(1)
+    )
+    assert len(distractors) == 3
+    assert "definición número 3 del término" not in distractors
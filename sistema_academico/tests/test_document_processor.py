@@ -0,0 +1,33 @@
+import asyncio
+
+import docx
+import pytest
+
+from app.services.document_processor import DocumentProcessingError, DocumentProcessor
+
+
+def test_documents_are_processed_in_order_with_per_file_errors(tmp_path, process_pool):
+    notes = tmp_path / "apuntes.txt"
+    notes.write_text("Biología\nLa célula es la unidad básica de los seres vivos.\n", encoding="utf-8")
+    broken = tmp_path / "roto.pdf"
+    broken.write_bytes(b"esto no es un PDF")
+    document = docx.Document()
+    document.add_paragraph("Química")
+    document.add_paragraph("El átomo es la partícula más pequeña de un elemento.")
+    document.save(tmp_path / "guia.docx")
+
+    paths = [str(notes), str(broken), str(tmp_path / "guia.docx")]
+    results = asyncio.run(DocumentProcessor.process_documents_async(paths))
+
+    assert [result["file_path"] for result in results] == paths
+    assert results[0]["error"] is None and "célula" in results[0]["raw_text"]
+    assert results[1]["error"] and results[1]["processed_content"] is None
+    assert results[2]["error"] is None and "átomo" in results[2]["raw_text"]
+    assert results[2]["content_hash"]
+
+
+def test_unreadable_pdf_raises_instead_of_returning_empty_text(tmp_path):
+    broken = tmp_path / "roto.pdf"
+    broken.write_bytes(b"esto no es un PDF")
+    with pytest.raises(DocumentProcessingError):
+        DocumentProcessor.extract_text_from_pdf(str(broken))
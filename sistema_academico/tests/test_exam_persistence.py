@@ -0,0 +1,69 @@
+import pytest
+from sqlalchemy import event
+
+from app import crud
+from app.db.courses import Exam, Question, QuestionOption
+from app.schemas.courses import CourseCreate
+
+EXAM_IN = {"title": "Parcial", "exam_type": "parcial", "creation_date": "2026-01-01"}
+
+
+def make_questions(count):
+    questions = []
+    for q in range(count):
+        if q % 5 == 4:
+            questions.append({
+                "question_type": "open", "content": f"Explique {q}", "points": 5, "answer": f"Respuesta {q}",
+            })
+        else:
+            options = [f"Opción {q}.{j}" for j in range(4)]
+            questions.append({
+                "question_type": "multiple_choice", "content": f"Pregunta {q}", "points": 1,
+                "difficulty": "medium", "options": options, "answer": options[q % 4],
+            })
+    return questions
+
+
+def test_questions_and_options_are_stored_with_one_insert_each(db, user):
+    course = crud.create_course(db, CourseCreate(name="Biología"), user.id)
+    questions = make_questions(200)
+    variants = [{
+        "variant_code": "A", "file_path": "a.docx", "answer_key_path": "a_answers.docx", "seed": "s",
+        "question_order": list(range(200)), "option_orders": {}, "answer_key": [],
+    }]
+
+    inserts = []
+
+    def count_inserts(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith(("INSERT INTO questions", "INSERT INTO question_options")):
+            inserts.append(statement.split()[2])
+
+    engine = db.get_bind()
+    event.listen(engine, "before_cursor_execute", count_inserts)
+    try:
+        exam = crud.create_exam(db, {**EXAM_IN, "course_id": course.id}, user.id, variants=variants, questions=questions)
+    finally:
+        event.remove(engine, "before_cursor_execute", count_inserts)
+    assert inserts == ["questions", "question_options"]
+
+    db.expire_all()
+    stored = crud.get_exam_with_questions(db, exam_id=exam.id)
+    assert [variant.variant_code for variant in stored.exam_variants] == ["A"]
+    assert [question.position for question in stored.questions] == list(range(200))
+    for question, question_in in zip(stored.questions, questions):
+        assert question.content == question_in["content"]
+        assert question.question_type == question_in["question_type"]
+        assert [option.content for option in question.options] == question_in.get("options", [])
+        assert [option.content for option in question.options if option.is_correct] == (
+            [question_in["answer"]] if question_in.get("options") else []
+        )
+
+
+def test_a_failed_exam_leaves_nothing_behind(db, user):
+    course = crud.create_course(db, CourseCreate(name="Biología"), user.id)
+    questions = make_questions(10)
+    del questions[7]["content"]
+    with pytest.raises(KeyError):
+        crud.create_exam(db, {**EXAM_IN, "course_id": course.id}, user.id, questions=questions)
+    db.rollback()
+    assert db.query(Exam).count() == db.query(Question).count() == db.query(QuestionOption).count() == 0
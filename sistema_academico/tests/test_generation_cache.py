@@ -0,0 +1,85 @@
+from app import crud
+from app.db.courses import Concept
+from app.schemas.courses import MaterialCreate
+from app.schemas.exams import ExamConfig
+from app.services.document_processor import PROCESSOR_VERSION, DocumentProcessor
+from app.services.generation import exam_cache_key
+
+TEXT = """Fotosíntesis
+La clorofila es el pigmento verde que capta la luz.
+El estoma es el poro por donde la hoja intercambia gases.
+
+Respiración
+La mitocondria es el orgánulo que produce energía.
+"""
+
+CHANGED_TEXT = TEXT.replace("produce energía", "obtiene energía de la glucosa")
+
+
+def ingest(db, material, text):
+    processed = DocumentProcessor.structure_content(text)
+    crud.save_material_content(db, material, {
+        "content_hash": DocumentProcessor.fingerprint(text),
+        "processor_version": PROCESSOR_VERSION,
+        "raw_text": text,
+        "processed_content": processed,
+        "concepts": DocumentProcessor.find_concepts_for_questions(processed),
+    })
+
+
+def create_material(db, user, tmp_path, name):
+    path = tmp_path / name
+    path.write_text(TEXT, encoding="utf-8")
+    return crud.create_material(db, MaterialCreate(title=name, file_type="txt"), user.id, str(path))
+
+
+def sample_keys(db, material):
+    return {
+        (concept.section_hash, concept.term): concept.sample_key
+        for concept in db.query(Concept).filter(Concept.material_id == material.id)
+    }
+
+
+def test_sample_keys_depend_only_on_section_and_term(db, user, tmp_path):
+    first = create_material(db, user, tmp_path, "a.txt")
+    second = create_material(db, user, tmp_path, "b.txt")
+    ingest(db, first, TEXT)
+    ingest(db, second, TEXT)
+    keys = sample_keys(db, first)
+    assert keys and keys == sample_keys(db, second)
+    assert all(0 <= key < 1 for key in keys.values())
+
+    # Al reemplazar todos los conceptos, las claves se vuelven a calcular igual
+    concepts = crud.get_concepts_by_materials(db, material_ids=[first.id])
+    crud.sync_material_concepts(db, first.id, concepts, keep_unchanged=False)
+    assert sample_keys(db, first) == keys
+
+
+def test_cache_key_changes_with_the_concept_bank(db, user, tmp_path):
+    material = create_material(db, user, tmp_path, "apuntes.txt")
+    ingest(db, material, TEXT)
+    config = ExamConfig(title="Parcial", exam_type="parcial", seed=7)
+    key = exam_cache_key([material], config)
+    assert key and exam_cache_key([material], config) == key
+
+    # Recalibrar sin cambiar ninguna dificultad no invalida la caché
+    concept = db.query(Concept).filter(Concept.material_id == material.id).first()
+    assert crud.set_difficulties(db, Concept, [{"id": concept.id, "difficulty": concept.difficulty}]) == 0
+    db.commit()
+    db.refresh(material)
+    assert exam_cache_key([material], config) == key
+
+    # Una dificultad recalibrada sí
+    new_difficulty = "hard" if concept.difficulty != "hard" else "easy"
+    assert crud.set_difficulties(db, Concept, [{"id": concept.id, "difficulty": new_difficulty}]) == 1
+    db.commit()
+    db.refresh(material)
+    recalibrated = exam_cache_key([material], config)
+    assert recalibrated != key
+
+    # Y también volver a procesar el material con una sección distinta
+    ingest(db, material, CHANGED_TEXT)
+    db.commit()
+    db.refresh(material)
+    assert material.concepts_version == 2
+    assert exam_cache_key([material], config) not in (key, recalibrated)
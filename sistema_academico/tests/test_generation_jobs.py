@@ -0,0 +1,34 @@
+import datetime
+
+from app import crud
+from app.db.courses import GenerationJob
+from app.schemas.courses import CourseCreate
+from app.services.generation import fail_stale_jobs
+
+STAGES = ["ingest", "select", "render"]
+
+
+def create_job(db, user, course, worker_id, status="queued", minutes_ago=60):
+    job = crud.create_generation_job(db, course.id, {"seed": 1}, user.id, STAGES, worker_id=worker_id)
+    heartbeat_at = datetime.datetime.utcnow() - datetime.timedelta(minutes=minutes_ago)
+    return crud.update_generation_job(db, job, {"status": status, "heartbeat_at": heartbeat_at.isoformat()})
+
+
+def test_only_jobs_of_silent_workers_are_failed(db, user):
+    course = crud.create_course(db, CourseCreate(name="Biología"), user.id)
+    alive = [create_job(db, user, course, "vivo"), create_job(db, user, course, "vivo", status="running")]
+    dead = [create_job(db, user, course, "caido"), create_job(db, user, course, "caido", status="running")]
+    finished = create_job(db, user, course, "caido", status="completed")
+    recent = create_job(db, user, course, "otro", status="running", minutes_ago=0)
+
+    # El proceso vivo renueva la señal de sus trabajos pendientes
+    assert crud.touch_generation_jobs(db, worker_id="vivo") == 2
+    assert fail_stale_jobs(db) == 2
+
+    db.expire_all()
+    statuses = {job.id: (job.status, job.error) for job in db.query(GenerationJob)}
+    assert [statuses[job.id][0] for job in alive] == ["queued", "running"]
+    assert all(statuses[job.id][0] == "failed" and statuses[job.id][1] for job in dead)
+    assert statuses[finished.id] == ("completed", None)
+    assert statuses[recent.id][0] == "running"
+    assert crud.count_pending_generation_jobs(db) == 3
@@ -0,0 +1,103 @@
+import io
+
+import pytest
+from openpyxl import Workbook
+
+from app import crud
+from app.db.courses import Enrollment, Grade, Section, Student
+from app.schemas.courses import CourseCreate
+from app.services.grade_import import GradeImport, GradeImportError
+
+
+def read(data: bytes, filename: str):
+    return list(GradeImport.read_rows(io.BytesIO(data), filename))
+
+
+def xlsx(rows) -> bytes:
+    workbook = Workbook()
+    for row in rows:
+        workbook.active.append(row)
+    output = io.BytesIO()
+    workbook.save(output)
+    return output.getvalue()
+
+
+def test_csv_headers_are_matched_by_alias():
+    data = "﻿Cédula;Nota;ID Examen;Extra;Observaciones\n1001;4,5;7;x;Bien\n\n;;;;\n1002;3;7;;\n".encode("utf-8")
+    assert read(data, "notas.CSV") == [
+        (2, {"identification": "1001", "score": "4,5", "exam_id": "7", "comments": "Bien"}),
+        (5, {"identification": "1002", "score": "3", "exam_id": "7", "comments": ""}),
+    ]
+
+
+def test_xlsx_headers_are_matched_by_alias_and_integers_keep_their_text():
+    data = xlsx([["Documento", "Examen", "Calificación"], [1001.0, 7.0, 4.5], [None, None, None], ["1002", 7, 3]])
+    assert read(data, "notas.xlsx") == [
+        (2, {"identification": "1001", "exam_id": "7", "score": "4.5"}),
+        (4, {"identification": "1002", "exam_id": "7", "score": "3"}),
+    ]
+
+
+@pytest.mark.parametrize("data, filename, message", [
+    (b"cedula,nota\n1001,4\n", "notas.csv", "Faltan columnas en el encabezado: exam_id"),
+    (b"", "notas.csv", "El archivo está vacío"),
+    (b"no es un libro", "notas.xlsx", "No se pudo leer el archivo"),
+    (b"cedula,examen,nota\n", "notas.txt", "Formato no soportado"),
+])
+def test_invalid_files_are_rejected(data, filename, message):
+    with pytest.raises(GradeImportError, match=message):
+        read(data, filename)
+
+
+def test_each_rejected_row_reports_its_error(db, user):
+    course = crud.create_course(db, CourseCreate(name="Biología"), user.id)
+    other_course = crud.create_course(db, CourseCreate(name="Química"), user.id)
+    section = Section(name="A", course_id=course.id)
+    db.add(section)
+    students = [
+        Student(full_name=f"Estudiante {i}", email=f"e{i}@example.com", identification=str(1000 + i))
+        for i in range(3)
+    ]
+    db.add_all(students)
+    db.flush()
+    db.add_all([Enrollment(student_id=student.id, section_id=section.id) for student in students[:2]])
+    db.commit()
+    exam_in = {"title": "Parcial", "exam_type": "parcial", "creation_date": "2026-01-01"}
+    exam = crud.create_exam(db, {**exam_in, "course_id": course.id}, user.id)
+    other_exam = crud.create_exam(db, {**exam_in, "course_id": other_course.id}, user.id)
+
+    data = "\n".join([
+        "cedula,examen,nota,comentarios",
+        f"1000,{exam.id},4.5,Bien",
+        f"1001,{exam.id},abc,",
+        "1001,x,3,",
+        f",{exam.id},3,",
+        f"1002,{exam.id},3,",
+        f"9999,{exam.id},3,",
+        f"1001,{other_exam.id},3,",
+        f"1001,{exam.id + 100},3,",
+        f"1000,{exam.id},2,",
+        f"1001,{exam.id},nan,",
+    ]).encode("utf-8")
+    rows = GradeImport.read_rows(io.BytesIO(data), "notas.csv")
+    report = GradeImport.import_grades(db, section.id, course.id, rows, user.id)
+
+    assert report["total_rows"] == 10 and report["imported"] == 1
+    assert [(error["row"], error["error"]) for error in report["errors"]] == [
+        (3, "La nota debe ser un número"),
+        (4, "El examen debe ser un número"),
+        (5, "Falta la identificación del estudiante"),
+        (6, "El estudiante no está inscrito en la sección"),
+        (7, "Estudiante no encontrado"),
+        (8, "El examen no pertenece al curso de la sección"),
+        (9, "Examen no encontrado"),
+        (10, "Ya existe una calificación para este examen"),
+        (11, "La nota debe ser un número"),
+    ]
+    grade = db.query(Grade).one()
+    assert (grade.student_id, grade.exam_id, grade.score, grade.comments) == (students[0].id, exam.id, 4.5, "Bien")
+
+    with pytest.raises(GradeImportError, match="máximo de 3 filas"):
+        GradeImport.import_grades(
+            db, section.id, course.id, GradeImport.read_rows(io.BytesIO(data), "notas.csv"), user.id, max_rows=3
+        )
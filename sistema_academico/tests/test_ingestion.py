@@ -0,0 +1,60 @@
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from app import crud
+from app.schemas.courses import MaterialCreate
+from app.services import ingestion
+from app.services.ingestion import MaterialIngestion
+
+NOTES = """Biología celular
+La célula es la unidad básica de los seres vivos.
+El núcleo es el orgánulo que guarda el material genético.
+"""
+
+
+@pytest.fixture(autouse=True)
+def ingestion_env(tmp_path, monkeypatch, db, process_pool):
+    monkeypatch.setattr(ingestion.distractor_cache, "directory", str(tmp_path / "distractors"))
+    # ingest_material abre su propia sesión sobre la base de datos de la prueba
+    monkeypatch.setattr(ingestion, "SessionLocal", sessionmaker(bind=db.get_bind()))
+
+
+def create_material(db, user, path):
+    return crud.create_material(db, MaterialCreate(title=path.name, file_type=path.suffix[1:]), user.id, str(path))
+
+
+def test_pending_materials_are_stored_or_reported_as_failed(db, user, tmp_path):
+    notes = tmp_path / "apuntes.txt"
+    notes.write_text(NOTES, encoding="utf-8")
+    broken = tmp_path / "roto.pdf"
+    broken.write_bytes(b"esto no es un PDF")
+    good, bad = create_material(db, user, notes), create_material(db, user, broken)
+    assert good.ingestion_status == bad.ingestion_status == "pending"
+
+    failed = MaterialIngestion.ingest_pending(db, [good, bad])
+
+    assert [material["material_id"] for material in failed] == [bad.id]
+    assert failed[0]["error"]
+    assert good.ingestion_status == "ready" and bad.ingestion_status == "failed"
+    content = crud.get_material_content(db, material_id=good.id)
+    assert "célula" in content.raw_text and content.processed_content["sections"]
+    terms = {concept["term"] for concept in crud.get_concepts_by_materials(db, material_ids=[good.id])}
+    assert {"La célula", "El núcleo"} <= terms
+    assert crud.get_material_content(db, material_id=bad.id) is None
+
+
+def test_unchanged_material_is_not_processed_again(db, user, tmp_path, monkeypatch):
+    notes = tmp_path / "apuntes.txt"
+    notes.write_text(NOTES, encoding="utf-8")
+    material = create_material(db, user, notes)
+    MaterialIngestion.ingest_material(material.id)
+    db.refresh(material)
+    assert material.ingestion_status == "ready"
+
+    def fail(*args):
+        raise AssertionError("el material no cambió")
+
+    monkeypatch.setattr(ingestion, "call_in_process", fail)
+    MaterialIngestion.ingest_material(material.id)
+    db.refresh(material)
+    assert material.ingestion_status == "ready"
@@ -0,0 +1,117 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+from sqlalchemy import event
+
+from app.services.auto_grading import BLANK, AnswerKey
+from app.services.item_analysis import ItemAnalysis
+
+NUM_OPTIONS = 4
+
+
+def make_exam(correct):
+    """
+    Examen con una pregunta de selección múltiple por respuesta correcta y
+    una pregunta abierta al final, que no se califica automáticamente
+    """
+    questions = [
+        SimpleNamespace(
+            id=q + 1, position=q, content=f"Pregunta {q + 1}", difficulty="medium",
+            question_type="multiple_choice", points=1,
+            options=[
+                SimpleNamespace(id=(q + 1) * 10 + j, position=j, content=f"Opción {j}", is_correct=j == answer)
+                for j in range(NUM_OPTIONS)
+            ],
+        )
+        for q, answer in enumerate(correct)
+    ]
+    questions.append(SimpleNamespace(
+        id=len(correct) + 1, position=len(correct), content="Abierta", difficulty="medium",
+        question_type="open", points=5, options=[],
+    ))
+    return SimpleNamespace(id=1, questions=questions, exam_variants=[])
+
+
+def make_answers(correct, num_students, seed):
+    """
+    Respuestas en el orden del examen original: los estudiantes con más
+    habilidad aciertan más, con respuestas en blanco e inválidas
+    """
+    rng = np.random.default_rng(seed)
+    ability = rng.random(num_students)
+    answers = rng.integers(0, NUM_OPTIONS, size=(num_students, len(correct) + 1))
+    knows = rng.random((num_students, len(correct))) < ability[:, None]
+    answers[:, :-1] = np.where(knows, correct, answers[:, :-1])
+    answers[rng.random(answers.shape) < 0.05] = BLANK
+    answers[rng.random(answers.shape) < 0.02] = -2
+    answers[:, -1] = BLANK
+    return answers.astype(np.int16)
+
+
+def record(db, key, answers):
+    ItemAnalysis.record(db, exam_id=1, key=key, original=answers, responses_in=[
+        {"exam_id": 1, "enrollment_id": i, "student_id": i, "variant_code": None, "correct": 0, "score": 0.0}
+        for i in range(len(answers))
+    ])
+    db.commit()
+
+
+def test_report_from_two_batches_matches_direct_computation(db):
+    correct = np.array([1, 0, 3, 2, 1, 0])
+    exam = make_exam(correct)
+    key = AnswerKey.compile(exam)
+    first, second = make_answers(correct, 40, seed=1), make_answers(correct, 25, seed=2)
+    record(db, key, first)
+    record(db, key, second)
+
+    report = ItemAnalysis.report(db, exam, min_responses=1)
+
+    answers = np.concatenate([first, second])[:, :len(correct)]
+    hits = (answers == correct).astype(np.float64)
+    totals = hits.sum(axis=1)
+    n, k = hits.shape
+    p_values = hits.mean(axis=0)
+    kr20 = k / (k - 1) * (1 - (p_values * (1 - p_values)).sum() / totals.var())
+
+    assert report["examinees"] == n
+    assert report["mean_correct"] == pytest.approx(totals.mean(), abs=1e-4)
+    assert report["sd_correct"] == pytest.approx(totals.std(), abs=1e-4)
+    assert report["kr20"] == pytest.approx(kr20, abs=1e-4)
+    assert [question["question_id"] for question in report["questions"]] == list(range(1, k + 1))
+
+    for q, question in enumerate(report["questions"]):
+        item_rest = np.corrcoef(hits[:, q], totals - hits[:, q])[0, 1]
+        assert question["responses"] == n
+        assert question["p_value"] == pytest.approx(p_values[q], abs=1e-4)
+        assert question["point_biserial"] == pytest.approx(item_rest, abs=1e-4)
+        assert question["blank_rate"] == pytest.approx((answers[:, q] == BLANK).mean(), abs=1e-4)
+        for j, option in enumerate(question["options"]):
+            chosen = (answers[:, q] == j).astype(np.float64)
+            assert option["chosen"] == int(chosen.sum())
+            assert option["rate"] == pytest.approx(chosen.mean(), abs=1e-4)
+            assert option["point_biserial"] == pytest.approx(np.corrcoef(chosen, totals)[0, 1], abs=1e-4)
+
+
+def test_stat_rows_created_by_another_batch_are_not_inserted_twice(db):
+    correct = np.array([2, 1, 0])
+    key = AnswerKey.compile(make_exam(correct))
+    answers = make_answers(correct, 10, seed=3)
+
+    # Otro lote crea las filas en cero justo después de que este comprobó que
+    # no existían y antes de que las inserte
+    def create_first(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith(("INSERT INTO exam_stats", "INSERT INTO question_stats", "INSERT INTO option_stats")):
+            plain = statement.replace(" ON CONFLICT DO NOTHING", "")
+            cursor.connection.cursor().executemany(plain, parameters if executemany else [parameters])
+
+    engine = db.get_bind()
+    event.listen(engine, "before_cursor_execute", create_first)
+    try:
+        record(db, key, answers)
+    finally:
+        event.remove(engine, "before_cursor_execute", create_first)
+
+    report = ItemAnalysis.report(db, make_exam(correct), min_responses=1)
+    assert report["examinees"] == len(answers)
+    assert [question["responses"] for question in report["questions"]] == [len(answers)] * len(correct)
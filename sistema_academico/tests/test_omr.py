@@ -0,0 +1,78 @@
+from PIL import Image, ImageDraw
+
+from app.services.auto_grading import BLANK
+from app.services.omr import BUBBLE_DIAMETER_MM, MULTIPLE, RENDER_DPI, OpticalMarkReader, SheetLayout, read_page
+
+FILL_THRESHOLD = 0.45
+WORK_DPI = 100
+
+
+def fill_sheet(layout, identification, variant_code, answers):
+    """
+    Hoja dibujada con las burbujas marcadas: answers lleva una lista de
+    opciones por pregunta (vacía si queda en blanco)
+    """
+    image = layout.render("Parcial", "Biología")
+    draw = ImageDraw.Draw(image)
+    scale = RENDER_DPI / 25.4
+    radius = BUBBLE_DIAMETER_MM / 2 * scale
+
+    def mark(center):
+        x, y = center[0] * scale, center[1] * scale
+        draw.ellipse((x - radius, y - radius, x + radius, y + radius), fill=0)
+
+    for column, digit in enumerate(identification):
+        mark(layout.id_centers[column * 10 + int(digit)])
+    if variant_code:
+        mark(layout.variant_centers[layout.variant_codes.index(variant_code)])
+    for question, options in enumerate(answers):
+        for option in options:
+            mark(layout.question_centers[question * layout.num_options + option])
+    return image
+
+
+def scanned(image):
+    """
+    La hoja como sale del escáner: algo inclinada, desplazada y a otra resolución
+    """
+    image = image.rotate(1.2, resample=Image.BILINEAR, expand=True, fillcolor=255)
+    image = image.resize((round(image.width * 1.4), round(image.height * 1.4)), Image.BILINEAR)
+    page = Image.new("L", (image.width + 40, image.height + 30), 255)
+    page.paste(image, (25, 10))
+    return page
+
+
+def test_rendered_sheet_is_read_back():
+    layout = SheetLayout(question_numbers=range(1, 61), num_options=5, variant_codes=["A", "B", "C"], id_digits=8)
+    answers = [[q % 5] for q in range(60)]
+    answers[3], answers[40] = [], [1, 4]
+    image = scanned(fill_sheet(layout, "204815", "B", answers))
+
+    page = read_page(image, layout, FILL_THRESHOLD, WORK_DPI)
+    assert page == {
+        "identification": "204815",
+        "variant_code": "B",
+        "answers": [options[0] if len(options) == 1 else BLANK if not options else MULTIPLE for options in answers],
+    }
+
+    # Una página sin hoja no se califica
+    blank = Image.new("L", image.size, 255)
+    assert "marcas de referencia" in read_page(blank, layout, FILL_THRESHOLD, WORK_DPI)["error"]
+
+
+def test_multipage_scans_are_read_in_order(tmp_path, process_pool):
+    layout = SheetLayout(question_numbers=[1, 2, 4], num_options=4, id_digits=4)
+    sheets = [
+        scanned(fill_sheet(layout, "1234", None, [[0], [1], [3]])),
+        scanned(fill_sheet(layout, "987", None, [[2], [], [0]])),
+    ]
+    path = tmp_path / "lote.tif"
+    sheets[0].save(path, save_all=True, append_images=sheets[1:])
+
+    pages = OpticalMarkReader.read_scans(
+        [("lote.tif", str(path))], layout, FILL_THRESHOLD, WORK_DPI, pages_per_task=1
+    )
+    assert [(page["page"], page["file"], page["identification"], page["answers"]) for page in pages] == [
+        (1, "lote.tif", "1234", [0, 1, 3]),
+        (2, "lote.tif", "987", [2, BLANK, 0]),
+    ]
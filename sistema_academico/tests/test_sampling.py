@@ -0,0 +1,49 @@
+import numpy as np
+
+from app.services.exam_generator import ExamGenerator
+from app.services.sampling import StratifiedSampler, allocate
+
+
+def test_allocate_redistributes_and_reports_missing():
+    counts, report = allocate({"easy": 2, "medium": 10, "hard": 0}, 10, {"easy": 0.5, "medium": 0.3, "hard": 0.2})
+    assert counts == {"easy": 2, "medium": 8, "hard": 0}
+    assert report["missing"] == 0
+
+    counts, report = allocate({"easy": 1, "medium": 2}, 10, {"easy": 0.5, "medium": 0.5})
+    assert counts == {"easy": 1, "medium": 2}
+    assert report["missing"] == 7
+    assert report["by_stratum"]["easy"] == {"requested": 5, "available": 1, "selected": 1}
+
+
+def test_sampler_strata_keep_first_appearance_order_and_defaults():
+    items = [{"question_type": "open"}, {"question_type": None, "difficulty": "hard"}, {"question_type": "open"}]
+    sampler = StratifiedSampler(items, ["question_type", "difficulty"], defaults={"difficulty": "medium"})
+    assert sampler.strata == [("open", "medium"), (None, "hard")]
+    assert sampler.available() == {("open", "medium"): 2, (None, "hard"): 1}
+
+
+def test_select_questions_stratifies_by_type_and_difficulty():
+    questions = [
+        {"id": i, "question_type": question_type, "difficulty": difficulty}
+        for i, (question_type, difficulty) in enumerate(
+            [("multiple_choice", "easy"), ("multiple_choice", "hard"), ("open", "easy"), ("open", "hard")] * 50
+        )
+    ]
+    selected, report = ExamGenerator._select_questions(
+        questions, 20, {"multiple_choice": 0.5, "open": 0.5}, {"easy": 0.8, "hard": 0.2}, np.random.default_rng(0)
+    )
+    assert report["missing"] == 0
+    assert len({q["id"] for q in selected}) == 20
+    assert sum(q["difficulty"] == "easy" for q in selected) == 16
+    assert sum(q["question_type"] == "open" for q in selected) == 10
+
+
+def test_select_concepts_from_bank_returns_shortfall():
+    selected, report = ExamGenerator.select_concepts_from_bank(
+        {"easy": 1, "medium": 2},
+        lambda difficulty, count: [{"difficulty": difficulty}] * count,
+        10,
+        {"easy": 0.5, "medium": 0.5}
+    )
+    assert len(selected) == 3
+    assert report["missing"] == 7
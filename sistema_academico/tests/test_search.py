@@ -0,0 +1,47 @@
+import pytest
+
+from app import crud
+from app.schemas.courses import CourseCreate, MaterialCreate
+from app.crud.courses import build_search_query
+from app.services.document_processor import PROCESSOR_VERSION, DocumentProcessor
+
+
+def ingest(db, material, text):
+    processed = DocumentProcessor.structure_content(text)
+    crud.save_material_content(db, material, {
+        "content_hash": DocumentProcessor.fingerprint(text),
+        "processor_version": PROCESSOR_VERSION,
+        "raw_text": text,
+        "processed_content": processed,
+        "concepts": DocumentProcessor.find_concepts_for_questions(processed),
+    })
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("célula núcleo", '"célula" "núcleo"'),
+    ('célula AND "núcleo" OR NOT mitocondria', '"célula" "AND" "núcleo" "OR" "NOT" "mitocondria"'),
+    ("NEAR(célula* núcleo, 2) title:ADN ^membrana -gen", '"NEAR" "célula" "núcleo" "2" "title" "ADN" "membrana" "gen"'),
+    ('"" ( ) * : ^', ""),
+])
+def test_search_query_quotes_every_word(query, expected):
+    assert build_search_query(query) == expected
+
+
+def test_search_with_fts_syntax_matches_literal_words(db, user):
+    biology = crud.create_course(db, CourseCreate(name="Biología"), user.id)
+    chemistry = crud.create_course(db, CourseCreate(name="Química"), user.id)
+    cells = crud.create_material(db, MaterialCreate(title="Células", file_type="txt"), user.id, "a.txt", biology.id)
+    atoms = crud.create_material(db, MaterialCreate(title="Átomos", file_type="txt"), user.id, "b.txt", chemistry.id)
+    ingest(db, cells, "Biología\nLa célula tiene un núcleo y una membrana.\n")
+    ingest(db, atoms, "Química\nEl átomo tiene un núcleo con protones y neutrones.\n")
+
+    results = crud.search_materials(db, query='"célula*" núcleo:(')
+    assert results["total"] == 1
+    assert [item["material_id"] for item in results["results"]] == [cells.id]
+    assert "**núcleo**" in results["results"][0]["snippet"]
+
+    assert crud.search_materials(db, query="núcleo")["total"] == 2
+    # Los operadores se buscan como palabras: OR no une las dos búsquedas
+    assert crud.search_materials(db, query="célula OR átomo")["total"] == 0
+    results = crud.search_materials(db, query="núcleo", course_id=chemistry.id)
+    assert [item["material_id"] for item in results["results"]] == [atoms.id]
@@ -0,0 +1,95 @@
+import asyncio
+import io
+import os
+
+import pytest
+from fastapi import UploadFile
+from sqlalchemy.orm import sessionmaker
+
+from app import crud
+from app.db.courses import Blob
+from app.schemas.courses import MaterialCreate
+from app.services import storage
+from app.services.storage import BlobStorage
+
+
+@pytest.fixture(autouse=True)
+def blob_storage(tmp_path, monkeypatch, db):
+    monkeypatch.setattr(storage.settings, "BLOB_STORAGE_DIR", str(tmp_path / "blobs"))
+    monkeypatch.setattr(storage.settings, "BLOB_GC_GRACE_SECONDS", 0)
+    # collect_garbage abre su propia sesión sobre la base de datos de la prueba
+    monkeypatch.setattr(storage, "SessionLocal", sessionmaker(bind=db.get_bind()))
+
+
+def upload(data: bytes) -> dict:
+    return asyncio.run(BlobStorage.save_upload(UploadFile(file=io.BytesIO(data), filename="apuntes.pdf"), ".pdf"))
+
+
+def create_material(db, user, blob_in):
+    material = crud.create_material(
+        db, MaterialCreate(title="Apuntes", file_type="pdf"), user.id, blob_in["file_path"], blob_in=blob_in
+    )
+    BlobStorage.finish_upload(blob_in)
+    return material
+
+
+def release(db, material):
+    crud.release_blob(db, material.blob_key)
+    db.commit()
+
+
+def test_same_content_is_stored_once_and_collected_without_references(db, user):
+    first = create_material(db, user, upload(b"%PDF contenido"))
+    second = create_material(db, user, upload(b"%PDF contenido"))
+    assert first.blob_key == second.blob_key
+    blob = crud.get_blob(db, key=first.blob_key)
+    assert blob.ref_count == 2
+    assert os.listdir(os.path.join(storage.settings.BLOB_STORAGE_DIR, "tmp")) == []
+
+    release(db, first)
+    assert BlobStorage.collect_garbage() == 0
+    assert os.path.exists(blob.file_path)
+
+    release(db, second)
+    db.refresh(blob)
+    assert blob.ref_count == 0 and blob.released_at is not None
+    assert BlobStorage.collect_garbage() == 1
+    assert not os.path.exists(blob.file_path)
+    db.expire_all()
+    assert crud.get_blob(db, key=first.blob_key) is None
+
+
+def test_grace_period_keeps_recently_released_files(db, user, monkeypatch):
+    monkeypatch.setattr(storage.settings, "BLOB_GC_GRACE_SECONDS", 3600)
+    material = create_material(db, user, upload(b"%PDF reciente"))
+    release(db, material)
+    assert BlobStorage.collect_garbage() == 0
+    assert os.path.exists(material.file_path)
+
+
+def test_upload_survives_collection_between_save_and_reference(db, user):
+    old = create_material(db, user, upload(b"%PDF compartido"))
+    release(db, old)
+
+    # La misma subida llega justo cuando vence el tiempo de gracia: el
+    # archivo existe al guardarla, pero la recolección lo borra antes de que
+    # la subida registre su referencia
+    blob_in = upload(b"%PDF compartido")
+    assert os.path.exists(blob_in["file_path"])
+    assert BlobStorage.collect_garbage() == 1
+    assert not os.path.exists(blob_in["file_path"])
+
+    db.expire_all()
+    material = create_material(db, user, blob_in)
+    assert crud.get_blob(db, key=material.blob_key).ref_count == 1
+    with open(material.file_path, "rb") as file:
+        assert file.read() == b"%PDF compartido"
+    assert not os.path.exists(blob_in["tmp_path"])
+
+
+def test_failed_reference_discards_the_upload(db):
+    blob_in = upload(b"%PDF sin material")
+    BlobStorage.finish_upload(blob_in, referenced=False)
+    assert not os.path.exists(blob_in["tmp_path"])
+    assert not os.path.exists(blob_in["file_path"])
+    assert db.query(Blob).count() == 0
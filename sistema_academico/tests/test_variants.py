@@ -0,0 +1,57 @@
+from app.services.variants import ExamVariants
+
+
+def make_exam():
+    questions = [
+        {
+            "question_type": "multiple_choice", "points": 1, "content": f"Pregunta {q}",
+            "options": [f"Opción {q}.{j}" for j in range(4)], "answer": f"Opción {q}.{q % 4}",
+        }
+        for q in range(6)
+    ]
+    questions.insert(3, {
+        "question_type": "multiple_choice", "points": 1, "content": "La célula es un ser vivo",
+        "options": ["Verdadero", "Falso"], "answer": "Falso",
+    })
+    questions += [
+        {"question_type": "open", "points": 5, "content": f"Explique {q}", "answer": f"Respuesta {q}"}
+        for q in range(3)
+    ]
+    return {"title": "Parcial", "total_points": 22, "questions": questions}
+
+
+def test_variant_codes():
+    assert [ExamVariants.variant_code(i) for i in (0, 1, 25, 26, 27, 701, 702)] == [
+        "A", "B", "Z", "AA", "AB", "ZZ", "AAA"
+    ]
+
+
+def test_variants_are_deterministic_and_their_keys_follow_the_permutation():
+    exam = make_exam()
+    variants = ExamVariants.build_variants(exam, 3, exam_key="examen-1")
+    again = ExamVariants.build_variants(make_exam(), 3, exam_key="examen-1")
+    assert [variant["variant_code"] for variant in variants] == ["A", "B", "C"]
+    assert [variant["questions"] for variant in variants] == [variant["questions"] for variant in again]
+    assert [variant["answer_key"] for variant in variants] == [variant["answer_key"] for variant in again]
+    assert variants[0]["question_order"] != variants[1]["question_order"]
+    assert ExamVariants.build_variant(exam, "A", "examen-2")["seed"] != variants[0]["seed"]
+
+    for variant in variants:
+        order = variant["question_order"]
+        # Las preguntas se permutan dentro de cada tipo: las abiertas siguen al final
+        assert sorted(order) == list(range(len(exam["questions"])))
+        assert sorted(order[:7]) == list(range(7)) and sorted(order[7:]) == [7, 8, 9]
+
+        for number, (index, question) in enumerate(zip(order, variant["questions"]), 1):
+            original = exam["questions"][index]
+            entry = variant["answer_key"][number - 1]
+            assert question["content"] == original["content"] and entry["number"] == number
+            if original["question_type"] == "open":
+                assert entry["answer"] == original["answer"]
+                continue
+            # La letra de la clave apunta a la misma respuesta correcta
+            assert question["options"][ord(entry["answer"]) - 65] == original["answer"]
+            if original["options"] == ["Verdadero", "Falso"]:
+                assert question["options"] == original["options"]
+            else:
+                assert [original["options"][i] for i in variant["option_orders"][str(index)]] == question["options"]